@@ -3,16 +3,21 @@ from CommonServerPython import *
 from CommonServerUserPython import *
 
 ''' IMPORTS '''
+import codecs
 import csv
-import gzip
+import itertools
 import urllib3
-from typing import Optional, Pattern, Dict, Any, Tuple, Union, List
+import zlib
+from typing import Optional, Pattern, Dict, Any, Tuple, Union, List, Iterable, Iterator
 
 # disable insecure warnings
 urllib3.disable_warnings()
 
 # Globals
 DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+STREAM_CHUNK_SIZE = 64 * 1024
+CREATE_INDICATORS_BATCH_SIZE = 2000
+DEFAULT_MAX_FETCH_WORKERS = 10
 
 
 class Client(BaseClient):
@@ -20,7 +25,8 @@ class Client(BaseClient):
                  insecure: bool = False, credentials: dict = None, ignore_regex: str = None, encoding: str = 'latin-1',
                  delimiter: str = ',', doublequote: bool = True, escapechar: str = '',
                  quotechar: str = '"', skipinitialspace: bool = False, polling_timeout: int = 20, proxy: bool = False,
-                 feedTags: Optional[str] = None, tlp_color: Optional[str] = None, value_field: str = 'value', **kwargs):
+                 feedTags: Optional[str] = None, tlp_color: Optional[str] = None, value_field: str = 'value',
+                 max_fetch_workers: int = DEFAULT_MAX_FETCH_WORKERS, **kwargs):
         """
         :param url: URL of the feed.
         :param feed_url_to_config: for each URL, a configuration of the feed that contains
@@ -65,6 +71,7 @@ class Client(BaseClient):
         :param polling_timeout: timeout of the polling request in seconds. Default: 20
         :param proxy: Sets whether use proxy when sending requests
         :param tlp_color: Traffic Light Protocol color.
+        :param max_fetch_workers: The maximal number of feed URLs fetched concurrently. Default: 10
         """
         self.tags: List[str] = argToList(feedTags)
         self.tlp_color = tlp_color
@@ -98,6 +105,7 @@ class Client(BaseClient):
             self.ignore_regex = re.compile(ignore_regex)
         self.feed_url_to_config: Optional[Dict[str, dict]] = feed_url_to_config
         self.fieldnames = argToList(fieldnames)
+        self.max_fetch_workers = arg_to_number(max_fetch_workers) or DEFAULT_MAX_FETCH_WORKERS
         self.dialect: Dict[str, Any] = {
             'delimiter': delimiter,
             'doublequote': doublequote,
@@ -116,104 +124,210 @@ class Client(BaseClient):
         return r.prepare()
 
     def build_iterator(self, **kwargs):
-        results = []
+        """Sends the requests of the feed urls concurrently, yielding the reader of each url as soon as its response
+        arrives, so its rows are parsed while the other urls are still requested. The responses are streamed, and
+        are read only as their rows are consumed.
+
+        Returns:
+            Iterator. Dicts of a url to the csv.DictReader of its rows.
+        """
         urls = self._base_url
         if not isinstance(urls, list):
             urls = [urls]
-        for url in urls:
-            _session = requests.Session()
-
-            prepreq = self._build_request(url)
-
-            # this is to honour the proxy environment variables
-            kwargs.update(_session.merge_environment_settings(
-                prepreq.url,
-                {}, None, None, None  # defaults
-            ))
-            kwargs['stream'] = True
-            kwargs['verify'] = self._verify
-            kwargs['timeout'] = self.polling_timeout
-
-            if self.headers:
-                if 'headers' in kwargs:
-                    kwargs['headers'].update(self.headers)
-                else:
-                    kwargs['headers'] = self.headers
 
-            try:
-                r = _session.send(prepreq, **kwargs)
-            except requests.exceptions.ConnectTimeout as exception:
-                err_msg = 'Connection Timeout Error - potential reasons might be that the Server URL parameter' \
-                          ' is incorrect or that the Server is not accessible from your host.'
-                raise DemistoException(err_msg, exception)
-            except requests.exceptions.SSLError as exception:
-                # in case the "Trust any certificate" is already checked
-                if not self._verify:
-                    raise
-                err_msg = 'SSL Certificate Verification Failed - try selecting \'Trust any certificate\' checkbox in' \
-                          ' the integration configuration.'
-                raise DemistoException(err_msg, exception)
-            except requests.exceptions.ProxyError as exception:
-                err_msg = 'Proxy Error - if the \'Use system proxy\' checkbox in the integration configuration is' \
-                          ' selected, try clearing the checkbox.'
-                raise DemistoException(err_msg, exception)
-            except requests.exceptions.ConnectionError as exception:
-                # Get originating Exception in Exception chain
-                error_class = str(exception.__class__)
-                err_type = '<' + error_class[error_class.find('\'') + 1: error_class.rfind('\'')] + '>'
-                err_msg = 'Verify that the server URL parameter' \
-                          ' is correct and that you have access to the server from your host.' \
-                          '\nError Type: {}\nError Number: [{}]\nMessage: {}\n' \
-                    .format(err_type, exception.errno, exception.strerror)
-                raise DemistoException(err_msg, exception)
-            try:
-                r.raise_for_status()
-            except Exception:
-                return_error('Exception in request: {} {}'.format(r.status_code, r.content))
-                raise
+        for url, csvreader in fetch_sources_concurrently(lambda url: self.fetch_url(url, **kwargs), urls,
+                                                         self.max_fetch_workers):
+            yield {url: csvreader}
 
-            response = self.get_feed_content_divided_to_lines(url, r)
-            if self.feed_url_to_config:
-                fieldnames = self.feed_url_to_config.get(url, {}).get('fieldnames', [])
-                skip_first_line = self.feed_url_to_config.get(url, {}).get('skip_first_line', False)
+    def fetch_url(self, url, **kwargs):
+        """Sends the request of a single feed url
+
+        Args:
+            url: The feed's url.
+            kwargs: Arguments to send with the request.
+
+        Returns:
+            csv.DictReader. A reader of the feed's rows.
+        """
+        kwargs = dict(kwargs)
+        _session = requests.Session()
+
+        prepreq = self._build_request(url)
+
+        # this is to honour the proxy environment variables
+        kwargs.update(_session.merge_environment_settings(
+            prepreq.url,
+            {}, None, None, None  # defaults
+        ))
+        kwargs['stream'] = True
+        kwargs['verify'] = self._verify
+        kwargs['timeout'] = self.polling_timeout
+
+        if self.headers:
+            if 'headers' in kwargs:
+                kwargs['headers'].update(self.headers)
             else:
-                fieldnames = self.fieldnames
-                skip_first_line = False
-            if self.ignore_regex is not None:
-                response = filter(  # type: ignore
-                    lambda x: self.ignore_regex.match(x) is None,  # type: ignore
-                    response
-                )
-
-            csvreader = csv.DictReader(
-                response,
-                fieldnames=fieldnames,
-                **self.dialect
+                kwargs['headers'] = self.headers
+
+        try:
+            r = _session.send(prepreq, **kwargs)
+        except requests.exceptions.ConnectTimeout as exception:
+            err_msg = 'Connection Timeout Error - potential reasons might be that the Server URL parameter' \
+                      ' is incorrect or that the Server is not accessible from your host.'
+            raise DemistoException(err_msg, exception)
+        except requests.exceptions.SSLError as exception:
+            # in case the "Trust any certificate" is already checked
+            if not self._verify:
+                raise
+            err_msg = 'SSL Certificate Verification Failed - try selecting \'Trust any certificate\' checkbox in' \
+                      ' the integration configuration.'
+            raise DemistoException(err_msg, exception)
+        except requests.exceptions.ProxyError as exception:
+            err_msg = 'Proxy Error - if the \'Use system proxy\' checkbox in the integration configuration is' \
+                      ' selected, try clearing the checkbox.'
+            raise DemistoException(err_msg, exception)
+        except requests.exceptions.ConnectionError as exception:
+            # Get originating Exception in Exception chain
+            error_class = str(exception.__class__)
+            err_type = '<' + error_class[error_class.find('\'') + 1: error_class.rfind('\'')] + '>'
+            err_msg = 'Verify that the server URL parameter' \
+                      ' is correct and that you have access to the server from your host.' \
+                      '\nError Type: {}\nError Number: [{}]\nMessage: {}\n' \
+                .format(err_type, exception.errno, exception.strerror)
+            raise DemistoException(err_msg, exception)
+        try:
+            r.raise_for_status()
+        except Exception as exception:
+            # raised rather than returned as an error, so a failing url does not fail the other urls of the feed
+            raise DemistoException('Exception in request: {} {}'.format(r.status_code, r.content), exception)
+
+        response = self.get_feed_content_divided_to_lines(url, r)
+        if self.feed_url_to_config:
+            fieldnames = self.feed_url_to_config.get(url, {}).get('fieldnames', [])
+            skip_first_line = self.feed_url_to_config.get(url, {}).get('skip_first_line', False)
+        else:
+            fieldnames = self.fieldnames
+            skip_first_line = False
+        if self.ignore_regex is not None:
+            response = filter(  # type: ignore
+                lambda x: self.ignore_regex.match(x) is None,  # type: ignore
+                response
             )
 
-            if skip_first_line:
-                next(csvreader)
+        csvreader = csv.DictReader(
+            response,
+            fieldnames=fieldnames,
+            **self.dialect
+        )
 
-            results.append({url: csvreader})
+        if skip_first_line:
+            next(csvreader)
 
-        return results
+        return csvreader
 
     def get_feed_content_divided_to_lines(self, url, raw_response):
-        """Fetch feed data and divides its content to lines
+        """Stream feed data and divides its content to lines
 
         Args:
             url: Current feed's url.
             raw_response: The raw response from the feed's url.
 
         Returns:
-            List. List of lines from the feed content.
+            Iterator. The lines of the feed content, read incrementally from the response which is closed
+            once all the lines were read.
         """
-        if self.feed_url_to_config and self.feed_url_to_config.get(url).get('is_zipped_file'):  # type: ignore
-            response_content = gzip.decompress(raw_response.content)
-        else:
-            response_content = raw_response.content
+        try:
+            chunks = raw_response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            if self.feed_url_to_config and self.feed_url_to_config.get(url, {}).get('is_zipped_file'):
+                chunks = gunzip_chunks(chunks)
+            yield from split_to_lines(decode_chunks(chunks, self.encoding))
+        finally:
+            raw_response.close()
+
+
+def gunzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Incrementally decompresses gzip compressed chunks, including files made of several gzip members.
+
+    Args:
+        chunks: The compressed chunks.
+
+    Returns:
+        Iterator. The decompressed chunks.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    member_started = False
+    for chunk in chunks:
+        while chunk:
+            member_started = True
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+            if not decompressor.eof:
+                break
+            # the member ended, the rest of the chunk belongs to the next member
+            chunk = decompressor.unused_data
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            member_started = False
+    if member_started:
+        data = decompressor.flush()
+        if data:
+            yield data
+        if not decompressor.eof:
+            raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+
+def decode_chunks(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    """Incrementally decodes chunks, handling characters which are split between chunks.
+
+    Args:
+        chunks: The encoded chunks.
+        encoding: The encoding of the chunks.
+
+    Returns:
+        Iterator. The decoded chunks.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def split_to_lines(text_chunks: Iterable[str]) -> Iterator[str]:
+    """Divides text chunks to lines, the same way str.split('\\n') divides the whole text.
+
+    Args:
+        text_chunks: The text chunks.
+
+    Returns:
+        Iterator. The lines of the text, without the line breaks.
+    """
+    pending = ''
+    for text in text_chunks:
+        lines = (pending + text).split('\n')
+        pending = lines.pop()
+        yield from lines
+    yield pending
+
+
+def iter_batches(iterable: Iterable, batch_size: int = CREATE_INDICATORS_BATCH_SIZE) -> Iterator[List]:
+    """Divides an iterable to lists of batch_size items, consuming it lazily.
+
+    Args:
+        iterable: The iterable to divide.
+        batch_size: The maximal size of a batch.
 
-        return response_content.decode(self.encoding).split('\n')
+    Returns:
+        Iterator. The batches.
+    """
+    iterator = iter(iterable)
+    current_batch = list(itertools.islice(iterator, batch_size))
+    while current_batch:
+        yield current_batch
+        current_batch = list(itertools.islice(iterator, batch_size))
 
 
 def determine_indicator_type(indicator_type, default_indicator_type, auto_detect, value):
@@ -235,7 +349,19 @@ def determine_indicator_type(indicator_type, default_indicator_type, auto_detect
 
 
 def module_test_command(client: Client, args):
-    client.build_iterator()
+    def get_url_error(url):
+        try:
+            client.fetch_url(url)
+            return None
+        except Exception as exception:
+            return exception
+
+    # unlike fetching, the test fails if any of the feed urls fails, and reports each of the failing urls
+    urls = client._base_url if isinstance(client._base_url, list) else [client._base_url]
+    url_errors = [f'{url}: {error}' for url, error in fetch_sources_concurrently(get_url_error, urls,
+                                                                                 client.max_fetch_workers) if error]
+    if url_errors:
+        raise DemistoException('Failed fetching the feed URLs:\n' + '\n'.join(url_errors))
     return 'ok', {}, {}
 
 
@@ -286,11 +412,23 @@ def create_fields_mapping(raw_json: Dict[str, Any], mapping: Dict[str, Union[Tup
     return fields_mapping
 
 
-def fetch_indicators_command(client: Client, default_indicator_type: str, auto_detect: bool, limit: int = 0,
-                             create_relationships: bool = False, **kwargs):
+def iter_indicators(client: Client, default_indicator_type: str, auto_detect: bool, limit: int = 0,
+                    create_relationships: bool = False, **kwargs) -> Iterator[dict]:
+    """Yields the indicators of the feeds one at a time, as the feeds rows are read from the responses.
+
+    Args:
+        client: The feed client.
+        default_indicator_type: The indicator type to use when the feed config has none.
+        auto_detect: Whether to detect the indicator type from the value.
+        limit: The maximal number of indicators to yield, 0 for no limit.
+        create_relationships: Whether to create the relationships defined in the feed config.
+
+    Returns:
+        Iterator. The indicators.
+    """
     iterator = client.build_iterator(**kwargs)
     relationships_of_indicator = []
-    indicators = []
+    indicators_count = 0
     config = client.feed_url_to_config or {}
     for url_to_reader in iterator:
         for url, reader in url_to_reader.items():
@@ -332,12 +470,16 @@ def fetch_indicators_command(client: Client, default_indicator_type: str, auto_d
                     if client.tlp_color:
                         indicator['fields']['trafficlightprotocol'] = client.tlp_color
 
-                    indicators.append(indicator)
+                    yield indicator
+                    indicators_count += 1
                     # exit the loop if we have more indicators than the limit
-                    if limit and len(indicators) >= limit:
-                        return indicators
+                    if limit and indicators_count >= limit:
+                        return
 
-    return indicators
+
+def fetch_indicators_command(client: Client, default_indicator_type: str, auto_detect: bool, limit: int = 0,
+                             create_relationships: bool = False, **kwargs):
+    return list(iter_indicators(client, default_indicator_type, auto_detect, limit, create_relationships, **kwargs))
 
 
 def get_indicators_command(client, args: dict, tags: Optional[List[str]] = None):
@@ -373,15 +515,15 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
-            indicators = fetch_indicators_command(
+            indicators = iter_indicators(
                 client,
                 params.get('indicator_type'),
                 params.get('auto_detect_type'),
                 params.get('limit'),
                 params.get('create_relationships')
             )
-            # we submit the indicators in batches
-            for b in batch(indicators, batch_size=2000):
+            # we submit the indicators in batches as they are parsed
+            for b in iter_batches(indicators, batch_size=CREATE_INDICATORS_BATCH_SIZE):
                 demisto.createIndicators(b)  # type: ignore
         else:
             args = demisto.args()
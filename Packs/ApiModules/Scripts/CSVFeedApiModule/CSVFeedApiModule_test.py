@@ -1,5 +1,6 @@
 import requests_mock
 from CSVFeedApiModule import *
+import gzip
 import io
 import pytest
 
@@ -148,7 +149,37 @@ def test_get_feed_content():
             m.get(url, content=feed_url_to_config.get(url).get('content'))
             raw_response = requests.get(url)
 
-            assert client.get_feed_content_divided_to_lines(url, raw_response) == expected_output
+            assert list(client.get_feed_content_divided_to_lines(url, raw_response)) == expected_output
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1024])
+def test_feed_content_streaming_helpers(chunk_size):
+    """
+    Given
+    - Gzip compressed content made of two members, containing multi-byte characters.
+
+    When
+    - Decompressing, decoding and dividing it to lines chunk by chunk.
+
+    Then
+    - Ensure the lines are the same as dividing the whole decompressed content.
+    """
+    text = 'value,comment\n1.1.1.1,caf\u00e9\n2.2.2.2,\u05e9\u05dc\u05d5\u05dd\n'
+    compressed = gzip.compress(text[:20].encode('utf8')) + gzip.compress(text[20:].encode('utf8'))
+    chunks = [compressed[i:i + chunk_size] for i in range(0, len(compressed), chunk_size)]
+
+    assert list(split_to_lines(decode_chunks(gunzip_chunks(chunks), 'utf8'))) == text.split('\n')
+
+
+def test_gunzip_chunks_truncated():
+    compressed = gzip.compress(b'1.1.1.1\n' * 100)
+    with pytest.raises(EOFError):
+        list(gunzip_chunks([compressed[:-10]]))
+
+
+def test_iter_batches():
+    assert list(iter_batches(iter(range(5)), batch_size=2)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_batches(iter([]), batch_size=2)) == []
 
 
 @pytest.mark.parametrize('date_string,expected_result', [
@@ -369,3 +400,52 @@ def test_get_indicators_without_relations():
         indicators = fetch_indicators_command(client, default_indicator_type=itype, auto_detect=False,
                                               limit=35, create_relationships=False)
         assert indicators == expected_res
+
+
+def test_build_iterator_several_urls(requests_mock):
+    """
+    Given
+    - A feed with several URLs, where one of them fails.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure the indicators of the other URLs are fetched.
+    """
+    urls = ['https://feed1.com', 'https://feed2.com', 'https://feed3.com']
+    requests_mock.get(urls[0], content=b'1.1.1.1\n2.2.2.2')
+    requests_mock.get(urls[1], status_code=500)
+    requests_mock.get(urls[2], content=b'3.3.3.3')
+    client = Client(url=urls, feed_url_to_config={url: {'fieldnames': ['value'], 'indicator_type': 'IP'} for url in urls})
+
+    indicators = fetch_indicators_command(client, default_indicator_type='IP', auto_detect=False)
+    assert sorted(indicator['value'] for indicator in indicators) == ['1.1.1.1', '2.2.2.2', '3.3.3.3']
+
+
+def test_module_test_command_several_urls(requests_mock):
+    """
+    Given
+    - A feed with several URLs, where two of them fail.
+
+    When
+    - Running test-module.
+
+    Then
+    - Ensure the test fails and names each of the failing URLs.
+    """
+    urls = ['https://feed1.com', 'https://feed2.com', 'https://feed3.com']
+    requests_mock.get(urls[0], content=b'1.1.1.1')
+    requests_mock.get(urls[1], status_code=500)
+    requests_mock.get(urls[2], status_code=404)
+    client = Client(url=urls, feed_url_to_config={url: {'fieldnames': ['value'], 'indicator_type': 'IP'} for url in urls})
+
+    with pytest.raises(DemistoException) as e:
+        module_test_command(client, {})
+    assert urls[0] + ':' not in str(e.value)
+    assert 'https://feed2.com: Exception in request: 500' in str(e.value)
+    assert 'https://feed3.com: Exception in request: 404' in str(e.value)
+
+    requests_mock.get(urls[1], content=b'2.2.2.2')
+    requests_mock.get(urls[2], content=b'3.3.3.3')
+    assert module_test_command(client, {})[0] == 'ok'
@@ -5,7 +5,7 @@ from CommonServerUserPython import *
 ''' IMPORTS '''
 import urllib3
 import requests
-from typing import Optional, Pattern, List
+from typing import Optional, Pattern, Dict
 
 # disable insecure warnings
 urllib3.disable_warnings()
@@ -14,13 +14,15 @@ urllib3.disable_warnings()
 TAGS = 'tags'
 TLP_COLOR = 'trafficlightprotocol'
 DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+DEFAULT_MAX_FETCH_WORKERS = 10
 
 
 class Client(BaseClient):
     def __init__(self, url: str, feed_name: str = 'http', insecure: bool = False, credentials: dict = None,
                  ignore_regex: str = None, encoding: str = None, indicator_type: str = '',
                  indicator: str = '', fields: str = '{}', feed_url_to_config: dict = None, polling_timeout: int = 20,
-                 headers: dict = None, proxy: bool = False, custom_fields_mapping: dict = None, **kwargs):
+                 headers: dict = None, proxy: bool = False, custom_fields_mapping: dict = None,
+                 max_fetch_workers: int = DEFAULT_MAX_FETCH_WORKERS, **kwargs):
         """Implements class for miners of plain text feeds over HTTP.
         **Config parameters**
         :param: url: URL of the feed.
@@ -60,6 +62,7 @@ class Client(BaseClient):
             }]
         }
         :param: proxy: Use proxy in requests.
+        :param: max_fetch_workers: The maximal number of feed URLs fetched concurrently. Default: 10
         **Extraction dictionary**
             Extraction dictionaries contain the following keys:
             :regex: Python regular expression for searching the text.
@@ -137,6 +140,10 @@ class Client(BaseClient):
         if custom_fields_mapping is None:
             custom_fields_mapping = {}
         self.custom_fields_mapping = custom_fields_mapping
+        self.max_fetch_workers = arg_to_number(max_fetch_workers) or DEFAULT_MAX_FETCH_WORKERS
+        # validators of the feed urls stored on the last fetch, and the ones of the current fetch
+        self.sources_validators: Dict[str, dict] = {}
+        self.fetched_sources_validators: Dict[str, dict] = {}
 
     def get_feed_config(self, fields_json: str = '', indicator_json: str = ''):
         """
@@ -189,9 +196,12 @@ class Client(BaseClient):
 
         return config
 
-    def build_iterator(self, **kwargs):
+    def build_iterator(self, conditional: bool = False, **kwargs):
         """
-        For each URL (service), send an HTTP request to get indicators and return them after filtering by Regex
+        For each URL (service), send an HTTP request to get indicators and return them after filtering by Regex.
+        When there are several URLs they are fetched concurrently, and returned in the order they were fetched.
+        :param conditional: Whether to send conditional requests according to the validators stored for the URLs
+            on the last fetch. The URLs are skipped only when none of them was modified.
         :param kwargs: Arguments to send to the HTTP API endpoint
         :return: List of indicators
         """
@@ -204,23 +214,85 @@ class Client(BaseClient):
 
         if self.username is not None and self.password is not None:
             kwargs['auth'] = (self.username, self.password)
-        try:
-            urls = self._base_url
-            url_to_response_list: List[dict] = []
-            if not isinstance(urls, list):
-                urls = [urls]
-            for url in urls:
-                r = requests.get(
-                    url,
-                    **kwargs
+
+        urls = self._base_url
+        if not isinstance(urls, list):
+            urls = [urls]
+        # when fetching several URLs, read the content in the worker threads so the downloads overlap
+        prefetch_content = len(urls) > 1
+        if conditional:
+            self.sources_validators = get_feed_sources_validators()
+
+        url_to_response = dict(fetch_sources_concurrently(
+            lambda url: self.fetch_url(url, prefetch_content, conditional, **kwargs), urls, self.max_fetch_workers))
+
+        no_update = True
+        unchanged_urls = []
+        for url, r in url_to_response.items():
+            previous_validators = self.sources_validators.get(url, {})
+            validators = get_feed_response_validators(r, previous_validators)
+            self.fetched_sources_validators[url] = validators
+            no_update = get_feed_no_update_value(r, previous_validators, validators) and no_update
+            if conditional and is_feed_source_unchanged(r, previous_validators, validators):
+                unchanged_urls.append(url)
+
+        if unchanged_urls and len(unchanged_urls) == len(url_to_response):
+            demisto.debug(f'{self.feed_name!r} - none of the URLs were modified since the last fetch.')
+            return [], True
+        if unchanged_urls:
+            # the indicators of the modified URLs are created with noUpdate=False, so the unmodified ones are needed too
+            url_to_response.update(fetch_sources_concurrently(
+                lambda url: self.fetch_url(url, prefetch_content, **kwargs), unchanged_urls, self.max_fetch_workers))
+            url_to_response = {url: r for url, r in url_to_response.items() if r.status_code != 304}
+
+        results = []
+        for url, r in url_to_response.items():
+            result = r.iter_lines()
+            if self.encoding is not None:
+                result = map(
+                    lambda x: x.decode(self.encoding).encode('utf_8'),
+                    result
                 )
-                try:
-                    r.raise_for_status()
-                except Exception:
-                    LOG(f'{self.feed_name!r} - exception in request:'
-                        f' {r.status_code!r} {r.content!r}')
-                    raise
-                url_to_response_list.append({url: r})
+            else:
+                result = map(
+                    lambda x: x.decode('utf_8'),
+                    result
+                )
+            if self.ignore_regex is not None:
+                result = filter(
+                    lambda x: self.ignore_regex.match(x) is None,  # type: ignore[union-attr]
+                    result
+                )
+            results.append({url: result})
+        return results, no_update
+
+    def fetch_url(self, url: str, prefetch_content: bool = False, conditional: bool = False,
+                  **kwargs) -> requests.Response:
+        """
+        Sends the HTTP request of a single URL.
+        :param url: The URL to fetch.
+        :param prefetch_content: Whether to read the whole content of the response.
+        :param conditional: Whether to send a conditional request according to the validators stored for the URL.
+        :param kwargs: Arguments to send to the HTTP API endpoint
+        :return: The response
+        """
+        conditional_headers = get_feed_conditional_headers(self.sources_validators.get(url, {})) if conditional else {}
+        if conditional_headers:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **conditional_headers}
+        try:
+            r = requests.get(
+                url,
+                **kwargs
+            )
+            try:
+                r.raise_for_status()
+            except Exception:
+                LOG(f'{self.feed_name!r} - exception in request:'
+                    f' {r.status_code!r} {r.content!r}')
+                raise
+            if prefetch_content:
+                r.content
+            return r
         except requests.exceptions.ConnectTimeout as exception:
             err_msg = 'Connection Timeout Error - potential reasons might be that the Server URL parameter' \
                       ' is incorrect or that the Server is not accessible from your host.'
@@ -246,28 +318,6 @@ class Client(BaseClient):
                 .format(err_type, exception.errno, exception.strerror)
             raise DemistoException(err_msg, exception)
 
-        results = []
-        for url_to_response in url_to_response_list:
-            for url, lines in url_to_response.items():
-                result = lines.iter_lines()
-                if self.encoding is not None:
-                    result = map(
-                        lambda x: x.decode(self.encoding).encode('utf_8'),
-                        result
-                    )
-                else:
-                    result = map(
-                        lambda x: x.decode('utf_8'),
-                        result
-                    )
-                if self.ignore_regex is not None:
-                    result = filter(
-                        lambda x: self.ignore_regex.match(x) is None,  # type: ignore[union-attr]
-                        result
-                    )
-                results.append({url: result})
-        return results, get_no_update_value(r)
-
     def custom_fields_creator(self, attributes: dict):
         created_custom_fields = {}
         for attribute in attributes.keys():
@@ -280,42 +330,6 @@ class Client(BaseClient):
         return created_custom_fields
 
 
-def get_no_update_value(response: requests.Response) -> bool:
-    """
-    detect if the feed response has been modified according to the headers etag and last_modified.
-    For more information, see this:
-    https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Last-Modified
-    https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/ETag
-    Args:
-        response: (requests.Response) The feed response.
-    Returns:
-        boolean with the value for noUpdate argument.
-        The value should be False if the response was modified.
-    """
-
-    context = get_integration_context()
-    old_etag = context.get('etag')
-    old_last_modified = context.get('last_modified')
-
-    etag = response.headers.get('ETag')
-    last_modified = response.headers.get('Last-Modified')
-
-    set_integration_context({'last_modified': last_modified, 'etag': etag})
-
-    if old_etag and old_etag != etag:
-        demisto.debug('New indicators fetched - the ETag value has been updated,'
-                      ' createIndicators will be executed with noUpdate=False.')
-        return False
-
-    if old_last_modified and old_last_modified != last_modified:
-        demisto.debug('New indicators fetched - the Last-Modified value has been updated,'
-                      ' createIndicators will be executed with noUpdate=False.')
-        return False
-
-    demisto.debug('No new indicators fetched, createIndicators will be executed with noUpdate=True.')
-    return True
-
-
 def datestring_to_server_format(date_string: str) -> str:
     """
     formats a datestring to the ISO-8601 format which the server expects to recieve
@@ -504,13 +518,18 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
+            # check if the version is higher than 6.5.0 so we can use noUpdate parameter
+            use_no_update = is_demisto_version_ge('6.5.0')
+            # unmodified URLs can be skipped only when noUpdate is supported
             indicators, no_update = fetch_indicators_command(client, feed_tags, tlp_color,
                                                              params.get('indicator_type'),
                                                              params.get('auto_detect_type'),
-                                                             params.get('create_relationships'))
+                                                             params.get('create_relationships'),
+                                                             conditional=use_no_update)
 
-            # check if the version is higher than 6.5.0 so we can use noUpdate parameter
-            if is_demisto_version_ge('6.5.0'):
+            if use_no_update:
+                if not indicators:
+                    demisto.createIndicators(indicators, noUpdate=no_update)
                 # we submit the indicators in batches
                 for b in batch(indicators, batch_size=2000):
                     demisto.createIndicators(b, noUpdate=no_update)
@@ -518,6 +537,7 @@ def feed_main(feed_name, params=None, prefix=''):
                 # call createIndicators without noUpdate arg
                 for b in batch(indicators, batch_size=2000):
                     demisto.createIndicators(b)
+            save_feed_sources_validators(client.fetched_sources_validators)
 
         else:
             args = demisto.args()
@@ -1,5 +1,6 @@
 from HTTPFeedApiModule import get_indicators_command, Client, datestring_to_server_format, feed_main,\
-    fetch_indicators_command, get_no_update_value
+    fetch_indicators_command
+import hashlib
 import requests_mock
 import demistomock as demisto
 
@@ -443,41 +444,57 @@ def test_get_indicators_without_relations():
         assert indicators == expected_res
 
 
-def test_get_no_update_value_empty_context():
+def test_build_iterator_several_urls(requests_mock):
     """
     Given
-    - response with last_modified and etag headers.
+    - A feed with several URLs, where one of them fails.
 
     When
-    - Running get_no_update_value method with empty integration context.
+    - Fetching indicators.
 
     Then
-    - Ensure that the response is True.
+    - Ensure the indicators of the other URLs are fetched.
     """
-    class MockResponse:
-        headers = {'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT',  # guardrails-disable-line
-                   'etag': 'd309ab6e51ed310cf869dab0dfd0d34b'}  # guardrails-disable-line
-    no_update = get_no_update_value(MockResponse())
-    assert no_update
+    urls = ['https://feed1.com', 'https://feed2.com', 'https://feed3.com']
+    requests_mock.get(urls[0], content=b'1.1.1.1\n2.2.2.2')
+    requests_mock.get(urls[1], status_code=500)
+    requests_mock.get(urls[2], content=b'3.3.3.3')
+    client = Client(url=urls, feed_url_to_config={url: {'indicator_type': 'IP'} for url in urls})
+
+    indicators, _ = fetch_indicators_command(client, feed_tags=[], tlp_color=None, itype='IP', auto_detect=False)
+    assert sorted(indicator['value'] for indicator in indicators) == ['1.1.1.1', '2.2.2.2', '3.3.3.3']
 
 
-def test_get_no_update_value(mocker):
+def test_build_iterator_conditional_requests(mocker, requests_mock):
     """
     Given
-    - response with last_modified and etag headers with the same values like in the integration context.
+    - Two URLs with validators stored on the last fetch.
 
     When
-    - Running get_no_update_value method.
+    - Fetching indicators when none of them was modified, and then when one of them was modified.
 
     Then
-    - Ensure that the response is False
+    - Ensure no indicators are returned when none of the URLs was modified.
+    - Ensure the unmodified URL is requested again when the other URL was modified.
     """
-    mocker.patch.object(demisto, 'getIntegrationContext',
-                        return_value={'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT',  # guardrails-disable-line
-                                      'etag': 'd309ab6e51ed310cf869dab0dfd0d34b'})  # guardrails-disable-line
-
-    class MockResponse:
-        headers = {'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT',  # guardrails-disable-line
-                   'etag': 'd309ab6e51ed310cf869dab0dfd0d34b'}  # guardrails-disable-line
-    no_update = get_no_update_value(MockResponse())
+    urls = ['https://feed1.com', 'https://feed2.com']
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value={'sources_validators': {
+        urls[0]: {'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT'},  # guardrails-disable-line
+        urls[1]: {'content_hash': hashlib.sha256(b'2.2.2.2').hexdigest()},
+    }})
+    client = Client(url=urls, feed_url_to_config={url: {'indicator_type': 'IP'} for url in urls})
+
+    first = requests_mock.get(urls[0], status_code=304)
+    requests_mock.get(urls[1], content=b'2.2.2.2')
+    indicators, no_update = fetch_indicators_command(client, feed_tags=[], tlp_color=None, itype='IP',
+                                                     auto_detect=False, conditional=True)
+    assert indicators == []
+    assert no_update
+    assert first.last_request.headers['If-Modified-Since'] == 'Fri, 30 Jul 2021 00:24:13 GMT'
+
+    requests_mock.get(urls[0], [{'status_code': 304}, {'content': b'1.1.1.1'}])
+    requests_mock.get(urls[1], content=b'3.3.3.3')
+    indicators, no_update = fetch_indicators_command(client, feed_tags=[], tlp_color=None, itype='IP',
+                                                     auto_detect=False, conditional=True)
+    assert sorted(indicator['value'] for indicator in indicators) == ['1.1.1.1', '3.3.3.3']
     assert not no_update
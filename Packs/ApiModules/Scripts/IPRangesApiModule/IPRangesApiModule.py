@@ -0,0 +1,78 @@
+from CommonServerPython import *
+
+import ipaddress
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+# The number of IP ranges lists whose indexes are kept
+IP_RANGES_INDEX_CACHE_SIZE = 32
+
+
+class IPRangesIndex:
+    """
+    An index of IP ranges, for matching many IP addresses against them.
+    The ranges are kept per IP version as sorted, non-overlapping intervals of integers,
+    so an IP address is matched by a binary search instead of by checking each of the ranges.
+    """
+
+    def __init__(self, ip_ranges: Iterable[str]):
+        """
+        :type ip_ranges: ``Iterable[str]``
+        :param ip_ranges: The IP ranges in CIDR notation, or single IP addresses.
+        """
+        intervals: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+        for ip_range in ip_ranges:
+            network = ipaddress.ip_network(ip_range, strict=False)
+            intervals[network.version].append((int(network.network_address), int(network.broadcast_address)))
+
+        self.starts: Dict[int, List[int]] = {}
+        self.ends: Dict[int, List[int]] = {}
+        for version, version_intervals in intervals.items():
+            starts: List[int] = []
+            ends: List[int] = []
+            for start, end in sorted(version_intervals):
+                if ends and start <= ends[-1] + 1:
+                    # overlapping or adjacent to the previous interval
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.starts[version] = starts
+            self.ends[version] = ends
+
+    def __contains__(self, ip: str) -> bool:
+        ip_address = ipaddress.ip_address(ip)
+        ip_int = int(ip_address)
+        interval_index = bisect_right(self.starts[ip_address.version], ip_int) - 1
+        return interval_index >= 0 and ip_int <= self.ends[ip_address.version][interval_index]
+
+    def classify(self, ips: Iterable[str]) -> List[bool]:
+        """
+        Matches IP addresses against the ranges.
+
+        :type ips: ``Iterable[str]``
+        :param ips: The IP addresses to match.
+
+        :return: Whether each of the IP addresses is in one of the ranges.
+        :rtype: ``List[bool]``
+        """
+        return [ip in self for ip in ips]
+
+
+@lru_cache(maxsize=IP_RANGES_INDEX_CACHE_SIZE)
+def _get_ip_ranges_index(ip_ranges: Tuple[str, ...]) -> IPRangesIndex:
+    return IPRangesIndex(ip_ranges)
+
+
+def get_ip_ranges_index(ip_ranges: Iterable[str]) -> IPRangesIndex:
+    """
+    Gets the index of IP ranges, which is built once for each content of the ranges list.
+
+    :type ip_ranges: ``Iterable[str]``
+    :param ip_ranges: The IP ranges in CIDR notation, or single IP addresses.
+
+    :return: The index of the IP ranges.
+    :rtype: ``IPRangesIndex``
+    """
+    return _get_ip_ranges_index(tuple(sorted(set(ip_ranges))))
@@ -0,0 +1,73 @@
+import pytest
+from IPRangesApiModule import IPRangesIndex, get_ip_ranges_index
+
+IP_RANGES = ['10.0.0.0/8', '172.16.0.0/12', '172.20.0.0/16', '192.168.1.0/24', '192.168.2.0/24', '8.8.8.8',
+             '2001:db8::/32']
+
+
+@pytest.mark.parametrize('ip, expected', [
+    ('10.5.5.5', True),
+    ('11.0.0.0', False),
+    ('172.31.255.255', True),
+    ('172.32.0.0', False),
+    ('192.168.2.255', True),
+    ('192.168.3.0', False),
+    ('8.8.8.8', True),
+    ('8.8.8.9', False),
+    ('0.0.0.0', False),
+    ('2001:db8::1', True),
+    ('2001:db9::1', False),
+    ('::ffff:a00:1', False),  # an IPv6 address is not in IPv4 ranges
+])
+def test_ip_ranges_index(ip, expected):
+    """
+    Given:
+        IP ranges which are overlapping, adjacent, single addresses and of both IP versions.
+    When:
+        Matching an IP address against them.
+    Then:
+        Validating the IP address is matched only if it is in one of the ranges.
+    """
+    assert (ip in IPRangesIndex(IP_RANGES)) is expected
+
+
+def test_ip_ranges_index_merges_ranges():
+    """
+    Given:
+        Overlapping and adjacent IP ranges.
+    When:
+        Building the index.
+    Then:
+        Validating the ranges are merged into non-overlapping intervals.
+    """
+    index = IPRangesIndex(IP_RANGES)
+    assert len(index.starts[4]) == 4
+    assert len(index.starts[6]) == 1
+
+
+def test_classify():
+    """
+    Given:
+        IP addresses and IP ranges.
+    When:
+        Classifying the IP addresses.
+    Then:
+        Validating the results are the same as matching each IP address with netaddr.
+    """
+    from netaddr import IPAddress, IPNetwork
+    ips = [f'{a}.{b}.{c}.1' for a in (8, 10, 172, 192) for b in (8, 16, 20, 31, 168) for c in (0, 1, 2, 8)]
+    expected = [any(IPAddress(ip) in IPNetwork(ip_range) for ip_range in IP_RANGES) for ip in ips]
+    assert IPRangesIndex(IP_RANGES).classify(ips) == expected
+
+
+def test_get_ip_ranges_index_is_cached():
+    """
+    Given:
+        The same IP ranges in a different order.
+    When:
+        Getting their index.
+    Then:
+        Validating the index is built once.
+    """
+    assert get_ip_ranges_index(IP_RANGES) is get_ip_ranges_index(list(reversed(IP_RANGES)))
+    assert get_ip_ranges_index(IP_RANGES) is not get_ip_ranges_index(IP_RANGES[:2])
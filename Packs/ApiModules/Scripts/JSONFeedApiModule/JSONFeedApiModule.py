@@ -1,20 +1,269 @@
 from CommonServerPython import *
 
 ''' IMPORTS '''
+import codecs
 import urllib3
 import jmespath
-from typing import List, Dict, Union, Optional, Callable, Tuple
+from typing import Any, List, Dict, Union, Optional, Callable, Tuple, Iterable, Iterator
 
 # disable insecure warnings
 urllib3.disable_warnings()
 
+STREAMING_CHUNK_SIZE = 64 * 1024
+CREATE_INDICATORS_BATCH_SIZE = 2000
+DEFAULT_MAX_FETCH_WORKERS = 10
+
+# An extractor can be evaluated over the response stream when it is a plain path of keys (or '@') to an array,
+# optionally followed by a projection ([*], [] or a [?filter]) that is applied to each item of that array.
+STREAMING_EXTRACTOR_REGEX = re.compile(r'^(?P<path>@|[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)'
+                                       r'(?P<projection>(?:\[\*\]|\[\]|\[\?).*)?$', re.DOTALL)
+PIPE_REGEX = re.compile(r'(?<!\|)\|(?!\|)')
+
+
+class JSONStreamReader:
+    """
+    Walks a JSON document which is read incrementally from an iterable of text chunks.
+    Only the values that are actually read are decoded, values that are skipped are only scanned,
+    so the memory in use is bounded by the size of the largest single value read and not by the document size.
+    """
+    NON_WHITESPACE_REGEX = re.compile(r'\S')
+    STRUCTURE_REGEX = re.compile(r'["{}\[\]]')
+    STRING_END_REGEX = re.compile(r'["\\]')
+    SCALAR_END_REGEX = re.compile(r'[\s,\]}]')
+    COMPACT_THRESHOLD = 1024 * 1024
+    DECODER = json.JSONDecoder()
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+        self._pos = 0
+
+    def _fill(self) -> bool:
+        """Appends the next chunk of the stream to the buffer. Returns False when the stream is exhausted."""
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += chunk
+                return True
+        return False
+
+    def _fill_at_least(self, size: int) -> bool:
+        """Appends at least size characters to the buffer (unless the stream ends). Returns False if none were added."""
+        buffer_size = len(self._buffer)
+        while len(self._buffer) - buffer_size < size and self._fill():
+            pass
+        return len(self._buffer) > buffer_size
+
+    def _compact(self):
+        if self._pos >= self.COMPACT_THRESHOLD:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+    def _search(self, regex, pos: int):
+        """Searches the regex in the buffer from pos, reading more of the stream until it is found or exhausted."""
+        match = regex.search(self._buffer, pos)
+        while match is None:
+            searched = len(self._buffer)
+            if not self._fill():
+                return None
+            match = regex.search(self._buffer, max(pos, searched))
+        return match
+
+    def peek(self) -> str:
+        """Skips whitespaces and returns the next character in the stream, or an empty string at its end."""
+        match = self._search(self.NON_WHITESPACE_REGEX, self._pos)
+        if match is None:
+            self._pos = len(self._buffer)
+            return ''
+        self._pos = match.start()
+        return self._buffer[self._pos]
+
+    def expect(self, chars: str) -> str:
+        """Consumes the next character in the stream, which must be one of the given characters."""
+        char = self.peek()
+        if not char:
+            raise ValueError('Unexpected end of the JSON stream')
+        if char not in chars:
+            raise ValueError(f'Expected one of {list(chars)} but got {char!r} in the JSON stream')
+        self._pos += 1
+        return char
+
+    def _string_end(self, pos: int) -> int:
+        """Returns the position after the closing quote of the string whose opening quote is at pos."""
+        pos += 1
+        while True:
+            match = self._search(self.STRING_END_REGEX, pos)
+            if match is None:
+                raise ValueError('Unexpected end of the JSON stream')
+            if match.group() == '"':
+                return match.end()
+            # skip the escaped character
+            pos = match.end() + 1
+
+    def _value_end(self) -> int:
+        """Returns the position after the end of the value which starts at the current position."""
+        char = self.peek()
+        if not char:
+            raise ValueError('Unexpected end of the JSON stream')
+        if char == '"':
+            return self._string_end(self._pos)
+        if char not in '{[':
+            match = self._search(self.SCALAR_END_REGEX, self._pos)
+            return match.start() if match else len(self._buffer)
+
+        depth = 0
+        pos = self._pos
+        while True:
+            match = self._search(self.STRUCTURE_REGEX, pos)
+            if match is None:
+                raise ValueError('Unexpected end of the JSON stream')
+            token = match.group()
+            if token == '"':
+                pos = self._string_end(match.start())
+                continue
+            pos = match.end()
+            depth += 1 if token in '{[' else -1
+            if depth == 0:
+                return pos
+
+    def read_value(self) -> Any:
+        """Decodes and consumes the value at the current position."""
+        char = self.peek()
+        if not char:
+            raise ValueError('Unexpected end of the JSON stream')
+        if char not in '"{[':
+            # a number cut at the end of the buffer (e.g. after '.' or 'e') still decodes to a shorter number,
+            # so read on until its terminator (or the end of the stream) is in the buffer
+            self._search(self.SCALAR_END_REGEX, self._pos)
+        while True:
+            try:
+                value, end = self.DECODER.raw_decode(self._buffer, self._pos)
+                break
+            except ValueError:
+                # the value may continue in the next chunks, read at least as much as we already have of it
+                if not self._fill_at_least(len(self._buffer) - self._pos):
+                    raise
+        self._pos = end
+        self._compact()
+        return value
+
+    def skip_value(self):
+        """Consumes the value at the current position without decoding it."""
+        self._pos = self._value_end()
+        self._compact()
+
+    def find_path(self, keys: List[str]) -> bool:
+        """
+        Moves the reader to the value found under the given path of object keys.
+        Returns False if the path does not exist in the document.
+        """
+        for key in keys:
+            if self.peek() != '{':
+                return False
+            self.expect('{')
+            if self.peek() == '}':
+                return False
+            while True:
+                current_key = self.read_value()
+                self.expect(':')
+                if current_key == key:
+                    break
+                self.skip_value()
+                if self.expect(',}') == '}':
+                    return False
+        return True
+
+    def iter_array(self) -> Iterator[Any]:
+        """Yields the items of the array at the current position one by one."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.expect(']')
+            return
+        while True:
+            yield self.read_value()
+            if self.expect(',]') == ']':
+                return
+
+
+def parse_streaming_extractor(extractor: str) -> Optional[Tuple[List[str], str]]:
+    """
+    Splits a JMESPath extractor to the path of keys which leads to the indicators array and the projection
+    which should be applied to each of its items.
+    Args:
+        extractor: (str) The JMESPath extractor of the feed.
+    Returns:
+        A tuple of the keys path and the item projection expression (empty when there is no projection),
+        or None if the extractor can not be evaluated over the response stream.
+    """
+    match = STREAMING_EXTRACTOR_REGEX.match((extractor or '@').strip())
+    if not match:
+        return None
+    path = match.group('path')
+    projection = match.group('projection') or ''
+    if PIPE_REGEX.search(projection):
+        return None
+    keys = [] if path == '@' else path.split('.')
+    return keys, projection
+
+
+def iter_decoded_chunks(response: requests.Response, chunk_size: int = STREAMING_CHUNK_SIZE) -> Iterator[str]:
+    """Yields the response content as text chunks, decoded incrementally with the response encoding."""
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8-sig')(errors='replace')
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_extracted_items(chunks: Iterable[str], extractor: str) -> Iterator[Any]:
+    """
+    Evaluates a streamable JMESPath extractor over a JSON document read from text chunks,
+    yielding the extracted items one at a time.
+    Args:
+        chunks: (Iterable[str]) The JSON document text chunks.
+        extractor: (str) A JMESPath extractor accepted by parse_streaming_extractor.
+    Returns:
+        An iterator over the items the extractor selects, in the same order as jmespath.search would return them.
+    """
+    parsed_extractor = parse_streaming_extractor(extractor)
+    if parsed_extractor is None:
+        raise ValueError(f'The extractor {extractor} can not be evaluated over a stream')
+    keys, projection = parsed_extractor
+    item_expression = jmespath.compile(projection) if projection else None
+
+    reader = JSONStreamReader(chunks)
+    if not reader.find_path(keys):
+        return
+    if reader.peek() != '[':
+        # not an array, behave like iterating over the result of jmespath.search
+        value = reader.read_value()
+        if item_expression is not None:
+            value = item_expression.search(value)
+        if isinstance(value, (list, dict)):
+            yield from value
+        return
+
+    for item in reader.iter_array():
+        if item_expression is None:
+            yield item
+        elif projection == '[*]':
+            # a plain projection only drops the nulls, avoid evaluating it for every item
+            if item is not None:
+                yield item
+        else:
+            # projections are evaluated item by item, evaluating one on a single item list yields its part
+            yield from item_expression.search([item]) or []
+
 
 class Client:
     def __init__(self, url: str = '', credentials: dict = None,
                  feed_name_to_config: Dict[str, dict] = None, source_name: str = 'JSON',
                  extractor: str = '', indicator: str = 'indicator',
                  insecure: bool = False, cert_file: str = None, key_file: str = None, headers: Union[dict, str] = None,
-                 tlp_color: Optional[str] = None, data: Union[str, dict] = None, **_):
+                 tlp_color: Optional[str] = None, data: Union[str, dict] = None, stream_json: bool = False,
+                 max_fetch_workers: int = DEFAULT_MAX_FETCH_WORKERS, **_):
         """
         Implements class for miners of JSON feeds over http/https.
         :param url: URL of the feed.
@@ -36,6 +285,12 @@ class Client:
         :param data: Data to post. If not specified will do a GET request. May also be passed as dict as
             supported by requests. If passed as a string will set content-type to
             application/x-www-form-urlencoded if not specified in the headers.
+        :param stream_json: if *True* the extractor is evaluated over the response stream and the indicators
+            are yielded one at a time instead of loading the whole response to memory.
+            Can be overridden per feed with the 'stream_json' key of the feed config.
+            Only extractors of the form 'path.to.array' optionally followed by [*], [] or a [?filter] projection
+            are streamed, any other extractor falls back to parsing the whole response.
+        :param max_fetch_workers: the maximal number of feeds fetched concurrently. Default: 10
 
          Example:
             Example feed config:
@@ -77,6 +332,11 @@ class Client:
         self.cert = (cert_file, key_file) if cert_file and key_file else None
         self.tlp_color = tlp_color
         self.post_data = data
+        self.stream_json = argToBoolean(stream_json) if stream_json else False
+        self.max_fetch_workers = arg_to_number(max_fetch_workers) or DEFAULT_MAX_FETCH_WORKERS
+        # validators of the feeds urls stored on the last fetch, and the ones of the current fetch
+        self.sources_validators: Dict[str, dict] = {}
+        self.fetched_sources_validators: Dict[str, dict] = {}
 
         if isinstance(self.post_data, str):
             content_type_header = 'Content-Type'
@@ -106,15 +366,40 @@ class Client:
         else:
             return headers
 
-    def build_iterator(self, feed: dict, **kwargs) -> Tuple[List, bool]:
+    def should_stream(self, feed: dict) -> bool:
+        """Checks whether the feed response should be streamed, which requires a streamable extractor."""
+        if not argToBoolean(feed.get('stream_json', self.stream_json)):
+            return False
+        if parse_streaming_extractor(feed.get('extractor', '@')) is None:
+            demisto.debug(f'The extractor {feed.get("extractor")} can not be evaluated over the response stream,'
+                          f' parsing the whole response.')
+            return False
+        return True
+
+    def build_iterator(self, feed: dict, conditional: bool = False, **kwargs) -> Tuple[Optional[Iterable], bool]:
+        """
+        Requests the feed and extracts its items.
+        :param feed: the feed config
+        :param conditional: whether to send a conditional request according to the validators stored for the feed url
+            on the last fetch. If the feed was not modified its items are not extracted and None is returned instead.
+        :param kwargs: arguments to send with the request
+        :return: the items of the feed and the noUpdate value
+        """
         url = feed.get('url', self.url)
+        stream = self.should_stream(feed)
+        if stream:
+            kwargs['stream'] = True
+        previous_validators = self.sources_validators.get(url, {})
+        headers = dict(self.headers)
+        if conditional:
+            headers.update(get_feed_conditional_headers(previous_validators))
         if not self.post_data:
             r = requests.get(
                 url=url,
                 verify=self.verify,
                 auth=self.auth,
                 cert=self.cert,
-                headers=self.headers,
+                headers=headers,
                 **kwargs
             )
         else:
@@ -124,55 +409,41 @@ class Client:
                 verify=self.verify,
                 auth=self.auth,
                 cert=self.cert,
-                headers=self.headers,
+                headers=headers,
                 **kwargs
             )
 
         try:
             r.raise_for_status()
-            data = r.json()
-            result = jmespath.search(expression=feed.get('extractor'), data=data)
+            # a streamed response is not hashed, as hashing requires reading all of it
+            validators = get_feed_response_validators(r, previous_validators, hash_content=not stream)
+            self.fetched_sources_validators[url] = validators
+            no_update = get_feed_no_update_value(r, previous_validators, validators)
+            if conditional and is_feed_source_unchanged(r, previous_validators, validators):
+                demisto.debug(f'The feed {url} was not modified since the last fetch, skipping it.')
+                r.close()
+                return None, True
+
+            if stream:
+                result = self.iter_streamed_items(r, feed.get('extractor', '@'))
+            else:
+                data = r.json()
+                result = jmespath.search(expression=feed.get('extractor'), data=data)
 
         except ValueError as VE:
             raise ValueError(f'Could not parse returned data to Json. \n\nError massage: {VE}')
 
-        return result, get_no_update_value(r)
-
-
-def get_no_update_value(response: requests.Response) -> bool:
-    """
-    detect if the feed response has been modified according to the headers etag and last_modified.
-    For more information, see this:
-    https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Last-Modified
-    https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/ETag
-    Args:
-        response: (requests.Response) The feed response.
-    Returns:
-        boolean with the value for noUpdate argument.
-        The value should be False if the response was modified.
-    """
-
-    context = get_integration_context()
-    old_etag = context.get('etag')
-    old_last_modified = context.get('last_modified')
+        return result, no_update
 
-    etag = response.headers.get('ETag')
-    last_modified = response.headers.get('Last-Modified')
-
-    set_integration_context({'last_modified': last_modified, 'etag': etag})
-
-    if old_etag and old_etag != etag:
-        demisto.debug('New indicators fetched - the ETag value has been updated,'
-                      ' createIndicators will be executed with noUpdate=False.')
-        return False
-
-    if old_last_modified and old_last_modified != last_modified:
-        demisto.debug('New indicators fetched - the Last-Modified value has been updated,'
-                      ' createIndicators will be executed with noUpdate=False.')
-        return False
-
-    demisto.debug('No new indicators fetched, createIndicators will be executed with noUpdate=True.')
-    return True
+    @staticmethod
+    def iter_streamed_items(response: requests.Response, extractor: str) -> Iterator[Any]:
+        """Yields the items the extractor selects from the streamed response, closing it once done."""
+        try:
+            yield from iter_extracted_items(iter_decoded_chunks(response), extractor)
+        except ValueError as VE:
+            raise ValueError(f'Could not parse returned data to Json. \n\nError massage: {VE}')
+        finally:
+            response.close()
 
 
 def test_module(client: Client, limit) -> str:
@@ -185,30 +456,69 @@ def test_module(client: Client, limit) -> str:
     return 'ok'
 
 
-def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list, auto_detect: bool,
-                             create_relationships: bool = False, limit: int = 0, **kwargs) -> Tuple[List[dict], bool]:
+def get_feeds_results(client: Client, limit: int = 0, conditional: bool = False,
+                      **kwargs) -> Tuple[Dict[str, Iterable], bool]:
     """
-    Fetches the indicators from client.
+    Requests all the feeds of the client, concurrently when there are several feeds.
     :param client: Client of a JSON Feed
-    :param indicator_type: the default indicator type
-    :param feedTags: the indicator tags
-    :param auto_detect: a boolean indicates if we should automatically detect the indicator_type
-    :param limit: given only when get-indicators command is running. function will return number indicators as the limit
-    :param create_relationships: whether to add connected indicators
+    :param limit: given only when get-indicators command is running, passed to custom build iterators
+    :param conditional: whether to skip the feeds which were not modified since the last fetch. Unmodified feeds
+        are skipped only when all the feeds were not modified, as noUpdate applies to all the created indicators.
+    :return: a dict of the items of each feed in the order the feeds were fetched, which may be lazy iterators
+        when streaming, and the noUpdate value
     """
-    indicators: List[dict] = []
-    feeds_results = {}
-    no_update = False
-    for feed_name, feed in client.feed_name_to_config.items():
+    def fetch_feed(feed_name: str, conditional_request: bool = False) -> Tuple[Optional[Iterable], Optional[bool]]:
+        feed = client.feed_name_to_config[feed_name]
         custom_build_iterator = feed.get('custom_build_iterator')
         if custom_build_iterator:
             indicators_from_feed = custom_build_iterator(client, feed, limit, **kwargs)
             if not isinstance(indicators_from_feed, list):
                 raise Exception("Custom function to handle with pagination must return a list type")
-            feeds_results[feed_name] = indicators_from_feed
-        else:
-            feeds_results[feed_name], no_update = client.build_iterator(feed, **kwargs)
-
+            return indicators_from_feed, None
+        return client.build_iterator(feed, conditional=conditional_request, **kwargs)
+
+    if conditional:
+        client.sources_validators = get_feed_sources_validators()
+
+    feed_names = list(client.feed_name_to_config.keys())
+    feeds_results: Dict[str, Optional[Iterable]] = {}
+    feeds_no_update: Dict[str, Optional[bool]] = {}
+    for feed_name, (items, feed_no_update) in fetch_sources_concurrently(
+            lambda name: fetch_feed(name, conditional), feed_names, client.max_fetch_workers):
+        feeds_results[feed_name] = items
+        feeds_no_update[feed_name] = feed_no_update
+
+    unchanged_feeds = [feed_name for feed_name, items in feeds_results.items() if items is None]
+    if unchanged_feeds and len(unchanged_feeds) == len(feeds_results):
+        demisto.debug('None of the feeds were modified since the last fetch.')
+        return {}, True
+    if unchanged_feeds:
+        # the indicators of the modified feeds are created with noUpdate=False, so the unmodified feeds are needed too
+        for feed_name, (items, feed_no_update) in fetch_sources_concurrently(fetch_feed, unchanged_feeds,
+                                                                             client.max_fetch_workers):
+            feeds_results[feed_name] = items
+            feeds_no_update[feed_name] = feed_no_update
+        feeds_results = {feed_name: items for feed_name, items in feeds_results.items() if items is not None}
+
+    # noUpdate only when none of the feeds fetched without a custom function was modified
+    feeds_no_update_values = [value for value in feeds_no_update.values() if value is not None]
+    no_update = bool(feeds_no_update_values) and all(feeds_no_update_values)
+    return feeds_results, no_update  # type: ignore[return-value]
+
+
+def iter_indicators(client: Client, feeds_results: Dict[str, Iterable], indicator_type: str, feedTags: list,
+                    auto_detect: bool, create_relationships: bool = False, limit: int = 0) -> Iterator[dict]:
+    """
+    Yields the indicators created from the feeds items one at a time.
+    :param client: Client of a JSON Feed
+    :param feeds_results: the items of each feed, as returned from get_feeds_results
+    :param indicator_type: the default indicator type
+    :param feedTags: the indicator tags
+    :param auto_detect: a boolean indicates if we should automatically detect the indicator_type
+    :param create_relationships: whether to add connected indicators
+    :param limit: given only when get-indicators command is running. the number of indicators to take from each feed
+    """
+    indicators_count = 0
     for service_name, items in feeds_results.items():
         feed_config = client.feed_name_to_config.get(service_name, {})
         indicator_field = str(feed_config.get('indicator') if feed_config.get('indicator') else 'indicator')
@@ -222,17 +532,61 @@ def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list
             if isinstance(item, str):
                 item = {indicator_field: item}
 
-            indicators.extend(
-                handle_indicator_function(client, item, feed_config, service_name, indicator_type, indicator_field,
-                                          use_prefix_flat, feedTags, auto_detect, mapping_function,
-                                          create_relationships, create_relationships_function))
+            for indicator in handle_indicator_function(client, item, feed_config, service_name, indicator_type,
+                                                       indicator_field, use_prefix_flat, feedTags, auto_detect,
+                                                       mapping_function, create_relationships,
+                                                       create_relationships_function):
+                indicators_count += 1
+                yield indicator
 
-            if limit and len(indicators) >= limit:  # We have a limitation only when get-indicators command is
+            if limit and indicators_count >= limit:  # We have a limitation only when get-indicators command is
                 # called, and then we return for each service_name "limit" of indicators
                 break
+
+
+def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list, auto_detect: bool,
+                             create_relationships: bool = False, limit: int = 0, **kwargs) -> Tuple[List[dict], bool]:
+    """
+    Fetches the indicators from client.
+    :param client: Client of a JSON Feed
+    :param indicator_type: the default indicator type
+    :param feedTags: the indicator tags
+    :param auto_detect: a boolean indicates if we should automatically detect the indicator_type
+    :param limit: given only when get-indicators command is running. function will return number indicators as the limit
+    :param create_relationships: whether to add connected indicators
+    """
+    feeds_results, no_update = get_feeds_results(client, limit, **kwargs)
+    indicators = list(iter_indicators(client, feeds_results, indicator_type, feedTags, auto_detect,
+                                      create_relationships, limit))
     return indicators, no_update
 
 
+def create_indicators_in_batches(indicators: Iterable[dict], no_update: bool,
+                                 batch_size: int = CREATE_INDICATORS_BATCH_SIZE) -> int:
+    """
+    Creates the indicators in batches as they are consumed from the iterable,
+    so only a single batch of indicators is held in memory at a time.
+    :param indicators: the indicators to create
+    :param no_update: the noUpdate value, used only when the server version supports it
+    :param batch_size: the number of indicators created in a single createIndicators call
+    :return: the number of indicators created
+    """
+    # check if the version is higher than 6.5.0 so we can use noUpdate parameter
+    kwargs = {'noUpdate': no_update} if is_demisto_version_ge('6.5.0') else {}
+    total = 0
+    indicators_batch: List[dict] = []
+    for indicator in indicators:
+        indicators_batch.append(indicator)
+        if len(indicators_batch) >= batch_size:
+            demisto.createIndicators(indicators_batch, **kwargs)
+            total += len(indicators_batch)
+            indicators_batch = []
+    if indicators_batch or not total:
+        demisto.createIndicators(indicators_batch, **kwargs)
+        total += len(indicators_batch)
+    return total
+
+
 def indicator_mapping(mapping: Dict, indicator: Dict, attributes: Dict):
     for map_key in mapping:
         if map_key in attributes:
@@ -373,24 +727,11 @@ def feed_main(params, feed_name, prefix):
 
         elif command == 'fetch-indicators':
             create_relationships = params.get('create_relationships')
-            indicators, no_update = fetch_indicators_command(client, indicator_type, feedTags, auto_detect,
-                                                             create_relationships)
-
-            # check if the version is higher than 6.5.0 so we can use noUpdate parameter
-            if is_demisto_version_ge('6.5.0'):
-                if not indicators:
-                    demisto.createIndicators(indicators, noUpdate=no_update)
-                else:
-                    for b in batch(indicators, batch_size=2000):
-                        demisto.createIndicators(b, noUpdate=no_update)
-
-            else:
-                # call createIndicators without noUpdate arg
-                if not indicators:
-                    demisto.createIndicators(indicators)
-                else:
-                    for b in batch(indicators, batch_size=2000):
-                        demisto.createIndicators(b)
+            # unmodified feeds can be skipped only when noUpdate is supported
+            feeds_results, no_update = get_feeds_results(client, conditional=is_demisto_version_ge('6.5.0'))
+            create_indicators_in_batches(iter_indicators(client, feeds_results, indicator_type, feedTags, auto_detect,
+                                                         create_relationships), no_update)
+            save_feed_sources_validators(client.fetched_sources_validators)
 
         elif command == f'{prefix}get-indicators':
             # dummy command for testing
@@ -1,4 +1,8 @@
-from JSONFeedApiModule import Client, fetch_indicators_command, jmespath, get_no_update_value
+from JSONFeedApiModule import Client, fetch_indicators_command, jmespath, \
+    iter_extracted_items, parse_streaming_extractor, create_indicators_in_batches, get_feeds_results, iter_indicators, \
+    JSONStreamReader
+import hashlib
+import pytest
 from CommonServerPython import *
 import requests_mock
 import demistomock as demisto
@@ -165,41 +169,200 @@ Stam : Ba
     assert len(res) == 3
 
 
-def test_get_no_update_value_empty_context():
+def test_json_feed_conditional_requests(mocker):
     """
     Given
-    - response with last_modified and etag headers.
+    - Two feeds with validators stored on the last fetch.
 
     When
-    - Running get_no_update_value method with empty integration context.
+    - Fetching indicators when none of them was modified, and then when one of them was modified.
 
     Then
-    - Ensure that the response is True.
+    - Ensure conditional requests are sent, and no indicators are returned when none of the feeds was modified.
+    - Ensure the unmodified feed is requested again when the other feed was modified.
     """
-    class MockResponse:
-        headers = {'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT',  # guardrails-disable-line
-                   'etag': 'd309ab6e51ed310cf869dab0dfd0d34b'}  # guardrails-disable-line
-    no_update = get_no_update_value(MockResponse())
-    assert no_update
+    feed_name_to_config = {
+        'First': {'url': 'https://feed1.com', 'extractor': 'items', 'indicator': 'value', 'indicator_type': 'IP'},
+        'Second': {'url': 'https://feed2.com', 'extractor': 'items', 'indicator': 'value', 'indicator_type': 'IP'},
+    }
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value={'sources_validators': {
+        'https://feed1.com': {'etag': 'etag1'},
+        'https://feed2.com': {'content_hash': hashlib.sha256(b'{"items": [{"value": "2.2.2.2"}]}').hexdigest()},
+    }})
+    client = Client(feed_name_to_config=feed_name_to_config, insecure=True)
+
+    with requests_mock.Mocker() as m:
+        first = m.get('https://feed1.com', status_code=304, headers={'ETag': 'etag1'})
+        m.get('https://feed2.com', content=b'{"items": [{"value": "2.2.2.2"}]}')
+
+        feeds_results, no_update = get_feeds_results(client, conditional=True)
+        assert feeds_results == {}
+        assert no_update
+        assert first.last_request.headers['If-None-Match'] == 'etag1'
+
+    with requests_mock.Mocker() as m:
+        m.get('https://feed1.com', [{'status_code': 304, 'headers': {'ETag': 'etag1'}},
+                                    {'json': {'items': [{'value': '1.1.1.1'}]}, 'headers': {'ETag': 'etag1'}}])
+        m.get('https://feed2.com', content=b'{"items": [{"value": "3.3.3.3"}]}')
+
+        feeds_results, no_update = get_feeds_results(client, conditional=True)
+        indicators = list(iter_indicators(client, feeds_results, 'IP', [], False))
+        assert sorted(indicator['value'] for indicator in indicators) == ['1.1.1.1', '3.3.3.3']
+        assert not no_update
+        assert 'If-None-Match' not in m.request_history[-1].headers
+
+
+@pytest.mark.parametrize('extractor, expected', [
+    ('@', ([], '')),
+    ('prefixes', (['prefixes'], '')),
+    ("prefixes[?service=='AMAZON']", (['prefixes'], "[?service=='AMAZON']")),
+    ('data.indicators[*].value', (['data', 'indicators'], '[*].value')),
+    ('prefixes[0]', None),
+    ('prefixes[*] | [0]', None),
+    ('length(prefixes)', None),
+])
+def test_parse_streaming_extractor(extractor, expected):
+    assert parse_streaming_extractor(extractor) == expected
+
+
+@pytest.mark.parametrize('extractor', [
+    "prefixes[?service=='AMAZON']",
+    'prefixes[*].ip_prefix',
+    'ipv6_prefixes',
+    '@',
+    'syncToken',
+    'no.such.path',
+])
+@pytest.mark.parametrize('chunk_size', [7, 64, 1024 * 1024])
+def test_iter_extracted_items(extractor, chunk_size):
+    """
+    Given
+    - A JSON document split to chunks of different sizes.
+
+    When
+    - Evaluating a streamable extractor over the chunks.
+
+    Then
+    - Ensure the items are the same items jmespath.search returns for the whole document.
+    """
+    with open('test_data/amazon_ip_ranges.json') as ip_ranges_json:
+        text = ip_ranges_json.read()
+    text = text.replace('"syncToken"', '"escaped": "\\"]}{[", "syncToken"', 1)
+    expected = jmespath.search(expression=extractor, data=json.loads(text))
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+    assert list(iter_extracted_items(chunks, extractor)) == list(expected if isinstance(expected, (list, dict)) else [])
+
 
+def test_iter_extracted_items_numbers():
+    """
+    Given
+    - A JSON document of numbers, split to chunks of every size, so numbers are cut after '.', 'e' and '-'.
 
-def test_get_no_update_value(mocker):
+    When
+    - Evaluating a streamable extractor over the chunks.
+
+    Then
+    - Ensure the numbers are decoded whole.
+    """
+    text = '{"items": [-2500.0, 1, 0.1, 1e5, -3.5E-2, true, null, 10], "count": 12.75}'
+    for chunk_size in range(1, len(text) + 1):
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        assert list(iter_extracted_items(chunks, 'items')) == [-2500.0, 1, 0.1, 1e5, -3.5E-2, True, None, 10]
+        assert list(iter_extracted_items(chunks, 'count')) == []
+        reader = JSONStreamReader(chunks)
+        assert reader.find_path(['count'])
+        assert reader.read_value() == 12.75
+
+
+def test_iter_extracted_items_truncated():
+    with pytest.raises(ValueError):
+        list(iter_extracted_items(['{"items": [{"a": 1}, {"a": '], 'items'))
+
+
+def test_json_feed_streaming(mocker):
     """
     Given
-    - response with last_modified and etag headers with the same values like in the integration context.
+    - A feed configured to stream its response.
 
     When
-    - Running get_no_update_value method.
+    - Fetching indicators.
 
     Then
-    - Ensure that the response is False
+    - Ensure the response was requested as a stream and the same indicators as without streaming are returned.
     """
-    mocker.patch.object(demisto, 'getIntegrationContext',
-                        return_value={'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT',  # guardrails-disable-line
-                                      'etag': 'd309ab6e51ed310cf869dab0dfd0d34b'})  # guardrails-disable-line
-
-    class MockResponse:
-        headers = {'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT',  # guardrails-disable-line
-                   'etag': 'd309ab6e51ed310cf869dab0dfd0d34b'}  # guardrails-disable-line
-    no_update = get_no_update_value(MockResponse())
-    assert not no_update
+    with open('test_data/amazon_ip_ranges.json') as ip_ranges_json:
+        ip_ranges = json.load(ip_ranges_json)
+
+    with requests_mock.Mocker() as m:
+        m.get('https://ip-ranges.amazonaws.com/ip-ranges.json', json=ip_ranges)
+        get_mock = mocker.spy(requests, 'get')
+
+        client = Client(
+            url='https://ip-ranges.amazonaws.com/ip-ranges.json',
+            extractor="prefixes[?service=='AMAZON']",
+            indicator='ip_prefix',
+            insecure=True,
+            stream_json=True
+        )
+
+        indicators, _ = fetch_indicators_command(client=client, indicator_type='CIDR', feedTags=['test'],
+                                                 auto_detect=False)
+        assert get_mock.call_args[1].get('stream') is True
+        assert len(indicators) == 1117
+        assert indicators[0]['value'] == ip_ranges['prefixes'][0]['ip_prefix']
+
+        indicators, _ = fetch_indicators_command(client=client, indicator_type='CIDR', feedTags=['test'],
+                                                 auto_detect=False, limit=10)
+        assert len(indicators) == 10
+
+
+def test_create_indicators_in_batches(mocker):
+    """
+    Given
+    - A lazy iterable of indicators.
+
+    When
+    - Creating the indicators in batches.
+
+    Then
+    - Ensure createIndicators is called for each batch with the noUpdate value.
+    - Ensure createIndicators is called once with an empty list when there are no indicators.
+    """
+    mocker.patch('JSONFeedApiModule.is_demisto_version_ge', return_value=True)
+    create_mock = mocker.patch.object(demisto, 'createIndicators')
+
+    total = create_indicators_in_batches(({'value': str(i)} for i in range(5)), no_update=True, batch_size=2)
+    assert total == 5
+    assert [len(call[0][0]) for call in create_mock.call_args_list] == [2, 2, 1]
+    assert all(call[1] == {'noUpdate': True} for call in create_mock.call_args_list)
+
+    create_mock.reset_mock()
+    assert create_indicators_in_batches(iter([]), no_update=False) == 0
+    create_mock.assert_called_once_with([], noUpdate=False)
+
+
+def test_json_feed_several_feeds_one_fails():
+    """
+    Given
+    - A client with several feeds, where one of them fails.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure the indicators of the other feeds are fetched.
+    """
+    feed_name_to_config = {
+        'First': {'url': 'https://feed1.com', 'extractor': 'items', 'indicator': 'value', 'indicator_type': 'IP'},
+        'Failing': {'url': 'https://feed2.com', 'extractor': 'items', 'indicator': 'value', 'indicator_type': 'IP'},
+        'Last': {'url': 'https://feed3.com', 'extractor': 'items', 'indicator': 'value', 'indicator_type': 'IP'},
+    }
+    with requests_mock.Mocker() as m:
+        m.get('https://feed1.com', json={'items': [{'value': '1.1.1.1'}]})
+        m.get('https://feed2.com', status_code=500)
+        m.get('https://feed3.com', json={'items': [{'value': '3.3.3.3'}]})
+        client = Client(feed_name_to_config=feed_name_to_config, insecure=True)
+
+        indicators, _ = fetch_indicators_command(client=client, indicator_type='IP', feedTags=[], auto_detect=False)
+        assert sorted(indicator['value'] for indicator in indicators) == ['1.1.1.1', '3.3.3.3']
@@ -9,9 +9,13 @@ import subprocess
 import gevent
 from signal import SIGUSR1
 import requests
+from flask import Response
 from flask.logging import default_handler
-from typing import Any, Dict
+from typing import Any, Dict, Callable, Iterable, Iterator, List, Optional
+from itertools import islice
 import os
+import hashlib
+import zlib
 import traceback
 from string import Template
 
@@ -42,6 +46,11 @@ NGINX_SSL_CERTS = f'''
     ssl_certificate {NGINX_SSL_CRT_FILE};
     ssl_certificate_key {NGINX_SSL_KEY_FILE};
 '''
+# streaming response params
+STREAM_CHUNK_SIZE = 64 * 1024  # number of characters per streamed chunk
+STREAM_LINES_PER_CHUNK = 2000
+GZIP_COMPRESSION_LEVEL = 6
+
 NGINX_SERVER_CONF = '''
 server {
 
@@ -213,6 +222,179 @@ def test_nginx_server(port: int, params: Dict):
             demisto.error(f'failed stoping test nginx process: {ex}')
 
 
+def text_to_chunks(text: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """Splits a text to chunks of chunk_size characters
+
+    Args:
+        text (str): the text to split
+        chunk_size (int): the number of characters in each chunk
+
+    Returns:
+        Iterator[str]. the text chunks.
+    """
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
+
+
+def lines_to_chunks(lines: Iterable, delimiter: str = '\n', lines_per_chunk: int = STREAM_LINES_PER_CHUNK) -> Iterator[str]:
+    """Lazily joins lines to chunks, so that the concatenated chunks are equal to delimiter.join(lines)
+
+    Args:
+        lines (Iterable): the lines to join, consumed only as the chunks are requested
+        delimiter (str): the delimiter between lines
+        lines_per_chunk (int): the number of lines in each chunk
+
+    Returns:
+        Iterator[str]. the text chunks.
+    """
+    lines_iterator = iter(lines)
+    prefix = ''
+    while True:
+        chunk_lines = list(islice(lines_iterator, lines_per_chunk))
+        if not chunk_lines:
+            break
+        yield prefix + delimiter.join(map(str, chunk_lines))
+        prefix = delimiter
+
+
+def file_to_chunks(file, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """Reads an open text file in chunks, from its beginning
+
+    Args:
+        file: an open text file object
+        chunk_size (int): the number of characters in each chunk
+
+    Returns:
+        Iterator[str]. the file chunks.
+    """
+    file.seek(0)
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def get_text_etag(text: str) -> str:
+    """Calculates the ETag of a text which is already held in memory
+
+    Args:
+        text (str): the text
+
+    Returns:
+        str. the ETag (quoted sha1 of the text).
+    """
+    return f'"{hashlib.sha1(text.encode()).hexdigest()}"'  # guardrails-disable-line
+
+
+def count_chunks_lines(chunks: Iterable[str], empty_text: str = '',
+                       on_complete: Optional[Callable[[int], None]] = None) -> Iterator[str]:
+    """Passes the text chunks through while counting the lines, replacing a blank text with empty_text
+
+    Args:
+        chunks (Iterable[str]): the text chunks
+        empty_text (str): the text to return if the text is blank
+        on_complete (Callable[[int], None]): called with the number of lines (0 for a blank text) once the
+            chunks are exhausted
+
+    Returns:
+        Iterator[str]. the text chunks.
+    """
+    new_lines = 0
+    blank_chunks: List[str] = []
+    is_blank = True
+    for chunk in chunks:
+        new_lines += chunk.count('\n')
+        if is_blank and empty_text:
+            # hold blank chunks back until it is known whether the whole text is blank
+            blank_chunks.append(chunk)
+            if not chunk.strip():
+                continue
+            chunk = ''.join(blank_chunks)
+        if is_blank and chunk.strip():
+            is_blank = False
+        yield chunk
+    if is_blank and empty_text:
+        yield empty_text
+    if on_complete:
+        on_complete(0 if is_blank else new_lines + 1)  # add 1 as last line doesn't have a \n
+
+
+def is_gzip_accepted(accept_encoding: str) -> bool:
+    """Checks whether the client accepts a gzip encoded response, based on the Accept-Encoding header
+
+    Args:
+        accept_encoding (str): the Accept-Encoding request header value
+
+    Returns:
+        bool. True if gzip is accepted.
+    """
+    for encoding in (accept_encoding or '').split(','):
+        name, _, quality = encoding.strip().partition(';')
+        if name.strip().lower() not in ('gzip', '*'):
+            continue
+        quality = quality.strip()
+        if quality.startswith('q='):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def encode_chunks(chunks: Iterable[str], use_gzip: bool = False) -> Iterator[bytes]:
+    """Encodes text chunks to be streamed as a response body, compressing them incrementally if needed
+
+    Args:
+        chunks (Iterable[str]): the text chunks
+        use_gzip (bool): whether to gzip the chunks
+
+    Returns:
+        Iterator[bytes]. the response body chunks.
+    """
+    if not use_gzip:
+        for chunk in chunks:
+            yield chunk.encode()
+        return
+
+    compressor = zlib.compressobj(GZIP_COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def create_streaming_response(chunks: Iterable[str], accept_encoding: str, mimetype: str, headers: list,
+                              empty_text: str = '', etag: str = '',
+                              on_complete: Optional[Callable[[int], None]] = None) -> Response:
+    """Creates a flask response which streams the text chunks as they are generated, in a single pass,
+    rather than holding the text in memory as a whole.
+
+    Args:
+        chunks (Iterable[str]): the text chunks, consumed only while the response is streamed
+        accept_encoding (str): the Accept-Encoding request header value
+        mimetype (str): the response mimetype
+        headers (list): additional response headers
+        empty_text (str): the text to return if the text is blank
+        etag (str): the ETag of the text, if it is known before streaming it
+        on_complete (Callable[[int], None]): called with the number of lines once the text was streamed
+
+    Returns:
+        Response. the streaming response.
+    """
+    use_gzip = is_gzip_accepted(accept_encoding)
+    response_headers = list(headers)
+    if etag:
+        response_headers.append(('ETag', f'W/{etag}' if use_gzip else etag))
+    response_headers.append(('Vary', 'Accept-Encoding'))
+    if use_gzip:
+        response_headers.append(('Content-Encoding', 'gzip'))
+    body_chunks = count_chunks_lines(chunks, empty_text, on_complete)
+    return Response(encode_chunks(body_chunks, use_gzip), status=200, mimetype=mimetype, headers=response_headers)
+
+
 def try_parse_integer(int_to_parse: Any, err_msg: str) -> int:
     """
     Tries to parse an integer, and if fails will throw DemistoException with given err_msg
@@ -161,3 +161,100 @@ def test_nginx_log_process(nginx_cleanup, mocker: MockerFixture):
     # make sure log was rolled over files should be of size 0
     assert not Path(module.NGINX_SERVER_ACCESS_LOG).stat().st_size
     assert not Path(module.NGINX_SERVER_ERROR_LOG).stat().st_size
+
+
+def test_lines_to_chunks():
+    """
+    Given:
+        - a generator of lines
+    When:
+        - splitting it to chunks of 2 lines
+    Then:
+        - the concatenated chunks are equal to the joined lines
+        - the lines are consumed only as the chunks are requested
+    """
+    from NGINXApiModule import lines_to_chunks
+    lines = ['1.1.1.1', '2.2.2.2', '3.3.3.3', '4.4.4.4', '5.5.5.5']
+    consumed = []
+
+    def generate_lines():
+        for line in lines:
+            consumed.append(line)
+            yield line
+
+    chunks = lines_to_chunks(generate_lines(), lines_per_chunk=2)
+    assert next(chunks) == '1.1.1.1\n2.2.2.2'
+    assert consumed == lines[:2]
+    assert ''.join(chunks) == '\n3.3.3.3\n4.4.4.4\n5.5.5.5'
+    assert list(lines_to_chunks([])) == []
+
+
+def test_count_chunks_lines():
+    """
+    Given:
+        - a text split to chunks, and a blank text
+    When:
+        - streaming the chunks
+    Then:
+        - the chunks are passed through and the number of lines is reported once they are exhausted
+        - a blank text is replaced by the empty text
+    """
+    from NGINXApiModule import count_chunks_lines, text_to_chunks
+    text = 'a.com\nb.com\nc.com'
+    sizes = []
+    assert ''.join(count_chunks_lines(text_to_chunks(text, chunk_size=4), '# Empty', sizes.append)) == text
+    assert ''.join(count_chunks_lines(['', ' \n'], '# Empty', sizes.append)) == '# Empty'
+    assert ''.join(count_chunks_lines(['', ' \n', 'a.com'], '# Empty', sizes.append)) == ' \na.com'
+    assert sizes == [3, 0, 2]
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('', False),
+    ('gzip', True),
+    ('deflate, gzip;q=0.8', True),
+    ('gzip;q=0', False),
+    ('*', True),
+    ('identity', False),
+])
+def test_is_gzip_accepted(accept_encoding, expected):
+    from NGINXApiModule import is_gzip_accepted
+    assert is_gzip_accepted(accept_encoding) is expected
+
+
+def test_create_streaming_response_gzip():
+    """
+    Given:
+        - a chunked text with a known ETag and a client accepting gzip
+    When:
+        - creating a streaming response
+    Then:
+        - the body is gzipped, and decompresses to the text
+        - the ETag is weak
+    """
+    import gzip
+    from NGINXApiModule import create_streaming_response, text_to_chunks, get_text_etag
+    text = '\n'.join(f'{i}.com' for i in range(1000))
+    etag = get_text_etag(text)
+    resp = create_streaming_response(text_to_chunks(text, chunk_size=100), 'gzip', 'text/plain', headers=[], etag=etag)
+    assert gzip.decompress(b''.join(resp.response)).decode() == text
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert resp.headers['ETag'] == f'W/{etag}'
+
+
+def test_create_streaming_response_empty():
+    """
+    Given:
+        - an empty text and a client not accepting gzip
+    When:
+        - creating a streaming response with an empty text replacement
+    Then:
+        - the empty text replacement is returned, without an ETag
+        - the size is reported once the response was streamed
+    """
+    from NGINXApiModule import create_streaming_response
+    sizes = []
+    resp = create_streaming_response([], '', 'text/plain', headers=[], empty_text='# Empty', on_complete=sizes.append)
+    assert b''.join(resp.response) == b'# Empty'
+    assert 'Content-Encoding' not in resp.headers
+    assert 'ETag' not in resp.headers
+    assert sizes == [0]
@@ -6,6 +6,7 @@ Note that adding code to CommonServerUserPython can override functions in Common
 from __future__ import print_function
 
 import base64
+import hashlib
 import json
 import logging
 import os
@@ -6900,6 +6901,232 @@ H || val.SSDeep && val.SSDeep == obj.SSDeep)': {'Malicious': {'Vendor': 'Vendor'
 
 # Will add only if 'requests' module imported
 if 'requests' in sys.modules:
+    class BaseClientHTTPAdapter(HTTPAdapter):
+        """HTTPAdapter which applies the given socket options to every connection of its pools,
+        including the pools created for proxies.
+
+        :type socket_options: ``list``
+        :param socket_options: A list of (level, option, value) tuples, passed to socket.setsockopt.
+            If None, the urllib3 defaults are used.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        __attrs__ = HTTPAdapter.__attrs__ + ['_socket_options']
+
+        def __init__(self, socket_options=None, **kwargs):
+            # must be set before HTTPAdapter.__init__, which initializes the pool manager
+            self._socket_options = socket_options
+            super(BaseClientHTTPAdapter, self).__init__(**kwargs)
+
+        def init_poolmanager(self, *args, **kwargs):
+            if self._socket_options is not None:
+                kwargs['socket_options'] = self._socket_options
+            super(BaseClientHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+
+        def proxy_manager_for(self, proxy, **proxy_kwargs):
+            if self._socket_options is not None:
+                proxy_kwargs['socket_options'] = self._socket_options
+            return super(BaseClientHTTPAdapter, self).proxy_manager_for(proxy, **proxy_kwargs)
+
+    class TokenBucketRateLimiter(object):
+        """A client side token bucket rate limiter, used by BaseClient to pace its requests proactively.
+        Each request consumes a token, and tokens are refilled at a constant rate up to the bucket capacity.
+        The limiter also follows the rate limit headers returned by the server (Retry-After, X-RateLimit-Remaining
+        and X-RateLimit-Reset), pausing the requests until the server allows them again.
+
+        :type rate: ``float``
+        :param rate: The number of requests allowed per second on average.
+
+        :type capacity: ``float``
+        :param capacity: The maximum number of requests which can be sent in a burst. Defaults to max(rate, 1).
+
+        :type max_wait: ``float``
+        :param max_wait: The maximum number of seconds to wait for a request to be allowed.
+            If a longer wait is needed, a DemistoException is raised instead of blocking the command.
+
+        :type max_retries: ``int``
+        :param max_retries: How many times to resend a request which got a 429 (Too Many Requests) response,
+            after waiting as instructed by the server.
+
+        :type context_key: ``str``
+        :param context_key: If set, the limiter state is kept in the integration context under this key,
+            so consecutive runs of the integration share the same budget.
+
+        :type persist_interval: ``float``
+        :param persist_interval: The minimal number of seconds between two saves of the state to the integration
+            context. A state change caused by the server rate limit headers is always saved.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+
+        def __init__(self, rate, capacity=None, max_wait=60, max_retries=3, context_key=None, persist_interval=10):
+            if rate <= 0:
+                raise ValueError('The rate limit must be a positive number, got {}'.format(rate))
+            self._rate = float(rate)
+            self._capacity = float(capacity or max(rate, 1))
+            self._max_wait = max_wait
+            self.max_retries = max_retries
+            self._context_key = context_key
+            self._persist_interval = persist_interval
+            self._lock = Lock()
+            self._tokens = self._capacity
+            self._last_refill = time.time()
+            self._blocked_until = 0.0
+            self._last_persist = 0.0
+            if context_key:
+                self._load_state()
+
+        def _load_state(self):
+            state = get_integration_context().get(self._context_key) or {}
+            if state:
+                self._tokens = min(self._capacity, float(state.get('tokens', self._capacity)))
+                self._last_refill = float(state.get('last_refill', self._last_refill))
+                self._blocked_until = float(state.get('blocked_until', 0.0))
+
+        def _save_state(self, force=False):
+            now = time.time()
+            if not self._context_key or (not force and now - self._last_persist < self._persist_interval):
+                return
+            self._last_persist = now
+            integration_context = get_integration_context()
+            integration_context[self._context_key] = {
+                'tokens': self._tokens,
+                'last_refill': self._last_refill,
+                'blocked_until': self._blocked_until,
+            }
+            set_integration_context(integration_context)
+
+        def _refill(self, now):
+            elapsed = max(0.0, now - self._last_refill)
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+            self._last_refill = now
+
+        def acquire(self):
+            """
+            Waits until a request is allowed, and consumes a token for it.
+
+            :return: The number of seconds waited.
+            :rtype: ``float``
+            """
+            waited = 0.0
+            with self._lock:
+                while True:
+                    now = time.time()
+                    self._refill(now)
+                    wait = max(0.0, self._blocked_until - now)
+                    if not wait:
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            break
+                        wait = (1 - self._tokens) / self._rate
+                    if waited + wait > self._max_wait:
+                        raise DemistoException('Rate limit exceeded - the next request is allowed in {:.1f} seconds, '
+                                               'which is more than the maximum wait of {} seconds.'
+                                               .format(wait, self._max_wait))
+                    time.sleep(wait)
+                    waited += wait
+                self._save_state()
+            if waited:
+                demisto.debug('Rate limiter delayed the request by {:.2f} seconds'.format(waited))
+            return waited
+
+        @staticmethod
+        def _parse_retry_after(value, now):
+            """Parses a Retry-After header value, which is either a number of seconds or an HTTP date"""
+            try:
+                return max(0.0, float(value))
+            except (TypeError, ValueError):
+                pass
+            try:
+                from email.utils import parsedate_tz, mktime_tz
+                return max(0.0, mktime_tz(parsedate_tz(value)) - now)  # type: ignore[arg-type]
+            except Exception:  # noqa: disable=broad-except
+                return None
+
+        @staticmethod
+        def _parse_rate_limit_reset(value, now):
+            """Parses an X-RateLimit-Reset header value, which is either an epoch time (seconds or milliseconds)
+            or a number of seconds until the reset"""
+            try:
+                reset = float(value)
+            except (TypeError, ValueError):
+                return None
+            if reset > 1e12:
+                reset /= 1000.0
+            return max(0.0, reset - now) if reset > 1e9 else max(0.0, reset)
+
+        def update_from_response(self, response):
+            """
+            Updates the limiter according to the rate limit headers and status of a server response.
+
+            :type response: ``requests.Response``
+            :param response: The server response.
+
+            :return: The number of seconds the server asked to wait, if any.
+            :rtype: ``float``
+            """
+            headers = response.headers
+            now = time.time()
+            wait = None
+            if headers.get('Retry-After') is not None:
+                wait = self._parse_retry_after(headers.get('Retry-After'), now)
+
+            remaining = headers.get('X-RateLimit-Remaining')
+            try:
+                remaining = float(remaining) if remaining is not None else None
+            except ValueError:
+                remaining = None
+            if remaining is not None and remaining <= 0 and headers.get('X-RateLimit-Reset') is not None:
+                reset_wait = self._parse_rate_limit_reset(headers.get('X-RateLimit-Reset'), now)
+                if reset_wait is not None:
+                    wait = max(wait or 0.0, reset_wait)
+
+            with self._lock:
+                self._refill(now)
+                changed = False
+                if response.status_code == 429:
+                    self._tokens = 0.0
+                    changed = True
+                if remaining is not None and remaining < self._tokens:
+                    self._tokens = max(0.0, remaining)
+                if wait:
+                    self._blocked_until = max(self._blocked_until, now + wait)
+                    changed = True
+                self._save_state(force=changed)
+            if wait:
+                demisto.debug('Server rate limit reached, requests are paused for {:.2f} seconds'.format(wait))
+            return wait
+
+    class BatchRequestResult(object):
+        """The result of a single request sent by BaseClient._batch_http_request
+
+        :type request_spec: ``dict``
+        :param request_spec: The keyword arguments of the _http_request call.
+
+        :type result: ``Any``
+        :param result: The value returned by _http_request. None if the request failed.
+
+        :type error: ``Exception``
+        :param error: The exception raised by _http_request. None if the request succeeded.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+
+        def __init__(self, request_spec, result=None, error=None):
+            self.request_spec = request_spec
+            self.result = result
+            self.error = error
+
+        @property
+        def ok(self):
+            return self.error is None
+
+        def __repr__(self):
+            return 'BatchRequestResult(ok={}, result={!r}, error={!r})'.format(self.ok, self.result, self.error)
+
     class BaseClient(object):
         """Client to use in integrations with powerful _http_request
         :type base_url: ``str``
@@ -6926,17 +7153,51 @@ if 'requests' in sys.modules:
             The request authorization, for example: (username, password).
             Can be None.
 
+        :type pool_connections: ``int``
+        :param pool_connections: The number of connection pools (one per host) to cache.
+
+        :type pool_maxsize: ``int``
+        :param pool_maxsize: The maximum number of connections to keep open per host.
+            Should be at least the number of threads sending requests concurrently with this client.
+
+        :type pool_block: ``bool``
+        :param pool_block: Whether to wait for a free connection when all pool_maxsize connections of a host are
+            in use. If False, an extra connection is opened and discarded after the request.
+
+        :type keep_alive: ``bool``
+        :param keep_alive: Whether to reuse connections between requests (HTTP keep-alive) and enable TCP keep-alive
+            probes on them. Connections are reused one request at a time, requests are never pipelined.
+
+        :type tcp_nodelay: ``bool``
+        :param tcp_nodelay: Whether to disable Nagle's algorithm (TCP_NODELAY) on the connections.
+
+        :type rate_limiter: ``TokenBucketRateLimiter``
+        :param rate_limiter: A rate limiter which paces the client requests. Requests which got a 429 response
+            are resent once the server allows it, up to rate_limiter.max_retries times.
+
         :return: No data returned
         :rtype: ``None``
         """
 
-        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None):
+        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None,
+                     pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True, tcp_nodelay=True,
+                     rate_limiter=None):
             self._base_url = base_url
             self._verify = verify
             self._ok_codes = ok_codes
             self._headers = headers
             self._auth = auth
             self._session = requests.Session()
+            self._pool_connections = pool_connections
+            self._pool_maxsize = pool_maxsize
+            self._pool_block = pool_block
+            self._keep_alive = keep_alive
+            self._tcp_nodelay = tcp_nodelay
+            self._retry_config = None
+            self._rate_limiter = rate_limiter
+            if not keep_alive:
+                self._session.headers['Connection'] = 'close'
+            self._mount_adapter()
             if proxy:
                 ensure_proxy_has_http_prefix()
             else:
@@ -6951,6 +7212,65 @@ if 'requests' in sys.modules:
             except Exception:  # noqa
                 demisto.debug('failed to close BaseClient session with the following error:\n{}'.format(traceback.format_exc()))
 
+        def _get_socket_options(self):
+            """
+            Gets the socket options to apply on the connections, based on the client connection configuration.
+
+            :return: A list of (level, option, value) tuples.
+            :rtype: ``list``
+            """
+            socket_options = []
+            if self._tcp_nodelay:
+                socket_options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1))
+            if self._keep_alive:
+                socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            return socket_options
+
+        def _mount_adapter(self, max_retries=0):
+            """
+            Mounts an adapter with the client connection pool configuration for both http and https.
+
+            :type max_retries: ``int`` or ``Retry``
+            :param max_retries: The retry configuration of the adapter.
+
+            :return: The mounted adapter.
+            :rtype: ``BaseClientHTTPAdapter``
+            """
+            adapter = BaseClientHTTPAdapter(
+                socket_options=self._get_socket_options(),
+                pool_connections=self._pool_connections,
+                pool_maxsize=self._pool_maxsize,
+                pool_block=self._pool_block,
+                max_retries=max_retries
+            )
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+            return adapter
+
+        def _get_connection_pool_stats(self):
+            """
+            Gets the number of requests sent and connections opened by the connection pools of the client.
+            Every request which did not open a new connection reused an existing one.
+
+            :return: A dict with the requests, new_connections and reused_connections counters.
+            :rtype: ``dict``
+            """
+            stats = {'requests': 0, 'new_connections': 0, 'reused_connections': 0}
+            adapters = {id(adapter): adapter for adapter in self._session.adapters.values()}
+            for adapter in adapters.values():
+                pool_managers = [getattr(adapter, 'poolmanager', None)]
+                pool_managers.extend((getattr(adapter, 'proxy_manager', None) or {}).values())
+                for pool_manager in pool_managers:
+                    if not pool_manager:
+                        continue
+                    for pool_key in list(pool_manager.pools.keys()):
+                        pool = pool_manager.pools.get(pool_key)
+                        if pool:
+                            stats['requests'] += pool.num_requests
+                            stats['new_connections'] += pool.num_connections
+            stats['reused_connections'] = max(0, stats['requests'] - stats['new_connections'])
+            return stats
+
         def _implement_retry(self, retries=0,
                              status_list_to_retry=None,
                              backoff_factor=5,
@@ -6993,6 +7313,10 @@ if 'requests' in sys.modules:
                 if status falls in ``status_forcelist`` range and retries have
                 been exhausted.
             """
+            retry_config = (retries, tuple(status_list_to_retry or ()), backoff_factor, raise_on_redirect, raise_on_status)
+            if retry_config == getattr(self, '_retry_config', None):
+                # the adapter is already mounted, remounting it would drop the pooled connections
+                return
             try:
                 method_whitelist = "allowed_methods" if hasattr(Retry.DEFAULT, "allowed_methods") else "method_whitelist"
                 whitelist_kawargs = {
@@ -7009,9 +7333,8 @@ if 'requests' in sys.modules:
                     raise_on_redirect=raise_on_redirect,
                     **whitelist_kawargs
                 )
-                adapter = HTTPAdapter(max_retries=retry)
-                self._session.mount('http://', adapter)
-                self._session.mount('https://', adapter)
+                self._mount_adapter(max_retries=retry)
+                self._retry_config = retry_config
             except NameError:
                 pass
 
@@ -7123,20 +7446,35 @@ if 'requests' in sys.modules:
                 auth = auth if auth else self._auth
                 if retries:
                     self._implement_retry(retries, status_list_to_retry, backoff_factor, raise_on_redirect, raise_on_status)
-                # Execute
-                res = self._session.request(
-                    method,
-                    address,
-                    verify=self._verify,
-                    params=params,
-                    data=data,
-                    json=json_data,
-                    files=files,
-                    headers=headers,
-                    auth=auth,
-                    timeout=timeout,
-                    **kwargs
-                )
+                rate_limiter = getattr(self, '_rate_limiter', None)
+                rate_limit_retries = 0
+                while True:
+                    if rate_limiter:
+                        rate_limiter.acquire()
+                    # Execute
+                    res = self._session.request(
+                        method,
+                        address,
+                        verify=self._verify,
+                        params=params,
+                        data=data,
+                        json=json_data,
+                        files=files,
+                        headers=headers,
+                        auth=auth,
+                        timeout=timeout,
+                        **kwargs
+                    )
+                    if not rate_limiter:
+                        break
+                    rate_limiter.update_from_response(res)
+                    if res.status_code != 429 or rate_limit_retries >= rate_limiter.max_retries:
+                        break
+                    rate_limit_retries += 1
+                if is_debug_mode():
+                    pool_stats = self._get_connection_pool_stats()
+                    demisto.debug('Connection pool stats: {} requests, {} new connections, {} reused connections'.format(
+                        pool_stats['requests'], pool_stats['new_connections'], pool_stats['reused_connections']))
                 # Handle error responses gracefully
                 if not self._is_status_code_valid(res, ok_codes):
                     if error_handler:
@@ -7207,6 +7545,59 @@ if 'requests' in sys.modules:
                 err_msg = 'Max Retries Error- Request attempts with {} retries failed. \n{}'.format(retries, reason)
                 raise DemistoException(err_msg, exception)
 
+        def _batch_http_request(self, request_specs, max_workers=10, raise_on_error=False):
+            """
+            Sends a batch of requests concurrently on a bounded thread pool, which shares the client session
+            (and its connection pool). Every request goes through _http_request, so the client configuration
+            (headers, auth, retries, error handling) applies to each of them.
+
+            :type request_specs: ``list``
+            :param request_specs: A list of dicts, each holding the keyword arguments of a single _http_request call,
+                for example: [{'method': 'GET', 'url_suffix': '/files/hash1'}, {'method': 'GET', 'url_suffix': '/files/hash2'}]
+
+            :type max_workers: ``int``
+            :param max_workers: The maximum number of requests to send concurrently.
+                Values above the client pool_maxsize open connections which are not kept in the pool.
+                On Python 2 the requests are sent one by one, as the lock which support_multithreading adds to the
+                server calls relies on the Python 3 Lock.acquire timeout.
+
+            :type raise_on_error: ``bool``
+            :param raise_on_error: Whether to raise the error of the first failed request (by order) once all the
+                requests are done, instead of returning it in its result.
+
+            :return: The results of the requests, in the order of request_specs.
+            :rtype: ``list`` of ``BatchRequestResult``
+            """
+            if not request_specs:
+                return []
+
+            def send_request(request_spec):
+                try:
+                    return BatchRequestResult(request_spec, result=self._http_request(**request_spec))
+                except Exception as e:  # noqa: disable=broad-except
+                    return BatchRequestResult(request_spec, error=e)
+
+            workers = max(1, min(max_workers, len(request_specs))) if IS_PY3 else 1
+            if workers == 1:
+                results = [send_request(request_spec) for request_spec in request_specs]
+            else:
+                if hasattr(demisto, '_Demisto__do') and not hasattr(demisto, 'lock'):
+                    # the requests may log from the worker threads
+                    support_multithreading()
+                from multiprocessing.pool import ThreadPool
+                pool = ThreadPool(workers)
+                try:
+                    results = pool.map(send_request, request_specs)
+                finally:
+                    pool.close()
+                    pool.join()
+
+            if raise_on_error:
+                for result in results:
+                    if not result.ok:
+                        raise result.error
+            return results
+
         def _is_status_code_valid(self, response, ok_codes=None):
             """If the status code is OK, return 'True'.
 
@@ -8156,3 +8547,191 @@ def support_multithreading():
             demisto.lock.release()  # type: ignore[attr-defined]
 
     demisto._Demisto__do = locked_do  # type: ignore[attr-defined]
+
+
+def fetch_sources_concurrently(fetch_function, sources, max_workers=10):
+    """Fetches the sources with a bounded pool of worker threads, yielding each source with its result as soon as it
+    is fetched, so a slow source does not delay the others.
+    A source which fails is logged and skipped, the error is raised only if all the sources failed.
+    On Python 2 the sources are fetched one by one, as the lock which support_multithreading adds to the server calls
+    relies on the Python 3 Lock.acquire timeout.
+
+    :type fetch_function: ``Callable``
+    :param fetch_function: Fetches a single source and returns its result.
+
+    :type sources: ``list``
+    :param sources: The sources to fetch.
+
+    :type max_workers: ``int``
+    :param max_workers: The maximal number of sources fetched concurrently.
+
+    :return: An iterator over tuples of a source and its result, in the order the sources were fetched.
+    :rtype: ``Iterator[tuple]``
+    """
+    def timed_fetch(source):
+        start_time = time.time()
+        try:
+            return source, fetch_function(source), None, time.time() - start_time
+        except Exception as exception:  # noqa: disable=broad-except
+            return source, None, exception, time.time() - start_time
+
+    workers = max(1, min(max_workers, len(sources))) if IS_PY3 else 1
+    pool = None
+    if workers > 1:
+        if hasattr(demisto, '_Demisto__do') and not hasattr(demisto, 'lock'):
+            # the sources may log from the worker threads
+            support_multithreading()
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(workers)
+        outcomes = pool.imap_unordered(timed_fetch, sources)
+    else:
+        outcomes = (timed_fetch(source) for source in sources)
+
+    errors = []
+    try:
+        for source, result, error, elapsed in outcomes:
+            if error is not None:
+                demisto.error('Failed fetching {} after {:.2f} seconds: {}'.format(source, elapsed, error))
+                errors.append(error)
+                continue
+            demisto.debug('Fetched {} in {:.2f} seconds'.format(source, elapsed))
+            yield source, result
+    finally:
+        if pool is not None:
+            # do not wait for the sources which are still fetched if the caller stopped early
+            pool.close()
+
+    if errors and len(errors) == len(sources):
+        raise errors[0]
+
+
+FEED_SOURCES_VALIDATORS_CONTEXT_KEY = 'sources_validators'
+
+
+def get_feed_sources_validators():
+    """Returns the validators (etag, last_modified or content_hash) stored per feed source on the last fetch.
+
+    :return: The validators of each source, by the source URL.
+    :rtype: ``dict``
+    """
+    return get_integration_context().get(FEED_SOURCES_VALIDATORS_CONTEXT_KEY) or {}
+
+
+def save_feed_sources_validators(sources_validators):
+    """Stores the validators of the fetched feed sources, keeping the other values of the integration context.
+    Should be called only after the indicators of the sources were created, so a failed fetch is not skipped
+    on the next fetch.
+
+    :type sources_validators: ``dict``
+    :param sources_validators: The validators of each source, by the source URL.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    context = get_integration_context()
+    context[FEED_SOURCES_VALIDATORS_CONTEXT_KEY] = sources_validators
+    set_integration_context(context)
+
+
+def get_feed_conditional_headers(validators):
+    """Returns the headers of a conditional request according to the validators stored for a feed source.
+
+    :type validators: ``dict``
+    :param validators: The validators stored for the source.
+
+    :return: The If-None-Match and If-Modified-Since headers of the stored validators.
+    :rtype: ``dict``
+    """
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def get_feed_response_validators(response, previous_validators=None, hash_content=True):
+    """Returns the validators of a feed response - the etag and last_modified headers, or the hash of the content
+    when the server sends neither of them.
+
+    :type response: ``requests.Response``
+    :param response: The feed response.
+
+    :type previous_validators: ``dict``
+    :param previous_validators: The validators stored for the source, kept when the response is 304.
+
+    :type hash_content: ``bool``
+    :param hash_content: Whether to hash the content when there are no headers validators. Reads the whole content.
+
+    :return: The validators of the response.
+    :rtype: ``dict``
+    """
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    headers_validators = {key: value for key, value in (('etag', etag), ('last_modified', last_modified)) if value}
+    if response.status_code == 304:
+        validators = dict(previous_validators or {})
+        validators.update(headers_validators)
+        return validators
+
+    if not headers_validators and hash_content:
+        headers_validators['content_hash'] = hashlib.sha256(response.content).hexdigest()
+    return headers_validators
+
+
+def is_feed_source_unchanged(response, previous_validators, validators):
+    """Checks whether a feed source was not modified since the last fetch - the server answered the conditional
+    request with 304, or all the validators of the response equal the stored ones.
+
+    :type response: ``requests.Response``
+    :param response: The feed response.
+
+    :type previous_validators: ``dict``
+    :param previous_validators: The validators stored for the source on the last fetch.
+
+    :type validators: ``dict``
+    :param validators: The validators of the response, see get_feed_response_validators.
+
+    :return: True if the source was not modified.
+    :rtype: ``bool``
+    """
+    if response.status_code == 304:
+        return True
+    return bool(validators) and all(previous_validators.get(key) == value for key, value in validators.items())
+
+
+def get_feed_no_update_value(response, previous_validators=None, validators=None):
+    """Detects if a feed response has been modified according to the headers etag and last_modified,
+    or the hash of its content when the server sends neither of them.
+    For more information, see:
+    https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Last-Modified
+    https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/ETag
+
+    :type response: ``requests.Response``
+    :param response: The feed response.
+
+    :type previous_validators: ``dict``
+    :param previous_validators: The validators stored for the source on the last fetch.
+
+    :type validators: ``dict``
+    :param validators: The validators of the response, see get_feed_response_validators.
+
+    :return: The value for the noUpdate argument of createIndicators, False if the response was modified.
+    :rtype: ``bool``
+    """
+    previous_validators = previous_validators or {}
+    if validators is None:
+        validators = get_feed_response_validators(response, previous_validators)
+
+    if response.status_code == 304:
+        demisto.debug('The feed was not modified, createIndicators will be executed with noUpdate=True.')
+        return True
+
+    for key, name in (('etag', 'ETag'), ('last_modified', 'Last-Modified'), ('content_hash', 'content hash')):
+        if previous_validators.get(key) and previous_validators[key] != validators.get(key):
+            demisto.debug('New indicators fetched - the {} value has been updated,'
+                          ' createIndicators will be executed with noUpdate=False.'.format(name))
+            return False
+
+    demisto.debug('No new indicators fetched, createIndicators will be executed with noUpdate=True.')
+    return True
@@ -5,6 +5,7 @@ import json
 import re
 import os
 import sys
+import time
 import requests
 from pytest import raises, mark
 import pytest
@@ -2325,6 +2326,231 @@ class TestBaseClient:
         res = self.client._http_request('get', 'event', resp_type='response')
         assert isinstance(res, requests.Response)
 
+    def test_connection_pool_configuration(self):
+        """
+            Given
+            - A base client with a custom connection pool configuration
+
+            When
+            - Creating the client
+
+            Then
+            - Ensure an adapter with the pool configuration and socket options is mounted for http and https
+        """
+        import socket
+        from CommonServerPython import BaseClient, BaseClientHTTPAdapter
+        client = BaseClient('http://example.com/api/v2/', pool_connections=3, pool_maxsize=20, pool_block=True,
+                            keep_alive=True, tcp_nodelay=False)
+        adapter = client._session.get_adapter('https://example.com')
+        assert isinstance(adapter, BaseClientHTTPAdapter)
+        assert client._session.get_adapter('http://example.com') is adapter
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 20
+        assert adapter._pool_block is True
+        assert adapter.poolmanager.connection_pool_kw['socket_options'] == [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+    def test_connection_pool_no_keep_alive(self):
+        """
+            Given
+            - A base client with keep_alive disabled
+
+            When
+            - Creating the client
+
+            Then
+            - Ensure connections are closed after each request
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/', keep_alive=False)
+        assert client._session.headers['Connection'] == 'close'
+
+    def test_implement_retry_keeps_adapter(self):
+        """
+            Given
+            - A base client
+
+            When
+            - Implementing the same retry configuration twice, and then a different one
+
+            Then
+            - Ensure the adapter (and its pooled connections) is replaced only when the configuration changes
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/')
+        client._implement_retry(retries=3, status_list_to_retry=[429])
+        adapter = client._session.get_adapter('https://example.com')
+        assert adapter.max_retries.total == 3
+        client._implement_retry(retries=3, status_list_to_retry=[429])
+        assert client._session.get_adapter('https://example.com') is adapter
+        client._implement_retry(retries=5, status_list_to_retry=[429])
+        assert client._session.get_adapter('https://example.com').max_retries.total == 5
+
+    def test_connection_pool_stats(self):
+        """
+            Given
+            - A base client with a connection pool which sent 5 requests over 2 connections
+
+            When
+            - Getting the connection pool stats
+
+            Then
+            - Ensure 3 requests are counted as reusing a connection
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/')
+        pool = client._session.get_adapter('https://example.com').poolmanager.connection_from_url('https://example.com')
+        pool.num_requests = 5
+        pool.num_connections = 2
+        assert client._get_connection_pool_stats() == {'requests': 5, 'new_connections': 2, 'reused_connections': 3}
+
+    def test_batch_http_request(self, requests_mock):
+        """
+            Given
+            - A base client and a batch of 3 requests, one of them fails
+
+            When
+            - Sending the batch with 3 workers
+
+            Then
+            - Ensure the results are returned in order, with the failure kept in its own result
+        """
+        from CommonServerPython import DemistoException
+        requests_mock.get('http://example.com/api/v2/files/1', json={'id': 1})
+        requests_mock.get('http://example.com/api/v2/files/2', status_code=404, json={'error': 'not found'})
+        requests_mock.get('http://example.com/api/v2/files/3', json={'id': 3})
+        specs = [{'method': 'GET', 'url_suffix': 'files/{}'.format(i)} for i in range(1, 4)]
+        results = self.client._batch_http_request(specs, max_workers=3)
+        assert [result.ok for result in results] == [True, False, True]
+        assert results[0].result == {'id': 1}
+        assert results[2].result == {'id': 3}
+        assert results[2].request_spec == specs[2]
+        assert isinstance(results[1].error, DemistoException)
+        assert '404' in str(results[1].error)
+
+        with raises(DemistoException, match='404'):
+            self.client._batch_http_request(specs, max_workers=3, raise_on_error=True)
+
+    def test_batch_http_request_empty(self):
+        assert self.client._batch_http_request([]) == []
+
+    def test_batch_http_request_py2(self, mocker, requests_mock):
+        """
+            Given
+            - A base client and a batch of 2 requests, running on Python 2
+
+            When
+            - Sending the batch with 2 workers
+
+            Then
+            - Ensure the requests are sent one by one, without a thread pool
+        """
+        import CommonServerPython
+        mocker.patch.object(CommonServerPython, 'IS_PY3', False)
+        thread_pool_mock = mocker.patch('multiprocessing.pool.ThreadPool')
+        requests_mock.get('http://example.com/api/v2/files/1', json={'id': 1})
+        requests_mock.get('http://example.com/api/v2/files/2', json={'id': 2})
+        specs = [{'method': 'GET', 'url_suffix': 'files/{}'.format(i)} for i in range(1, 3)]
+        results = self.client._batch_http_request(specs, max_workers=2)
+        assert [result.result for result in results] == [{'id': 1}, {'id': 2}]
+        thread_pool_mock.assert_not_called()
+
+    def test_rate_limiter_paces_requests(self, mocker):
+        """
+            Given
+            - A rate limiter of 2 requests per second with a burst of 2
+
+            When
+            - Acquiring 4 requests
+
+            Then
+            - Ensure the first 2 requests are not delayed, and the next ones wait for a token to be refilled
+        """
+        from CommonServerPython import TokenBucketRateLimiter
+        clock = [1000.0]
+        mocker.patch('time.time', side_effect=lambda: clock[0])
+        sleep_mock = mocker.patch('time.sleep', side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+        limiter = TokenBucketRateLimiter(rate=2, capacity=2)
+        assert limiter.acquire() == 0
+        assert limiter.acquire() == 0
+        assert limiter.acquire() == 0.5
+        assert limiter.acquire() == 0.5
+        assert sleep_mock.call_count == 2
+
+    def test_rate_limiter_server_headers(self, mocker):
+        """
+            Given
+            - A rate limiter
+
+            When
+            - Getting a 429 response with a Retry-After header, and then a response with no remaining requests
+
+            Then
+            - Ensure the next request waits as instructed by the server
+            - Ensure a wait longer than max_wait raises an error
+        """
+        from CommonServerPython import TokenBucketRateLimiter, DemistoException
+        clock = [1600000000.0]
+        mocker.patch('time.time', side_effect=lambda: clock[0])
+        mocker.patch('time.sleep', side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+        limiter = TokenBucketRateLimiter(rate=10, max_wait=30)
+        response = mocker.Mock(status_code=429, headers={'Retry-After': '5'})
+        assert limiter.update_from_response(response) == 5
+        assert limiter.acquire() == 5
+
+        response = mocker.Mock(status_code=200, headers={'X-RateLimit-Remaining': '0',
+                                                         'X-RateLimit-Reset': str(int(clock[0]) + 60)})
+        assert limiter.update_from_response(response) == 60
+        with raises(DemistoException, match='Rate limit exceeded'):
+            limiter.acquire()
+
+    def test_rate_limiter_persisted_state(self, mocker):
+        """
+            Given
+            - A rate limiter with a context key, whose server rate limit was reached
+
+            When
+            - Creating a new rate limiter with the same context key (as done by the next run)
+
+            Then
+            - Ensure the new limiter keeps waiting for the server rate limit
+        """
+        import CommonServerPython
+        from CommonServerPython import TokenBucketRateLimiter
+        integration_context = {}
+        mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: dict(integration_context))
+        mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=integration_context.update)
+        limiter = TokenBucketRateLimiter(rate=1, context_key='rate_limit')
+        limiter.update_from_response(mocker.Mock(status_code=429, headers={'Retry-After': '120'}))
+        assert integration_context['rate_limit']['blocked_until'] > 0
+
+        next_run_limiter = TokenBucketRateLimiter(rate=1, context_key='rate_limit', max_wait=10)
+        with raises(CommonServerPython.DemistoException, match='Rate limit exceeded'):
+            next_run_limiter.acquire()
+
+    def test_http_request_with_rate_limiter(self, requests_mock, mocker):
+        """
+            Given
+            - A base client with a rate limiter
+
+            When
+            - The server responds with 429 and Retry-After, and then with 200
+
+            Then
+            - Ensure the request is resent after waiting, and the successful response is returned
+        """
+        from CommonServerPython import BaseClient, TokenBucketRateLimiter
+        clock = [1600000000.0]
+        mocker.patch('time.time', side_effect=lambda: clock[0])
+        sleep_mock = mocker.patch('time.sleep', side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+        requests_mock.get('http://example.com/api/v2/event', [
+            {'status_code': 429, 'headers': {'Retry-After': '1'}, 'json': {}},
+            {'status_code': 200, 'json': self.text},
+        ])
+        client = BaseClient('http://example.com/api/v2/', ok_codes=(200,), rate_limiter=TokenBucketRateLimiter(rate=5))
+        assert client._http_request('get', 'event') == self.text
+        assert requests_mock.call_count == 2
+        sleep_mock.assert_called_once_with(1.0)
+
     def test_http_request_proxy_false(self):
         from CommonServerPython import BaseClient
         import requests_mock
@@ -5629,3 +5855,130 @@ class TestCustomIndicator:
                 malicious_description='malicious!'
             )
             Common.CustomIndicator('test', None, dbot_score, {'param': 'value'}, 'prefix')
+
+
+def test_fetch_sources_concurrently():
+    """
+    Given
+    - Several sources, where one is slow and one fails.
+
+    When
+    - Fetching the sources concurrently.
+
+    Then
+    - Ensure the sources are yielded in the order they were fetched, the failing one is skipped,
+      and the total time is bounded by the slowest source.
+    """
+    from CommonServerPython import fetch_sources_concurrently
+
+    def fetch(source):
+        if source == 'fail':
+            raise ValueError('failed')
+        time.sleep(source)
+        return source * 2
+
+    start_time = time.time()
+    results = list(fetch_sources_concurrently(fetch, [0.3, 'fail', 0.1, 0.2], max_workers=4))
+    assert time.time() - start_time < 0.5
+    assert results == [(0.1, 0.2), (0.2, 0.4), (0.3, 0.6)]
+
+    with pytest.raises(ValueError):
+        list(fetch_sources_concurrently(fetch, ['fail', 'fail']))
+
+
+def test_fetch_sources_concurrently_py2(mocker):
+    """
+    Given
+    - Several sources, running on Python 2.
+
+    When
+    - Fetching the sources with several workers.
+
+    Then
+    - Ensure the sources are fetched one by one, in order, without a thread pool.
+    """
+    import CommonServerPython
+    mocker.patch.object(CommonServerPython, 'IS_PY3', False)
+    thread_pool_mock = mocker.patch('multiprocessing.pool.ThreadPool')
+    results = list(CommonServerPython.fetch_sources_concurrently(lambda source: source * 2, [3, 1, 2], max_workers=4))
+    assert results == [(3, 6), (1, 2), (2, 4)]
+    thread_pool_mock.assert_not_called()
+
+
+class MockFeedResponse:
+    def __init__(self, status_code=200, headers=None, content=b''):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = content
+
+
+def test_get_feed_no_update_value():
+    """
+    Given
+    - responses with last_modified and etag headers.
+
+    When
+    - Running get_feed_no_update_value without stored validators, and with different stored validators.
+
+    Then
+    - Ensure noUpdate is True without stored validators, and False when the validators were updated.
+    """
+    from CommonServerPython import get_feed_no_update_value
+    response = MockFeedResponse(headers={'Last-Modified': 'Sat, 31 Jul 2021 00:24:13 GMT',  # guardrails-disable-line
+                                         'ETag': 'a309ab6e51ed310cf869dab0dfd0d34b'})  # guardrails-disable-line
+    previous_validators = {'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT',  # guardrails-disable-line
+                           'etag': 'd309ab6e51ed310cf869dab0dfd0d34b'}  # guardrails-disable-line
+    assert get_feed_no_update_value(response)
+    assert not get_feed_no_update_value(response, previous_validators)
+    assert get_feed_no_update_value(MockFeedResponse(status_code=304), previous_validators)
+
+
+def test_get_feed_response_validators_content_hash():
+    """
+    Given
+    - responses without etag and last_modified headers.
+
+    When
+    - Running get_feed_response_validators and is_feed_source_unchanged.
+
+    Then
+    - Ensure the content hash is used to detect whether the source was modified.
+    """
+    from CommonServerPython import get_feed_response_validators, is_feed_source_unchanged, get_feed_no_update_value
+    previous_validators = get_feed_response_validators(MockFeedResponse(content=b'{"items": []}'))
+    assert list(previous_validators.keys()) == ['content_hash']
+    same_validators = get_feed_response_validators(MockFeedResponse(content=b'{"items": []}'))
+    assert is_feed_source_unchanged(MockFeedResponse(), previous_validators, same_validators)
+    assert get_feed_no_update_value(MockFeedResponse(), previous_validators, same_validators)
+    other_validators = get_feed_response_validators(MockFeedResponse(content=b'{"items": [1]}'))
+    assert not is_feed_source_unchanged(MockFeedResponse(), previous_validators, other_validators)
+    assert not get_feed_no_update_value(MockFeedResponse(), previous_validators, other_validators)
+    assert get_feed_response_validators(MockFeedResponse(content=b'{"items": []}'), hash_content=False) == {}
+
+
+def test_feed_sources_validators_in_context(mocker):
+    """
+    Given
+    - Validators stored for a feed source, with other values in the integration context.
+
+    When
+    - Getting the conditional headers of the source, getting the validators of a 304 response and saving them.
+
+    Then
+    - Ensure the stored validators are sent, kept on 304, and saved without removing the other context values.
+    """
+    from CommonServerPython import get_feed_sources_validators, save_feed_sources_validators, \
+        get_feed_conditional_headers, get_feed_response_validators
+    validators = {'etag': 'etag1', 'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT'}
+    mocker.patch.object(CommonServerPython, 'get_integration_context',
+                        return_value={'sources_validators': {'https://feed1.com': validators}, 'other': 1})
+    set_context = mocker.patch.object(CommonServerPython, 'set_integration_context')
+    stored_validators = get_feed_sources_validators()['https://feed1.com']
+    assert get_feed_conditional_headers(stored_validators) == {'If-None-Match': 'etag1',
+                                                               'If-Modified-Since': 'Fri, 30 Jul 2021 00:24:13 GMT'}
+    assert get_feed_conditional_headers({'content_hash': 'hash'}) == {}
+    new_validators = get_feed_response_validators(MockFeedResponse(status_code=304, headers={'ETag': 'etag2'}),
+                                                  stored_validators)
+    assert new_validators == {'etag': 'etag2', 'last_modified': 'Fri, 30 Jul 2021 00:24:13 GMT'}
+    save_feed_sources_validators({'https://feed1.com': new_validators})
+    assert set_context.call_args[0][0] == {'sources_validators': {'https://feed1.com': new_validators}, 'other': 1}
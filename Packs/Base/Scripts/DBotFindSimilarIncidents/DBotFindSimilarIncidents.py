@@ -4,12 +4,18 @@ from CommonServerUserPython import *
 import warnings
 import numpy as np
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, TfidfTransformer
 from sklearn.base import BaseEstimator, TransformerMixin
 import json
 import pandas as pd
 from scipy.spatial.distance import cdist
+from scipy.sparse import csr_matrix
+from collections import Counter, OrderedDict
 from typing import List, Dict, Union
+import hashlib
+import os
+import pickle
+import tempfile
 
 warnings.simplefilter("ignore")
 
@@ -58,6 +64,11 @@ REGEX_IP = re.compile(
     r'(([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.){3}([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])')
 REPLACE_COMMAND_LINE = {"=": " = ", "\\": "/", "[": "", "]": "", '"': "", "'": "", }
 
+NGRAM_INDEX_DIR = os.path.join(tempfile.gettempdir(), 'dbot_similar_incidents_index')
+MAX_NGRAM_INDEX_TEXTS = 50000
+NGRAM_INDEXES = {}  # type: Dict[str, NgramCountsIndex]
+NORMALIZED_VALUES = {}  # type: Dict
+
 
 def keep_high_level_field(incidents_field: List[str]) -> List[str]:
     """
@@ -237,6 +248,127 @@ def identity(X, y):  # type: ignore
     return z
 
 
+class NgramCountsIndex:
+    """
+    Index of the n-gram counts of normalized field values, persisted on local disk between the script runs.
+    The values are keyed by their hash, and their counts are kept over a vocabulary of all the indexed n-grams,
+    so only values which were not seen by previous runs are analyzed.
+    """
+
+    def __init__(self, tfidf_params: dict, path: str = None):
+        """
+        :param tfidf_params: parameters of TFIDF, which define the n-grams analyzer
+        :param path: path of the persisted index, None for an index which is not persisted
+        """
+        self.analyzer = TfidfVectorizer(**tfidf_params).build_analyzer()
+        self.path = path
+        self.vocabulary = {}  # type: Dict[str, int]
+        self.counts = OrderedDict()  # type: OrderedDict
+        self.changed = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as file:
+                    self.vocabulary, self.counts = pickle.load(file)
+            except Exception:
+                demisto.debug('Failed loading the n-grams index %s, building it again' % path)
+
+    @staticmethod
+    def get_key(text: str) -> str:
+        return hashlib.sha1(text.encode('utf-8', errors='ignore')).hexdigest()
+
+    def get_text_counts(self, text: str):
+        """
+        Get the n-gram counts of a text, analyzing it only if it is not indexed yet
+        :param text: the normalized field value
+        :return: the vocabulary indices of the n-grams in the text and their counts
+        """
+        key = self.get_key(text)
+        if key in self.counts:
+            return self.counts[key]
+        ngram_counts = Counter(self.analyzer(text))
+        indices = np.array([self.vocabulary.setdefault(ngram, len(self.vocabulary)) for ngram in ngram_counts],
+                           dtype=np.int32)
+        counts = np.array(list(ngram_counts.values()), dtype=np.int32)
+        self.counts[key] = (indices, counts)
+        self.changed = True
+        return indices, counts
+
+    def get_counts_matrix(self, texts, vocabulary: Dict[str, int]) -> csr_matrix:
+        """
+        Get the n-gram counts of texts over a vocabulary, like CountVectorizer with a fixed vocabulary
+        :param texts: the normalized field values
+        :param vocabulary: mapping of the n-grams to count to their columns
+        :return: sparse matrix of the counts, one row per text
+        """
+        rows = [self.get_text_counts(text) for text in texts]
+        columns = np.full(len(self.vocabulary), -1, dtype=np.int64)
+        for ngram, column in vocabulary.items():
+            index = self.vocabulary.get(ngram)
+            if index is not None:
+                columns[index] = column
+        rows_data, rows_columns = [], []
+        for indices, counts in rows:
+            row_columns = columns[indices]
+            in_vocabulary = row_columns >= 0
+            rows_columns.append(row_columns[in_vocabulary])
+            rows_data.append(counts[in_vocabulary])
+        indptr = np.concatenate([[0], np.cumsum([len(row_columns) for row_columns in rows_columns])])
+        data = np.concatenate(rows_data) if rows_data else np.array([], dtype=np.int64)
+        indices = np.concatenate(rows_columns) if rows_columns else np.array([], dtype=np.int64)
+        return csr_matrix((data.astype(np.int64), indices, indptr), shape=(len(rows), len(vocabulary)))
+
+    def save(self):
+        """
+        Persist the index if it was changed, keeping only the most recently indexed texts
+        """
+        if not self.path or not self.changed:
+            return
+        if len(self.counts) > MAX_NGRAM_INDEX_TEXTS:
+            self.compact(MAX_NGRAM_INDEX_TEXTS // 2)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + '.tmp', 'wb') as file:
+                pickle.dump((self.vocabulary, self.counts), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(self.path + '.tmp', self.path)
+            self.changed = False
+        except OSError as e:
+            demisto.debug('Failed saving the n-grams index %s: %s' % (self.path, str(e)))
+
+    def compact(self, max_texts: int):
+        """
+        Remove the oldest indexed texts and the n-grams which only appeared in them
+        :param max_texts: number of texts to keep
+        """
+        while len(self.counts) > max_texts:
+            self.counts.popitem(last=False)
+        used_indices = np.unique(np.concatenate([indices for indices, _ in self.counts.values()])) \
+            if self.counts else np.array([], dtype=np.int32)
+        new_indices = np.full(len(self.vocabulary), -1, dtype=np.int32)
+        new_indices[used_indices] = np.arange(len(used_indices), dtype=np.int32)
+        self.vocabulary = {ngram: int(new_indices[index]) for ngram, index in self.vocabulary.items()
+                           if new_indices[index] >= 0}
+        for key, (indices, counts) in self.counts.items():
+            self.counts[key] = (new_indices[indices], counts)
+
+
+def get_ngram_index(tfidf_params: dict) -> NgramCountsIndex:
+    """
+    Get the n-grams index of the transformation, loading it on first use
+    :param tfidf_params: parameters of TFIDF
+    :return: NgramCountsIndex
+    """
+    analyzer_params = {k: v for k, v in tfidf_params.items() if k != 'max_features'}
+    name = hashlib.sha1(json.dumps(analyzer_params, sort_keys=True).encode('utf-8')).hexdigest()
+    if name not in NGRAM_INDEXES:
+        NGRAM_INDEXES[name] = NgramCountsIndex(tfidf_params, os.path.join(NGRAM_INDEX_DIR, '%s.p' % name))
+    return NGRAM_INDEXES[name]
+
+
+def save_ngram_indexes():
+    for ngram_index in NGRAM_INDEXES.values():
+        ngram_index.save()
+
+
 class Tfidf(BaseEstimator, TransformerMixin):
     """
     TFIDF transformer
@@ -255,7 +387,24 @@ class Tfidf(BaseEstimator, TransformerMixin):
         if self.normalize_function:
             current_incident = current_incident[self.incident_field].apply(self.normalize_function)
         self.vocabulary = TfidfVectorizer(**self.params, use_idf=False).fit(current_incident).vocabulary_
-        self.vec = TfidfVectorizer(**self.params, vocabulary=self.vocabulary)
+        # the n-gram counts come from the index, which is equivalent to TfidfVectorizer with this vocabulary
+        self.ngram_index = get_ngram_index(self.params)
+        self.tfidf = TfidfTransformer()
+
+    def normalize(self, value):
+        # the fetched incidents are scored against every incident of a batch, so their normalized values are kept
+        # by the identity of the value, which is shared by the copies of the fetched incidents DataFrame
+        normalized_values = NORMALIZED_VALUES.setdefault(self.normalize_function, {})
+        if id(value) not in normalized_values:
+            normalized_values[id(value)] = (value, self.normalize_function(value))
+        return normalized_values[id(value)][1]
+
+    def get_counts(self, x):
+        if self.normalize_function:
+            x = x[self.incident_field].apply(self.normalize)
+        else:
+            x = x[self.incident_field]
+        return self.ngram_index.get_counts_matrix(x, self.vocabulary)
 
     def fit(self, x):
         """
@@ -263,22 +412,24 @@ class Tfidf(BaseEstimator, TransformerMixin):
         :param x: incident on which we want to fit the transfomer
         :return: self
         """
-        if self.normalize_function:
-            x = x[self.incident_field].apply(self.normalize_function)
-        self.vec.fit(x)
+        self.tfidf.fit(self.get_counts(x))
         return self
 
+    def fit_transform(self, x, y=None):
+        """
+        Fit TFIDF transformer and transform x, counting the n-grams of x once
+        :param x: incident on which we want to fit the transfomer
+        :return:
+        """
+        return self.tfidf.fit_transform(self.get_counts(x)).toarray()
+
     def transform(self, x):
         """
         Transform x with the trained vectorizer
         :param x: DataFrame or np.array
         :return:
         """
-        if self.normalize_function:
-            x = x[self.incident_field].apply(self.normalize_function)
-        else:
-            x = x[self.incident_field]
-        return self.vec.transform(x).toarray()
+        return self.tfidf.transform(self.get_counts(x)).toarray()
 
 
 class Identity(BaseEstimator, TransformerMixin):
@@ -542,9 +693,29 @@ def get_incident_by_id(incident_id: str, populate_fields: List[str], from_date:
         return incident[0]
 
 
+def get_incidents_by_ids(incident_ids: List[str], populate_fields: List[str], from_date: str, to_date: str):
+    """
+    Get incidents acording to incident ids
+    :param incident_ids: List of incident ids
+    :param populate_fields:
+    :param from_date: from_date
+    :param to_date: to_date
+    :return: List of the incidents which were found
+    """
+    res = demisto.executeCommand('GetIncidentsByQuery', {
+        'query': "id:(%s)" % ' '.join(incident_ids),
+        'populateFields': ' , '.join(populate_fields),
+        'fromDate': from_date,
+        'toDate': to_date,
+    })
+    if is_error(res):
+        return_error(res)
+    return json.loads(res[0]['Contents']) or []
+
+
 def get_all_incidents_for_time_window_and_exact_match(exact_match_fields: List[str], populate_fields: List[str],
                                                       incident: Dict, from_date: str, to_date: str,
-                                                      query_sup: str, limit: int):
+                                                      query_sup: str, limit: int, exclude_current_incident: bool = True):
     """
     Get incidents for a time window and exact match for somes fields
     :param exact_match_fields: List of field for exact match
@@ -554,6 +725,7 @@ def get_all_incidents_for_time_window_and_exact_match(exact_match_fields: List[s
     :param to_date: to_date
     :param query_sup: additional query
     :param limit: limit of how many incidents we want to query
+    :param exclude_current_incident: whether to exclude the current incident from the fetched incidents
     :return:
     """
     msg = ""
@@ -564,7 +736,8 @@ def get_all_incidents_for_time_window_and_exact_match(exact_match_fields: List[s
         else:
             exact_match_fields_list.append('%s: "%s"' % (exact_match_field, incident[exact_match_field]))
     query = " AND ".join(exact_match_fields_list)
-    query += " AND -id:%s " % incident['id']
+    if exclude_current_incident:
+        query += " AND -id:%s " % incident['id']
     if query_sup:
         query += " %s" % query_sup
 
@@ -875,7 +1048,152 @@ def prepare_current_incident(incident_df: pd.DataFrame, display_fields: List[str
     return incident_filter
 
 
+def find_similar_incidents(incident: Dict, incidents_df: pd.DataFrame, similar_text_field: List[str],
+                           similar_json_field: List[str], similar_categorical_field: List[str],
+                           display_fields: List[str], confidence: float, show_distance: bool, max_incidents: int,
+                           aggregate: str, include_indicators_similarity: str, incident_id: str = None):
+    """
+    Score the similarity of the fetched incidents to an incident
+    :param incident: json representing the current incident
+    :param incidents_df: DataFrame of the fetched incidents
+    :param similar_text_field: similar_text_field
+    :param similar_json_field: similar_json_field
+    :param similar_categorical_field: similar_categorical_field
+    :param display_fields: display_fields
+    :param confidence: threshold for similarity score
+    :param show_distance: If wants to show distance for each of the field
+    :param max_incidents: max incidents in the results
+    :param aggregate: if aggragate the data that are identical according to the field
+    :param include_indicators_similarity: if include_indicators_similarity
+    :param incident_id: incident id to get the indicators similarity of, the incidentId argument if not given
+    :return: similar_incidents, incident_df, fields_used
+    """
+    # Dumps all dict in the current incident
+    incident_df = dumps_json_field_in_incident(incident)
+    incident_df = fill_nested_fields(incident_df, incident, similar_text_field, similar_categorical_field)
+
+    # Model prediction
+    model = Model(p_transformation=TRANSFORMATION)
+    model.init_prediction(incident_df, incidents_df, similar_text_field,
+                          similar_categorical_field, display_fields, similar_json_field)
+    similar_incidents, fields_used = model.predict()
+
+    if len(fields_used) == 0:
+        return None, incident_df, fields_used
+
+    # Get similarity based on indicators
+    if include_indicators_similarity == "True":
+        args_defined_by_user = {key: demisto.args().get(key) for key in KEYS_ARGS_INDICATORS}
+        if incident_id:
+            args_defined_by_user['incidentId'] = incident_id
+        full_args_indicators_script = {**CONST_PARAMETERS_INDICATORS_SCRIPT, **args_defined_by_user}
+        similar_incidents = enriched_with_indicators_similarity(full_args_indicators_script, similar_incidents)
+
+    similar_incidents = prepare_incidents_for_display(similar_incidents, confidence, show_distance, max_incidents,
+                                                      fields_used, aggregate, include_indicators_similarity)
+    return similar_incidents, incident_df, fields_used
+
+
+def get_exact_match_key(incident: Dict, exact_match_fields: List[str]) -> str:
+    return json.dumps([incident.get(field) for field in exact_match_fields], sort_keys=True, default=str)
+
+
+def main_batch(incident_ids: List[str]):
+    """
+    Find the similar incidents of several incidents. The incidents with the same exact match fields values share
+    their fetched incidents, which are fetched and vectorized once for all of them.
+    :param incident_ids: List of incident ids
+    :return: Dict of the similar incidents of each incident, global_msg
+    """
+    similar_text_field, similar_json_field, similar_categorical_field, exact_match_fields, display_fields, from_date, \
+        to_date, show_distance, confidence, max_incidents, query, aggregate, limit, _, _, \
+        include_indicators_similarity = get_args()
+
+    global_msg = ""
+
+    populate_fields = similar_text_field + similar_json_field + similar_categorical_field + exact_match_fields \
+        + display_fields + ['id']
+    populate_high_level_fields = keep_high_level_field(populate_fields)
+    populate_fields.remove('id')
+
+    incidents_to_match = get_incidents_by_ids(incident_ids, populate_high_level_fields, from_date, to_date)
+    missing_ids = [x for x in incident_ids if x not in {str(incident['id']) for incident in incidents_to_match}]
+    if missing_ids:
+        global_msg += "%s \n" % MESSAGE_NO_CURRENT_INCIDENT % ', '.join(missing_ids)
+
+    groups = {}  # type: Dict[str, List[Dict]]
+    for incident in incidents_to_match:
+        groups.setdefault(get_exact_match_key(incident, exact_match_fields), []).append(incident)
+
+    results = []
+    for group in groups.values():
+        # the incidents of the group are not excluded from the query, as they are similar candidates of each other
+        incidents, msg = get_all_incidents_for_time_window_and_exact_match(
+            exact_match_fields, populate_high_level_fields, group[0], from_date, to_date, query, limit + len(group),
+            exclude_current_incident=False)
+        global_msg += "%s \n" % msg if msg else ""
+        incidents_df = pd.DataFrame(incidents or [])
+        if not incidents_df.empty:
+            incidents_df.index = incidents_df.id
+            incidents_df = fill_nested_fields(incidents_df, incidents, similar_text_field, similar_categorical_field)
+        _, incorrect_fields = find_incorrect_fields(populate_fields, incidents_df, "")
+        group_display_fields, group_text_field, group_json_field, group_categorical_field = \
+            remove_fields_not_in_incident(display_fields, similar_text_field, similar_json_field,
+                                          similar_categorical_field, incorrect_fields=incorrect_fields)
+
+        for incident in group:
+            incident_id = str(incident['id'])
+            candidates_df = incidents_df[incidents_df.index != incident['id']].copy() if not incidents_df.empty \
+                else incidents_df
+            similar_incidents = None
+            if not candidates_df.empty:
+                similar_incidents, _, _ = find_similar_incidents(
+                    incident, candidates_df, group_text_field, group_json_field, group_categorical_field,
+                    group_display_fields, confidence, show_distance, max_incidents, aggregate,
+                    include_indicators_similarity, incident_id)
+            if similar_incidents is None:
+                similar_incidents = pd.DataFrame()
+            results.append((incident_id, similar_incidents))
+    save_ngram_indexes()
+
+    return_outputs_similar_incidents_batch(results, global_msg)
+    return dict(results), global_msg
+
+
+def return_outputs_similar_incidents_batch(results, global_msg: str):
+    """
+    Return entry and context for the similar incidents of several incidents
+    :param results: List of the incident ids and the DataFrames of their similar incidents
+    :param global_msg: informative message
+    :return: None
+    """
+    readable_output = global_msg
+    context = []
+    for incident_id, similar_incidents in results:
+        incident_context = create_context_for_incidents(similar_incidents)
+        incident_context['incidentId'] = incident_id
+        context.append(incident_context)
+        similar_incidents = similar_incidents.replace(np.nan, '', regex=True)
+        columns = [x for x in FIRST_COLUMNS_INCIDENTS_DISPLAY if x in similar_incidents.columns] + \
+                  [x for x in similar_incidents.columns if (x not in FIRST_COLUMNS_INCIDENTS_DISPLAY and x not in
+                                                            REMOVE_COLUMNS_INCIDENTS_DISPLAY)]
+        readable_output += tableToMarkdown("Similar incidents of incident %s" % incident_id,
+                                           similar_incidents.to_dict(orient='records'), columns)
+    demisto.results({
+        "Type": entryTypes["note"],
+        "HumanReadable": readable_output,
+        "ContentsFormat": formats['json'],
+        "Contents": context,
+        "EntryContext": {'DBotFindSimilarIncidents(val.incidentId && val.incidentId == obj.incidentId)': context},
+        "Tags": ['SimilarIncidents_{}'.format(TAG_INCIDENT)],
+    })
+
+
 def main():
+    incident_ids = argToList(demisto.args().get('incidentIds'))
+    if incident_ids:
+        return main_batch([str(x) for x in incident_ids])
+
     similar_text_field, similar_json_field, similar_categorical_field, exact_match_fields, display_fields, from_date, \
         to_date, show_distance, confidence, max_incidents, query, aggregate, limit, show_actual_incident, \
         incident_id, include_indicators_similarity = get_args()
@@ -917,15 +1235,10 @@ def main():
         remove_fields_not_in_incident(display_fields, similar_text_field, similar_json_field, similar_categorical_field,
                                       incorrect_fields=incorrect_fields)
 
-    # Dumps all dict in the current incident
-    incident_df = dumps_json_field_in_incident(incident)
-    incident_df = fill_nested_fields(incident_df, incident, similar_text_field, similar_categorical_field)
-
-    # Model prediction
-    model = Model(p_transformation=TRANSFORMATION)
-    model.init_prediction(incident_df, incidents_df, similar_text_field,
-                          similar_categorical_field, display_fields, similar_json_field)
-    similar_incidents, fields_used = model.predict()
+    similar_incidents, incident_df, fields_used = find_similar_incidents(
+        incident, incidents_df, similar_text_field, similar_json_field, similar_categorical_field, display_fields,
+        confidence, show_distance, max_incidents, aggregate, include_indicators_similarity)
+    save_ngram_indexes()
 
     if len(fields_used) == 0:
         global_msg += "%s \n" % MESSAGE_NO_FIELDS_USED
@@ -933,15 +1246,6 @@ def main():
         return_outputs_similar_incidents_empty()
         return None, global_msg
 
-    # Get similarity based on indicators
-    if include_indicators_similarity == "True":
-        args_defined_by_user = {key: demisto.args().get(key) for key in KEYS_ARGS_INDICATORS}
-        full_args_indicators_script = {**CONST_PARAMETERS_INDICATORS_SCRIPT, **args_defined_by_user}
-        similar_incidents = enriched_with_indicators_similarity(full_args_indicators_script, similar_incidents)
-
-    similar_incidents = prepare_incidents_for_display(similar_incidents, confidence, show_distance, max_incidents,
-                                                      fields_used, aggregate, include_indicators_similarity)
-
     # Filter incident to investigate
     incident_filter = prepare_current_incident(incident_df, display_fields, similar_text_field, similar_json_field,
                                                similar_categorical_field, exact_match_fields)
@@ -331,3 +331,92 @@ def test_main_incident_nested(mocker):
     df, msg = main()
     assert not df.empty
     assert (df['similarity %s' % nested_field] == [1.0, 1.0, 1.0]).all()
+
+
+def test_tfidf_ngram_index(mocker, tmp_path):
+    """
+    Given:
+        - Incidents with command lines, and a persisted n-grams index.
+    When:
+        - Scoring the command line similarity twice.
+    Then:
+        - Ensure the scores are the same as the ones of TfidfVectorizer with the current incident vocabulary.
+        - Ensure the second scoring reuses the persisted n-gram counts instead of analyzing the command lines.
+    """
+    import DBotFindSimilarIncidents
+    from DBotFindSimilarIncidents import Transformer, TRANSFORMATION, save_ngram_indexes, get_ngram_index
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    mocker.patch.object(DBotFindSimilarIncidents, 'NGRAM_INDEX_DIR', str(tmp_path))
+    mocker.patch.object(DBotFindSimilarIncidents, 'NGRAM_INDEXES', {})
+    incidents_df = pd.DataFrame({'commandline': ['powershell IP=1.1.1.1', 'powershell IP=2.2.2.2', 'cmd /c whoami',
+                                                 'powershell -enc aGVsbG8=']})
+    current_incident = pd.DataFrame({'commandline': ['powershell IP=1.1.1.2']})
+    params = TRANSFORMATION['commandline']['params']
+    normalized_incidents = incidents_df['commandline'].apply(normalize_command_line)
+    normalized_current_incident = current_incident['commandline'].apply(normalize_command_line)
+    vocabulary = TfidfVectorizer(**params, use_idf=False).fit(normalized_current_incident).vocabulary_
+    vectorizer = TfidfVectorizer(**params, vocabulary=vocabulary).fit(normalized_incidents)
+    expected = np.round(euclidian_similarity_capped(vectorizer.transform(normalized_incidents).toarray(),
+                                                    vectorizer.transform(normalized_current_incident).toarray()), 2)
+
+    res = Transformer('commandline', 'commandline', incidents_df.copy(), current_incident, TRANSFORMATION).get_score()
+    assert res['similarity commandline'].tolist() == expected.tolist()
+    save_ngram_indexes()
+
+    mocker.patch.object(DBotFindSimilarIncidents, 'NGRAM_INDEXES', {})
+    analyzer = mocker.patch.object(get_ngram_index(params), 'analyzer')
+    res = Transformer('commandline', 'commandline', incidents_df.copy(), current_incident, TRANSFORMATION).get_score()
+    assert res['similarity commandline'].tolist() == expected.tolist()
+    assert analyzer.call_count == 0
+
+
+def test_ngram_index_compact():
+    from DBotFindSimilarIncidents import NgramCountsIndex
+    ngram_index = NgramCountsIndex({'analyzer': 'char', 'ngram_range': (2, 2)})
+    vocabulary = {'ab': 0, 'cd': 1}
+    before = ngram_index.get_counts_matrix(['abab', 'xyz', 'cdab'], vocabulary).toarray()
+    ngram_index.compact(2)
+    assert 'ab' in ngram_index.vocabulary and 'ba' not in ngram_index.vocabulary
+    assert (ngram_index.get_counts_matrix(['xyz', 'cdab'], vocabulary).toarray() == before[1:]).all()
+    assert before.tolist() == [[2, 0], [0, 0], [1, 1]]
+
+
+def test_main_batch(mocker):
+    """
+    Given:
+        - Two incidents to find the similar incidents of, which are also among the fetched incidents.
+    When:
+        - Running the script with the incidentIds argument.
+    Then:
+        - Ensure the incidents are fetched once, and each incident gets its own similar incidents without itself.
+    """
+    global SIMILAR_INDICATORS, FETCHED_INCIDENT, CURRENT_INCIDENT
+    FETCHED_INCIDENT = FETCHED_INCIDENT_NOT_EMPTY
+    CURRENT_INCIDENT = FETCHED_INCIDENT_NOT_EMPTY[:2]
+    SIMILAR_INDICATORS = SIMILAR_INDICATORS_NOT_EMPTY
+    mocker.patch.object(demisto, 'args',
+                        return_value={
+                            'incidentIds': '1,2',
+                            'similarTextField': 'commandline',
+                            'similarCategoricalField': '',
+                            'similarJsonField': '',
+                            'limit': 10000,
+                            'fieldExactMatch': '',
+                            'fieldsToDisplay': '',
+                            'showIncidentSimilarityForAllFields': True,
+                            'minimunIncidentSimilarity': 0.2,
+                            'maxIncidentsToDisplay': 100,
+                            'query': '',
+                            'aggreagateIncidentsDifferentDate': 'False',
+                            'includeIndicatorsSimilarity': 'False'
+                        })
+    mocker.patch.object(demisto, 'dt', return_value=None)
+    execute_command = mocker.patch.object(demisto, 'executeCommand', side_effect=executeCommand)
+    results = mocker.patch.object(demisto, 'results')
+    res, msg = main()
+    assert [args[0] for args, _ in execute_command.call_args_list] == ['GetIncidentsByQuery', 'GetIncidentsByQuery']
+    assert sorted(res['1'].index) == ['2', '3']
+    assert sorted(res['2'].index) == ['1', '3']
+    assert (res['1']['similarity commandline'] == 1.0).all()
+    context = results.call_args[0][0]['EntryContext']
+    assert [x['incidentId'] for x in list(context.values())[0]] == ['1', '2']
@@ -1,3 +1,4 @@
+import functools
 import uuid
 from itertools import combinations
 
@@ -26,6 +27,8 @@ import onnxruntime
 import numpy as np
 import os
 import io
+import tempfile
+import multiprocessing
 
 f = io.StringIO()
 stderr = sys.stderr
@@ -38,6 +41,10 @@ EXECUTION_JSON_FIELD = 'last_execution'
 VERSION_JSON_FIELD = 'script_version'
 
 MAX_ALLOWED_EXCEPTIONS = 20
+INCIDENT_EXTRACTION_TIMEOUT = 5
+# below this number of incidents the features are extracted in the script process, forking workers is not worth it
+MIN_INCIDENTS_FOR_WORKERS = 100
+MAX_EXTRACTION_WORKERS = 8
 
 NO_FETCH_EXTRACT = tldextract.TLDExtract(suffix_list_urls=None, cache_dir=False)
 NON_POSITIVE_VALIDATION_VALUES = set(['none', 'fail', 'softfail'])
@@ -63,6 +70,8 @@ FASTTEXT_PATH = '/ml/fasttext_top_20k.p'
 DOMAIN_TO_RANK_PATH = '/ml/domain_to_rank.p'
 WORD_TO_NGRAM_PATH = '/ml/word_to_ngram.p'
 WORD_TO_REGEX_PATH = '/ml/word_to_regex.p'
+# the embedding dictionaries are converted once to a vocabulary and a float32 matrix, which later runs memory-map
+EMBEDDINGS_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'dbot_ml_embeddings')
 
 EMBEDDING_DICT_GLOVE_50 = None
 EMBEDDING_DICT_GLOVE_100 = None
@@ -172,6 +181,7 @@ os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
 ONNX_MODEL = None
 ORT_SESSION = None
 TOKENIZER = None
+BERT_BATCH_SIZE = 16
 
 
 def hash_value(simple_value):
@@ -316,15 +326,88 @@ def get_html_features(soup):
     return html_counter
 
 
+class EmbeddingStore:
+    """
+    Word embeddings stored as a vocabulary index and a contiguous float32 matrix, which can be memory-mapped.
+    """
+
+    def __init__(self, words, vectors):
+        self.words = words
+        self.vectors = vectors
+        self.word_to_index = {word: i for i, word in enumerate(words)}
+
+    def __contains__(self, word):
+        return word in self.word_to_index
+
+    def __getitem__(self, word):
+        return self.vectors[self.word_to_index[word]]
+
+    def __len__(self):
+        return len(self.words)
+
+    def get_indices(self, words):
+        return [self.word_to_index[w] for w in words if w in self.word_to_index]
+
+    @classmethod
+    def from_dict(cls, embedding_dict):
+        words = list(embedding_dict.keys())
+        if not words:
+            return cls(words, np.zeros((0, 0), dtype=np.float32))
+        vectors = np.stack([np.asarray(embedding_dict[w], dtype=np.float32) for w in words])
+        return cls(words, vectors)
+
+    @classmethod
+    def load(cls, path):
+        words = np.load(path + '.words.npy').tolist()
+        vectors = np.load(path + '.vectors.npy', mmap_mode='r')
+        return cls(words, vectors)
+
+    def save(self, path):
+        for suffix, array in [('.vectors.npy', self.vectors), ('.words.npy', np.array(self.words, dtype=str))]:
+            with open(path + suffix + '.tmp', 'wb') as file:
+                np.save(file, array, allow_pickle=False)
+            os.replace(path + suffix + '.tmp', path + suffix)
+
+
+def get_embedding_cache_path(embedding_path):
+    """
+    Get the path of the converted embeddings, which changes whenever the embeddings file changes.
+    Returns None if the embeddings file can not be found.
+    """
+    try:
+        file_stat = os.stat(embedding_path)
+    except OSError:
+        return None
+    file_name = os.path.splitext(os.path.basename(embedding_path))[0]
+    return os.path.join(EMBEDDINGS_CACHE_DIR, '{}_{}_{}'.format(file_name, int(file_stat.st_mtime), file_stat.st_size))
+
+
+def load_embedding_store(embedding_path):
+    cache_path = get_embedding_cache_path(embedding_path)
+    if cache_path and os.path.exists(cache_path + '.words.npy'):
+        try:
+            return EmbeddingStore.load(cache_path)
+        except Exception:
+            demisto.debug('Failed loading converted embeddings of {}: {}'.format(embedding_path,
+                                                                                 traceback.format_exc()))
+    with open(embedding_path, 'rb') as file:
+        embedding_store = EmbeddingStore.from_dict(pickle.load(file))
+    if cache_path:
+        try:
+            os.makedirs(EMBEDDINGS_CACHE_DIR, exist_ok=True)
+            embedding_store.save(cache_path)
+        except OSError:
+            demisto.debug('Failed saving converted embeddings of {}: {}'.format(embedding_path,
+                                                                                traceback.format_exc()))
+    return embedding_store
+
+
 def load_external_resources():
     global EMBEDDING_DICT_GLOVE_50, EMBEDDING_DICT_GLOVE_50, EMBEDDING_DICT_GLOVE_100, EMBEDDING_DICT_FASTTEXT, \
         DOMAIN_TO_RANK, DOMAIN_TO_RANK_PATH, WORD_TO_NGRAMS, WORD_TO_REGEX, ONNX_MODEL, ORT_SESSION, TOKENIZER
-    with open(GLOVE_50_PATH, 'rb') as file:
-        EMBEDDING_DICT_GLOVE_50 = pickle.load(file)
-    with open(GLOVE_100_PATH, 'rb') as file:
-        EMBEDDING_DICT_GLOVE_100 = pickle.load(file)
-    with open(FASTTEXT_PATH, 'rb') as file:
-        EMBEDDING_DICT_FASTTEXT = pickle.load(file)
+    EMBEDDING_DICT_GLOVE_50 = load_embedding_store(GLOVE_50_PATH)
+    EMBEDDING_DICT_GLOVE_100 = load_embedding_store(GLOVE_100_PATH)
+    EMBEDDING_DICT_FASTTEXT = load_embedding_store(FASTTEXT_PATH)
     with open(DOMAIN_TO_RANK_PATH, 'rb') as file:
         DOMAIN_TO_RANK = pickle.load(file)
     with open(WORD_TO_NGRAM_PATH, 'rb') as file:
@@ -337,12 +420,12 @@ def load_external_resources():
     TOKENIZER = DistilBertTokenizer.from_pretrained('/ml/distilbert-base-uncased_tokenizer')
 
 
-def get_avg_embedding_vector_for_text(tokenized_text, embedding_dict, size, prefix):
-    vectors = [embedding_dict[w] for w in tokenized_text if w in embedding_dict]
-    if len(vectors) == 0:
+def get_avg_embedding_vector_for_text(tokenized_text, embedding_store, size, prefix):
+    indices = embedding_store.get_indices(tokenized_text)
+    if len(indices) == 0:
         mean_vector = np.zeros(size)
     else:
-        mean_vector = np.mean(vectors, axis=0)  # type: ignore
+        mean_vector = np.mean(embedding_store.vectors[indices], axis=0)  # type: ignore
     res = {'{}_{}'.format(prefix, str(i)): mean_vector[i].item() for i in range(len(mean_vector))}
     return res
 
@@ -612,24 +695,81 @@ def clean_email_subject(email_subject):
     return re.sub(r"\[[^\]]*?\]", '', email_subject).strip()
 
 
+def get_bert_features_for_texts(texts, batch_size=BERT_BATCH_SIZE):
+    features = []
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        encoded_input = TOKENIZER(batch, padding='max_length', max_length=512,  # type: ignore
+                                  return_tensors='np', truncation=True)
+        ort_inputs = {
+            'input_ids': encoded_input['input_ids'],
+            "attention_mask": encoded_input['attention_mask'],
+        }
+        try:
+            ort_outs = ORT_SESSION.run(None, ort_inputs)  # type: ignore
+        except TimeoutException:
+            raise
+        except Exception:
+            if len(batch) == 1:
+                raise
+            # the model does not accept batches, fall back to running it on each text
+            features.extend(get_bert_features_for_texts(batch, batch_size=1))
+            continue
+        features.extend(first_hidden_states[0].tolist() for first_hidden_states in ort_outs[0])
+    return features
+
+
 def get_bert_features_for_text(text):
-    global TOKENIZER, BERT_MODEL
-    encoded_input = TOKENIZER(text, padding='max_length', max_length=512,  # type: ignore
-                              return_tensors='np', truncation=True)
-    ort_inputs = {
-        'input_ids': encoded_input['input_ids'],
-        "attention_mask": encoded_input['attention_mask'],
-    }
-    ort_outs = ORT_SESSION.run(None, ort_inputs)  # type: ignore
-    first_hidden_state = ort_outs[0][0][0].tolist()
-    return first_hidden_state
+    return get_bert_features_for_texts([text])[0]
+
+
+def get_bert_features_for_incidents(indices, texts, batch_size=BERT_BATCH_SIZE):
+    """
+    Computes the BERT features of the incidents texts in batches, limited to INCIDENT_EXTRACTION_TIMEOUT seconds for
+    each text. When a batch fails or times out, its texts are computed one by one, so only the failing incidents fail.
+    Yields the index of each incident, its status and its result, like extract_features_from_incident_with_timeout.
+    """
+    for i in range(0, len(texts), batch_size):
+        batch_indices, batch = indices[i:i + batch_size], texts[i:i + batch_size]
+        signal.alarm(INCIDENT_EXTRACTION_TIMEOUT * len(batch))
+        try:
+            batch_features = get_bert_features_for_texts(batch, batch_size)
+        except Exception:
+            batch_features = None
+        finally:
+            signal.alarm(0)
+        if batch_features is not None:
+            for index, features in zip(batch_indices, batch_features):
+                yield index, 'success', features
+            continue
+
+        for index, text in zip(batch_indices, batch):
+            signal.alarm(INCIDENT_EXTRACTION_TIMEOUT)
+            try:
+                outcome = index, 'success', get_bert_features_for_text(text)
+            except TimeoutException:
+                outcome = index, 'timeout', None
+            except Exception:
+                outcome = index, 'exception', traceback.format_exc()
+            finally:
+                signal.alarm(0)
+            yield outcome
+
+
+def get_bert_text_for_incident(email_subject, email_body):
+    return email_subject + '\n' + email_body
 
 
 def get_bert_features_for_incident(email_subject, email_body):
-    return {'first_vec_subject_body': get_bert_features_for_text(email_subject + '\n' + email_body)}
+    text = get_bert_text_for_incident(email_subject, email_body)
+    return {'first_vec_subject_body': get_bert_features_for_text(text)}
 
 
 def extract_features_from_incident(row, label_fields):
+    """
+    Extracts the features of an incident, except for its BERT features which are computed in batches.
+    Returns the features and the text to compute the BERT features of.
+    """
     global EMAIL_BODY_FIELD, EMAIL_SUBJECT_FIELD, EMAIL_HTML_FIELD, EMAIL_ATTACHMENT_FIELD, EMAIL_HEADERS_FIELD
     email_body = row[EMAIL_BODY_FIELD] if EMAIL_BODY_FIELD in row else ''
     email_subject = row[EMAIL_SUBJECT_FIELD] if EMAIL_SUBJECT_FIELD in row else ''
@@ -662,7 +802,6 @@ def extract_features_from_incident(row, label_fields):
     ml_features = get_embedding_features(email_body_word_tokenized + email_subject_word_tokenized)
     ml_features_subject = get_embedding_features(email_subject_word_tokenized)
     ml_features_body = get_embedding_features(email_body_word_tokenized)
-    bert_features = get_bert_features_for_incident(email_subject, email_body)
     headers_features = get_headers_features(email_headers)
     url_feautres = get_url_features(email_body=email_body, email_html=email_html, soup=soup)
     attachments_features = get_attachments_features(email_attachments=email_attachments)
@@ -677,7 +816,6 @@ def extract_features_from_incident(row, label_fields):
         'headers_features': headers_features,
         'url_features': url_feautres,
         'attachments_features': attachments_features,
-        'bert_features': bert_features,
         'created': str(row['created']) if 'created' in row else None,
         'id': str(row['id']) if 'id' in row else None,
         'type': str(row['type']) if 'type' in row else None,
@@ -696,36 +834,89 @@ def extract_features_from_incident(row, label_fields):
     except Exception:
         pass
 
-    return res
+    return res, get_bert_text_for_incident(email_subject, email_body)
+
+
+def extract_features_from_incident_with_timeout(index_and_row, label_fields):
+    """
+    Extracts the features of an incident, limited to INCIDENT_EXTRACTION_TIMEOUT seconds.
+    Runs in the extraction workers, so the alarm limits each incident in its own worker process.
+    Returns the index of the incident, the extraction status and its result.
+    """
+    index, row = index_and_row
+    signal.alarm(INCIDENT_EXTRACTION_TIMEOUT)
+    try:
+        start = time.time()
+        X_i, bert_text = extract_features_from_incident(row, label_fields)
+        return index, 'success', (X_i, bert_text, time.time() - start)
+    except TimeoutException:
+        return index, 'timeout', None
+    except ShortTextException:
+        return index, 'short_text', None
+    except Exception:
+        return index, 'exception', traceback.format_exc()
+    finally:
+        signal.alarm(0)
+
+
+def get_extraction_workers_count(n_incidents):
+    if n_incidents < MIN_INCIDENTS_FOR_WORKERS:
+        return 1
+    return max(1, min(MAX_EXTRACTION_WORKERS, os.cpu_count() or 1))
 
 
 def extract_features_from_all_incidents(incidents_df, label_fields):
     X = []
+    X_indices = []
+    bert_texts = []
     exceptions_log = []
     exception_indices = set()
     timeout_indices = set()
     short_text_indices = set()
     durations = []
-    for index, row in incidents_df.iterrows():
-        signal.alarm(5)
-        try:
-            start = time.time()
-            X_i = extract_features_from_incident(row, label_fields)
-            end = time.time()
-            X.append(X_i)
-            durations.append(end - start)
-        except TimeoutException:
+    extract_features = functools.partial(extract_features_from_incident_with_timeout, label_fields=label_fields)
+    rows = ((index, row.to_dict()) for index, row in incidents_df.iterrows())
+    n_workers = get_extraction_workers_count(len(incidents_df))
+    # the workers are forked after the external resources were loaded, so they share them with the script process
+    pool = multiprocessing.get_context('fork').Pool(n_workers) if n_workers > 1 else None
+    try:
+        results = pool.imap(extract_features, rows, chunksize=10) if pool else map(extract_features, rows)
+        for index, status, result in results:
+            if status == 'success':
+                X_i, bert_text, duration = result
+                X.append(X_i)
+                X_indices.append(index)
+                bert_texts.append(bert_text)
+                durations.append(duration)
+            elif status == 'timeout':
+                timeout_indices.add(index)
+            elif status == 'short_text':
+                short_text_indices.add(index)
+            else:
+                exception_indices.add(index)
+                exceptions_log.append(result)
+                if len(exception_indices) == MAX_ALLOWED_EXCEPTIONS:
+                    break
+    finally:
+        if pool:
+            pool.terminate()
+
+    X_with_bert, durations_with_bert = [], []
+    bert_results = get_bert_features_for_incidents(X_indices, bert_texts)
+    for X_i, duration, (index, status, result) in zip(X, durations, bert_results):
+        if status == 'success':
+            X_i['bert_features'] = {'first_vec_subject_body': result}
+            X_with_bert.append(X_i)
+            durations_with_bert.append(duration)
+        elif status == 'timeout':
             timeout_indices.add(index)
-        except ShortTextException:
-            short_text_indices.add(index)
-        except Exception:
+        else:
             exception_indices.add(index)
-            exceptions_log.append(traceback.format_exc())
-            if len(exception_indices) == MAX_ALLOWED_EXCEPTIONS:
+            exceptions_log.append(result)
+            if len(exception_indices) >= MAX_ALLOWED_EXCEPTIONS:
                 break
-        finally:
-            signal.alarm(0)
-    return X, Counter(exceptions_log).most_common(), short_text_indices, exception_indices, timeout_indices, durations
+    return X_with_bert, Counter(exceptions_log).most_common(), short_text_indices, exception_indices, \
+        timeout_indices, durations_with_bert
 
 
 def extract_data_from_incidents(incidents, input_label_field=None):
@@ -7,6 +7,7 @@ from bs4 import BeautifulSoup
 import math
 import pandas as pd
 import cProfile
+import pytest
 
 
 def test_find_label_fields_candidates():
@@ -471,3 +472,98 @@ def test_bert_features(mocker):
     expected_res_first_ten = [-3.7959e-01, -4.7554e-02, -5.6070e-03, -1.3525e-01, -1.5419e-01,
                               -2.7613e-01, 2.5755e-02, 2.5090e-02, -2.2422e-01, -2.5844e-01]
     np.testing.assert_allclose(res[:10], expected_res_first_ten, rtol=1e-03, atol=1e-05)
+
+
+def test_bert_features_batches(mocker):
+    def tokenizer(texts, **kwargs):
+        input_ids = np.array([[len(text)] + [0] * 511 for text in texts])
+        return {'input_ids': input_ids, 'attention_mask': input_ids}
+
+    def run_single_text_model(output_names, ort_inputs):
+        if len(ort_inputs['input_ids']) > 1:
+            raise ValueError('Got invalid dimensions for input')
+        return [ort_inputs['input_ids'][:, :, None].astype(float)]
+
+    texts = ['a' * i for i in range(1, 6)]
+    mocker.patch('DBotMLFetchData.TOKENIZER', side_effect=tokenizer)
+    ort_session = mocker.patch('DBotMLFetchData.ORT_SESSION')
+    ort_session.run.side_effect = lambda output_names, ort_inputs: [ort_inputs['input_ids'][:, :, None].astype(float)]
+    assert get_bert_features_for_texts(texts, batch_size=2) == [[float(i)] for i in range(1, 6)]
+    assert ort_session.run.call_count == 3
+
+    ort_session.run.side_effect = run_single_text_model
+    assert get_bert_features_for_texts(texts, batch_size=2) == [[float(i)] for i in range(1, 6)]
+
+
+def test_bert_features_for_incidents_fallback(mocker):
+    def tokenizer(texts, **kwargs):
+        input_ids = np.array([[len(text)] + [0] * 511 for text in texts])
+        return {'input_ids': input_ids, 'attention_mask': input_ids}
+
+    def run_model(output_names, ort_inputs):
+        if 3 in ort_inputs['input_ids'][:, 0]:
+            raise ValueError('Failed running the model')
+        return [ort_inputs['input_ids'][:, :, None].astype(float)]
+
+    mocker.patch('signal.alarm', side_effect=signal_alarm_patch)
+    mocker.patch('DBotMLFetchData.TOKENIZER', side_effect=tokenizer)
+    ort_session = mocker.patch('DBotMLFetchData.ORT_SESSION')
+    ort_session.run.side_effect = run_model
+    texts = ['a' * i for i in range(1, 6)]
+    results = list(get_bert_features_for_incidents([10, 11, 12, 13, 14], texts, batch_size=2))
+    assert [result[:2] for result in results] == [(10, 'success'), (11, 'success'), (12, 'exception'),
+                                                  (13, 'success'), (14, 'success')]
+    assert [result[2] for result in results if result[1] == 'success'] == [[1.0], [2.0], [4.0], [5.0]]
+    assert 'Failed running the model' in results[2][2]
+
+
+def test_bert_features_for_incidents_batch_timeout(mocker):
+    def tokenizer(texts, **kwargs):
+        input_ids = np.array([[len(text)] + [0] * 511 for text in texts])
+        return {'input_ids': input_ids, 'attention_mask': input_ids}
+
+    def run_model(output_names, ort_inputs):
+        if 3 in ort_inputs['input_ids'][:, 0]:
+            raise TimeoutException
+        return [ort_inputs['input_ids'][:, :, None].astype(float)]
+
+    alarm = mocker.patch('signal.alarm', side_effect=signal_alarm_patch)
+    mocker.patch('DBotMLFetchData.TOKENIZER', side_effect=tokenizer)
+    ort_session = mocker.patch('DBotMLFetchData.ORT_SESSION')
+    ort_session.run.side_effect = run_model
+    texts = ['a' * i for i in range(1, 6)]
+
+    # a timed out batch is not rerun text by text without a time limit
+    with pytest.raises(TimeoutException):
+        get_bert_features_for_texts(texts[2:4], batch_size=2)
+    assert ort_session.run.call_count == 1
+
+    ort_session.run.reset_mock()
+    results = list(get_bert_features_for_incidents([10, 11, 12, 13, 14], texts, batch_size=2))
+    assert results == [(10, 'success', [1.0]), (11, 'success', [2.0]), (12, 'timeout', None),
+                       (13, 'success', [4.0]), (14, 'success', [5.0])]
+    # the batches [1, 2], [3, 4] and [5], then the texts of the timed out batch, each under its own alarm
+    assert ort_session.run.call_count == 5
+    assert [call[0][0] for call in alarm.call_args_list if call[0][0]] == \
+        [INCIDENT_EXTRACTION_TIMEOUT * 2] * 2 + [INCIDENT_EXTRACTION_TIMEOUT] * 2 + [INCIDENT_EXTRACTION_TIMEOUT]
+
+
+def test_embedding_store(mocker, tmp_path):
+    with open('test_data/glove_50_top_10.p', 'rb') as file:
+        embedding_dict = pickle.load(file)
+    embedding_path = str(tmp_path / 'glove_50_top_10.p')
+    with open(embedding_path, 'wb') as file:
+        pickle.dump(embedding_dict, file)
+    mocker.patch('DBotMLFetchData.EMBEDDINGS_CACHE_DIR', str(tmp_path / 'cache'))
+
+    embedding_store = load_embedding_store(embedding_path)
+    mocker.patch.object(pickle, 'load', side_effect=Exception('the converted embeddings should be loaded'))
+    mapped_embedding_store = load_embedding_store(embedding_path)
+
+    assert isinstance(mapped_embedding_store.vectors, np.memmap)
+    text = list(embedding_dict.keys())[:3] + ['not-in-vocabulary']
+    expected = np.mean([embedding_dict[w] for w in text if w in embedding_dict], axis=0)
+    for store in [embedding_store, mapped_embedding_store]:
+        res = get_avg_embedding_vector_for_text(text, store, 50, 'glove50')
+        assert [res['glove50_{}'.format(i)] for i in range(50)] == expected.tolist()
+        assert text[0] in store and 'not-in-vocabulary' not in store
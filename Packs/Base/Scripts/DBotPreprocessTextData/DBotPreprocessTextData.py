@@ -1,5 +1,6 @@
 # pylint: disable=no-member
 from collections import Counter
+from functools import lru_cache
 from CommonServerUserPython import *
 from CommonServerPython import *
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -18,6 +19,7 @@ ANY_LANGUAGE = 'Any'
 OTHER_LANGUAGE = 'Other'
 
 
+@lru_cache(maxsize=10 ** 5)
 def hash_word(word, hash_seed):
     return str(hash_djb2(word, int(hash_seed)))
 
@@ -40,6 +42,12 @@ html_patterns = [
 ]
 
 LANGUAGE_KEY = 'language'
+# maximal number of pairwise similarities computed at once when removing duplicates
+DEDUP_CHUNK_CELLS = 10 ** 7
+# texts are tokenized by spaCy in batches, and in worker processes for large inputs
+SPACY_BATCH_SIZE = 64
+MIN_TEXTS_FOR_SPACY_WORKERS = 1000
+MAX_SPACY_WORKERS = 4
 
 
 def create_text_result(original_text, tokenized_text, original_words_to_tokens, hash_seed=None):
@@ -93,7 +101,11 @@ class Tokenizer:
         self.html_parser = HTMLParser()
         self._unicode_chr_splitter = _Re('(?s)((?:[\ud800-\udbff][\udc00-\udfff])|.)').split
         self.spacy_count = 0
+        self.spacy_load_count = 0
         self.spacy_reset_count = 500
+        # results by text, so that repeated texts are cleaned and tokenized once
+        self.prepared_texts = {}  # type: Dict[str, Tuple[str, str]]
+        self.tokenized_texts = {}  # type: Dict[str, Tuple[str, Dict]]
 
     def handle_long_text(self):
         return '', ''
@@ -118,14 +130,6 @@ class Tokenizer:
     def remove_multiple_whitespaces(self, text):
         return re.sub(r"\s+", " ", text).strip()
 
-    def handle_tokenizaion_method(self, text):
-        if self.tokenization_method == 'tokenizer':
-            tokens_list, original_words_to_tokens = self.tokenize_text_spacy(text)
-        else:
-            tokens_list, original_words_to_tokens = self.tokenize_text_other(text)
-        tokenized_text = ' '.join(tokens_list).strip()
-        return tokenized_text, original_words_to_tokens
-
     def tokenize_text_other(self, text):
         tokens_list = []
         tokenization_method = self.tokenization_method
@@ -144,11 +148,31 @@ class Tokenizer:
             return_error('Unsupported tokenization method: when language is "Other" ({})'.format(tokenization_method))
         return tokens_list, original_words_to_tokens
 
-    def tokenize_text_spacy(self, text):
-        if self.nlp is None or self.spacy_count % self.spacy_reset_count == 0:
+    def load_spacy_model_for_texts(self, texts_count):
+        # the model is reloaded every spacy_reset_count texts, to bound the growth of its vocabulary
+        if self.nlp is None or self.spacy_count - self.spacy_load_count + texts_count > self.spacy_reset_count:
             self.init_spacy_model()
+            self.spacy_load_count = self.spacy_count
+
+    def tokenize_text_spacy(self, text):
+        self.load_spacy_model_for_texts(1)
         doc = self.nlp(text)  # type: ignore
         self.spacy_count += 1
+        return self.tokenize_spacy_doc(text, doc)
+
+    def tokenize_texts_spacy(self, texts):
+        # each worker process tokenizes up to spacy_reset_count texts of a chunk
+        n_process = min(MAX_SPACY_WORKERS, os.cpu_count() or 1) if len(texts) >= MIN_TEXTS_FOR_SPACY_WORKERS else 1
+        chunk_size = self.spacy_reset_count * n_process
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            self.load_spacy_model_for_texts(len(chunk))
+            docs = self.nlp.pipe(chunk, batch_size=SPACY_BATCH_SIZE, n_process=n_process)  # type: ignore
+            self.spacy_count += len(chunk)
+            for text, doc in zip(chunk, docs):
+                yield self.tokenize_spacy_doc(text, doc)
+
+    def tokenize_spacy_doc(self, text, doc):
         original_text_indices_to_words = self.map_indices_to_words(text)
         tokens_list = []
         original_words_to_tokens = {}  # type: ignore
@@ -182,27 +206,48 @@ class Tokenizer:
         return tokens_list, original_words_to_tokens
 
     def init_spacy_model(self):
-        self.nlp = spacy.load('en_core_web_sm', disable=['parser', 'ner', 'textcat'])
-
-    def word_tokenize(self, text):
-        if not isinstance(text, list):
-            text = [text]
-        result = []
-        for t in text:
-            original_text = t
+        disabled_components = ['parser', 'ner', 'textcat', 'senter']
+        if not self.lemma:
+            disabled_components.append('lemmatizer')
+        self.nlp = spacy.load('en_core_web_sm', disable=disabled_components)
+
+    def prepare_text(self, text):
+        if text not in self.prepared_texts:
+            original_text = prepared_text = text
             if self.remove_new_lines:
-                t = self.remove_line_breaks(t)
+                prepared_text = self.remove_line_breaks(prepared_text)
             if self.clean_html:
-                t = clean_html_from_text(t)
-                original_text = t
-            t = self.remove_multiple_whitespaces(t)
+                prepared_text = clean_html_from_text(prepared_text)
+                original_text = prepared_text
+            self.prepared_texts[text] = (original_text, self.remove_multiple_whitespaces(prepared_text))
+        return self.prepared_texts[text]
+
+    def tokenize_texts(self, texts):
+        prepared_texts = [self.prepare_text(t) for t in texts]
+        new_texts = list(dict.fromkeys(t for _, t in prepared_texts
+                                       if len(t) < self.max_text_length and t not in self.tokenized_texts))
+        if self.tokenization_method == 'tokenizer':
+            tokens = self.tokenize_texts_spacy(new_texts)
+        else:
+            tokens = map(self.tokenize_text_other, new_texts)
+        for t, (tokens_list, original_words_to_tokens) in zip(new_texts, tokens):
+            self.tokenized_texts[t] = (' '.join(tokens_list).strip(), original_words_to_tokens)
+
+        result = []
+        for original_text, t in prepared_texts:
             if len(t) < self.max_text_length:
-                tokenized_text, original_words_to_tokens = self.handle_tokenizaion_method(t)
+                tokenized_text, original_words_to_tokens = self.tokenized_texts[t]
             else:
                 tokenized_text, original_words_to_tokens = self.handle_long_text()
             text_result = create_text_result(original_text, tokenized_text, original_words_to_tokens,
                                              hash_seed=self.hash_seed)
             result.append(text_result)
+        return result
+
+    def word_tokenize(self, text):
+        if not isinstance(text, list):
+            text = [text]
+        result = self.tokenize_texts(text)
         if len(result) == 1:
             result = result[0]  # type: ignore
         return result
@@ -290,9 +335,12 @@ def clean_text_of_incidents_list(data, source_text_field, remove_html_tags):
 
 def pre_process_batch(data, source_text_field, target_text_field, pre_process_type, hash_seed):
     raw_text_data = [x[source_text_field] for x in data]
+    if pre_process_type == 'nlp':
+        tokenized_texts = get_tokenizer(hash_seed).tokenize_texts(raw_text_data)
+    else:
+        tokenized_texts = [pre_process_single_text(raw_text, hash_seed, pre_process_type) for raw_text in raw_text_data]
     tokenized_text_data = []
-    for raw_text in raw_text_data:
-        tokenized_text = pre_process_single_text(raw_text, hash_seed, pre_process_type)
+    for tokenized_text in tokenized_texts:
         if hash_seed is None:
             tokenized_text_data.append(tokenized_text['tokenizedText'])
         else:
@@ -308,12 +356,16 @@ def pre_process_single_text(raw_text, hash_seed, pre_process_type):
     return tokenized_text
 
 
-def pre_process_tokenizer(text, seed):
+def get_tokenizer(seed):
     global tokenizer
     if tokenizer is None:
         tokenizer = Tokenizer(tokenization_method=demisto.args()['tokenizationMethod'],
                               language=demisto.args()['language'], hash_seed=seed)
-    processed_text = tokenizer.word_tokenize(text)
+    return tokenizer
+
+
+def pre_process_tokenizer(text, seed):
+    processed_text = get_tokenizer(seed).word_tokenize(text)
     return processed_text
 
 
@@ -375,20 +427,24 @@ def is_text_in_input_language(text, input_language):
     return is_correct_lang, actual_language
 
 
-def get_tf_idf_similarity_arr(documents):
-    tfidf = TfidfVectorizer(stop_words="english", min_df=1).fit_transform(documents)
-    pairwise_similarity = tfidf * tfidf.T
-    return pairwise_similarity.toarray()
+def get_tf_idf_matrix(documents):
+    return TfidfVectorizer(stop_words="english", min_df=1).fit_transform(documents)
 
 
 def find_duplicate_indices(texts, dedup_threshold):
-    similarity_arr = get_tf_idf_similarity_arr(texts)
-    indices_to_remove = []
-    for i in range(similarity_arr.shape[0]):
-        for j in range(similarity_arr.shape[1]):
-            if j > i and similarity_arr[i][j] > dedup_threshold:
-                indices_to_remove.append(j)
-    return set(indices_to_remove)
+    # the tf-idf rows are l2 normalized, so their dot product is the cosine similarity. the similarities are
+    # computed sparsely for chunks of rows against the following rows only, to bound the memory to
+    # DEDUP_CHUNK_CELLS similarities instead of materializing the full dense n*n matrix
+    tfidf = get_tf_idf_matrix(texts).tocsr()
+    n_samples = tfidf.shape[0]
+    chunk_size = max(1, DEDUP_CHUNK_CELLS // max(n_samples, 1))
+    indices_to_remove = set()
+    for start in range(0, n_samples, chunk_size):
+        end = min(start + chunk_size, n_samples)
+        similarity = tfidf[start:end].dot(tfidf[start:].T).tocoo()
+        is_duplicate = (similarity.data > dedup_threshold) & (similarity.col > similarity.row)
+        indices_to_remove.update((similarity.col[is_duplicate] + start).tolist())
+    return indices_to_remove
 
 
 def remove_duplicate_by_indices(data, duplicate_indices):
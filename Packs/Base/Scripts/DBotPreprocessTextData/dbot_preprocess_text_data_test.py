@@ -3,7 +3,8 @@ import unittest
 from CommonServerPython import *
 from DBotPreprocessTextData import clean_html_from_text, remove_line_breaks, hash_word, \
     concat_text_fields, whitelist_dict_fields, remove_short_text, remove_duplicate_by_indices, pre_process_batch, main, \
-    read_file, Tokenizer, clean_text_of_incidents_list, remove_foreign_language, is_text_in_input_language
+    read_file, Tokenizer, clean_text_of_incidents_list, remove_foreign_language, is_text_in_input_language, \
+    find_duplicate_indices
 import string
 
 from copy import deepcopy
@@ -124,6 +125,14 @@ def test_remove_dups():
     assert len(data) == 2
 
 
+def test_find_duplicate_indices(mocker):
+    texts = ['phishing link reset password', 'invoice attached payment', 'phishing link reset password',
+             'meeting tomorrow morning', 'invoice attached payment', 'phishing link reset password']
+    for chunk_cells in [10 ** 7, 1]:
+        mocker.patch('DBotPreprocessTextData.DEDUP_CHUNK_CELLS', chunk_cells)
+        assert find_duplicate_indices(texts, 0.99) == {2, 4, 5}
+
+
 def test_pre_process():
     data = [
         {
@@ -425,8 +434,19 @@ I have 3 dogs
                     "don't": ['do', "n't"], 'live': ['live'], 'in': ['in'], 'Petach': ['petach'], 'Tikva': ['tikva']}
         assert res1['originalWordsToTokens'] == expected
 
+    def test_tokenize_texts(self):
+        args = deepcopy(negative_initialization)
+        args['hash_seed'] = 5381
+        texts = ["I'm 29 years old", 'example sentence', "I'm 29 years old", 'another example sentence'] * 3
+        expected = [Tokenizer(**args).word_tokenize(text) for text in texts]
+        t1 = Tokenizer(**args)
+        assert t1.tokenize_texts(texts) == expected
+        assert t1.spacy_count == 3
+        assert t1.word_tokenize(texts[1]) == expected[1]
+        assert t1.spacy_count == 3
+
 
-def test_read_file(mocker):
+def test_read_file(mocker, tmp_path):
     mocker.patch.object(demisto, 'getFilePath', return_value={'path': './TestData/input_json_file_test'})
     obj = read_file('231342@343', 'json')
     assert len(obj) >= 1
@@ -434,18 +454,20 @@ def test_read_file(mocker):
         obj = read_file(f.read(), 'json_string')
         assert len(obj) >= 1
 
-    with open('./TestData/input_pickle_file_test', 'wb') as f:
+    pickle_path = str(tmp_path / 'input_pickle_file_test')
+    with open(pickle_path, 'wb') as f:
         f.write(pickle.dumps(obj))
-    mocker.patch.object(demisto, 'getFilePath', return_value={'path': './TestData/input_pickle_file_test'})
-    obj_from_pickle = read_file('./TestData/input_pickle_file_test', 'pickle')
+    mocker.patch.object(demisto, 'getFilePath', return_value={'path': pickle_path})
+    obj_from_pickle = read_file(pickle_path, 'pickle')
     assert len(obj_from_pickle) >= 1
 
     mocker.patch.object(demisto, 'getFilePath', return_value={'path': './TestData/input_json_file_test'})
     with open('./TestData/input_json_file_test', 'r') as f:
         obj = read_file(f.read(), 'json_string')
         df = pd.DataFrame.from_dict(obj)
-        df.to_csv("./TestData/test.csv", index=False)
-        mocker.patch.object(demisto, 'getFilePath', return_value={'path': './TestData/test.csv'})
+        csv_path = str(tmp_path / 'test.csv')
+        df.to_csv(csv_path, index=False)
+        mocker.patch.object(demisto, 'getFilePath', return_value={'path': csv_path})
         obj2 = read_file('231342@343', 'csv')
         assert len(obj2) == len(obj)
 
@@ -13,6 +13,7 @@ from sklearn import cluster
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.manifold import TSNE
+from sklearn.metrics.pairwise import euclidean_distances
 import hdbscan
 from datetime import datetime
 from typing import Type, Tuple, Dict, List, Union
@@ -31,6 +32,8 @@ MESSAGE_INCORRECT_FIELD = "- %s field(s) don't/doesn't exist within the fetched
 MESSAGE_INVALID_FIELD = "- %s field(s) has/have too many missing values and won't be used in the model."
 MESSAGE_NO_FIELD_NAME_OR_CLUSTERING = "- Empty or incorrect fieldsForClustering " \
                                       "for training OR fieldForClusterName is incorrect."
+MESSAGE_INCREMENTAL_UPDATE = "- %s new incidents were assigned to the existing groups."
+MESSAGE_DRIFT_RETRAIN = "- The new incidents drifted from the existing groups, the model was retrained."
 
 PREFIXES_TO_REMOVE = ['incident.']
 REGEX_DATE_PATTERN = [re.compile(r"^(\d{4}-\d{2}-\d{2})T(\d{2}:\d{2}:\d{2})Z"),  # guardrails-disable-line
@@ -49,6 +52,11 @@ MESSAGE_ERROR_MESSAGE = 'Model cannot be loaded'
 CLUSTERING_STEP_PIPELINE = 'clustering'
 PREPROCESSOR_STEP_PIPELINE = 'preprocessor'
 
+TRAINING_PARAMETERS = ['fieldsForClustering', 'fieldForClusterName', 'fieldsToDisplay', 'query', 'type',
+                       'minNumberofIncidentPerCluster', 'minHomogeneityCluster', 'maxRatioOfMissingValue',
+                       'numberOfFeaturesPerField', 'analyzer']
+MAX_INCREMENTAL_SAMPLES_RATIO = 1.0
+
 PALETTE_COLOR = ['0048BA', '#B0BF1A	', '#7CB9E8	', '#B284BE	', '#E52B50', '#FFBF00', '#665D1E', '#8DB600',
                  '#D0FF14']
 
@@ -81,6 +89,7 @@ class Clustering(object):
         self.TSNE_ = False
         self.centers = {}
         self.centers_2d = {}
+        self.radius = {}  # type: Dict
 
         self.create_model(parameters=params)
 
@@ -146,6 +155,24 @@ class Clustering(object):
         self.number_clusters = len(set(self.results[self.results >= 0]))
         return
 
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Assign new samples to the nearest cluster center, when they are not farther from it than the samples of the
+        cluster
+        :param X: vector of feature - np.ndarray
+        :return: cluster of each sample, -1 for the samples which don't belong to any cluster
+        """
+        labels = np.full(len(X), -1)
+        if not self.centers:
+            return labels
+        clusters = np.array(list(self.centers.keys()))
+        distances = euclidean_distances(X, np.array([self.centers[cluster_] for cluster_ in clusters]))
+        nearest = distances.argmin(axis=1)
+        radius = np.array([self.radius[cluster_] for cluster_ in clusters])
+        in_cluster = distances[np.arange(len(X)), nearest] <= radius[nearest] + 1e-9
+        labels[in_cluster] = clusters[nearest[in_cluster]]
+        return labels
+
     def reduce_dimension(self, dimension=2):
         """
         Use TSNE technique to reduce dimension
@@ -170,6 +197,8 @@ class Clustering(object):
                 self.centers[cluster_] = center.fillna(0)  # type: ignore
             else:
                 self.centers[cluster_] = center
+            self.radius[cluster_] = euclidean_distances(self.data[self.model.labels_ == cluster_],  # type: ignore
+                                                        [self.centers[cluster_]]).max()
 
 
 class PostProcessing(object):
@@ -196,6 +225,16 @@ class PostProcessing(object):
         self.global_msg = None  # type: ignore
         self.json = None  # type: ignore
 
+        # incremental update
+        self.preprocessor = None  # type: ignore
+        self.training_parameters = None  # type: ignore
+        self.fields_for_clustering = []  # type: List[str]
+        self.field_for_cluster_name = []  # type: List[str]
+        self.display_fields = []  # type: List[str]
+        self.incidents_ids = set()  # type: ignore
+        self.date_update = self.date_training
+        self.incremental_samples = 0
+
     def statistics(self):
         """
         Compute statistics of the clusters
@@ -319,11 +358,21 @@ def get_args():  # type: ignore
     force_retrain = demisto.args().get('forceRetrain', 'False') == 'True'
     model_expiration = float(demisto.args().get('modelExpiration'))
     model_hidden = demisto.args().get('model_hidden', 'False') == 'True'
+    incremental_update = demisto.args().get('incrementalUpdate', 'False') == 'True'
+    max_drift_ratio = float(demisto.args().get('maxDriftRatio', 0.1))
 
     return fields_for_clustering, field_for_cluster_name, display_fields, from_date, to_date, limit, query, \
         incident_type, min_number_of_incident_in_cluster, model_name, store_model, min_homogeneity_cluster, \
         model_override, max_percentage_of_missing_value, debug, force_retrain, model_expiration, model_hidden, \
-        number_feature_per_field, analyzer
+        number_feature_per_field, analyzer, incremental_update, max_drift_ratio
+
+
+def get_training_parameters() -> Dict:
+    """
+    Gets the arguments of this automation which the model depends on
+    :return: Dict of the arguments
+    """
+    return {parameter: demisto.args().get(parameter) for parameter in TRAINING_PARAMETERS}
 
 
 def get_all_incidents_for_time_window_and_type(populate_fields: List[str], from_date: str, to_date: str,
@@ -499,8 +548,17 @@ class Tfidf(BaseEstimator, TransformerMixin):
         if self.normalize_function:
             x = x[feature_name].apply(self.normalize_function)
         self.vec.fit(x)
+        # only needed for introspection, and grows with the corpus when the model is stored
+        self.vec.stop_words_ = None
         return self
 
+    def __sklearn_is_fitted__(self):
+        """
+        Whether the vectorizer was fitted, checked when the stored model transforms new incidents
+        :return: boolean
+        """
+        return hasattr(self.vec, 'vocabulary_')
+
     def transform(self, x):
         """
         Transform x with the trained vectorizer
@@ -787,8 +845,113 @@ def is_model_needs_retrain(force_retrain: bool, model_expiration: float, model_n
         return None, True
     else:
         model = load_model64(model_data)
-        model_training_time = pd.to_datetime(model.date_training)
-        return model, model_training_time < datetime.now() - timedelta(hours=model_expiration)
+        model_update_time = pd.to_datetime(getattr(model, 'date_update', model.date_training))
+        return model, model_update_time < datetime.now() - timedelta(hours=model_expiration)
+
+
+def is_model_incrementally_updatable(model_processed, training_parameters: Dict) -> bool:
+    """
+    Return boolean if the new incidents can be assigned to the clusters of the model instead of retraining it
+    :param model_processed: PostProcessing model
+    :param training_parameters: arguments of this automation which the model depends on
+    :return: Boolean
+    """
+    return model_processed is not None and getattr(model_processed, 'preprocessor', None) is not None \
+        and model_processed.training_parameters == training_parameters
+
+
+def compute_drift(clustering: Type[Clustering], labels: np.ndarray) -> float:
+    """
+    Compute the drift of new incidents from the clusters, as the increase of the ratio of incidents which don't
+    belong to any cluster compared to the training
+    :param clustering: Clustering model
+    :param labels: clusters of the new incidents
+    :return: drift
+    """
+    training_outliers_ratio = np.mean(clustering.model.labels_ == -1)  # type: ignore
+    return float(np.mean(labels == -1) - training_outliers_ratio)
+
+
+def update_clusters_json(model_processed: Type[PostProcessing], incidents_df: pd.DataFrame, labels: np.ndarray) -> str:
+    """
+    Add the new incidents to the clusters of the json created by create_clusters_json
+    :param model_processed: Postprocessing
+    :param incidents_df: DataFrame of the new incidents
+    :param labels: clusters of the new incidents
+    :return: json with information on the clusters
+    """
+    data = json.loads(model_processed.json)  # type: ignore
+    display_fields = model_processed.display_fields
+    fields_for_clustering_remove_display = [x for x in model_processed.fields_for_clustering if
+                                            x not in display_fields]
+    for d in data['data'] + [data['outliers']]:
+        cluster_number = int(d['pivot'].split(':')[1]) if 'pivot' in d else -1
+        cluster_df = incidents_df[labels == cluster_number]
+        if cluster_df.empty:
+            continue
+        fields = display_fields if cluster_number == -1 else display_fields + fields_for_clustering_remove_display
+        d['incidents_ids'] += cluster_df.id.values.tolist()
+        d['incidents'] = json.dumps(json.loads(d['incidents']) + json.loads(cluster_df[fields].to_json(
+            orient='records')), separators=(',', ':'))
+        if 'data' in d:
+            d['data'] = [d['data'][0] + len(cluster_df)]
+    ranges = calculate_range(data)
+    data['range'] = ranges[0]
+    data['rangeX'] = ranges[1]
+    data['rangeY'] = ranges[2]
+    pretty_json = json.dumps(data, indent=4, sort_keys=True)
+    return pretty_json
+
+
+def update_model_incrementally(model_processed: Type[PostProcessing], to_date: str, limit: int,
+                               max_drift_ratio: float) -> Tuple[bool, str]:
+    """
+    Assign the incidents created since the last update of the model to its clusters, using the stored vocabulary
+    :param model_processed: Postprocessing
+    :param to_date: to_date
+    :param limit: maximum number of incident to fetch
+    :param max_drift_ratio: drift of the new incidents from which the model needs to be retrained
+    :return: boolean if the model needs to be retrained, message
+    """
+    global_msg = ""
+    clustering = model_processed.clustering
+    training_parameters = model_processed.training_parameters  # type: Dict
+    populate_fields = model_processed.fields_for_clustering + model_processed.field_for_cluster_name + \
+        model_processed.display_fields
+    from_date = pd.to_datetime(model_processed.date_update).strftime('%Y-%m-%dT%H:%M:%S')
+    incidents, _ = get_all_incidents_for_time_window_and_type(keep_high_level_field(populate_fields), from_date,
+                                                              to_date, training_parameters['query'], limit,
+                                                              training_parameters['type'])
+    update_time = datetime.now().strftime("%m/%d/%Y %H:%M:%S")
+    incidents = [incident for incident in incidents or [] if incident['id'] not in model_processed.incidents_ids]
+    if not incidents:
+        model_processed.date_update = update_time
+        return False, global_msg
+
+    incidents_df = prepare_incidents_df(incidents, model_processed.fields_for_clustering,
+                                        model_processed.field_for_cluster_name)
+    for field in populate_fields:
+        if field not in incidents_df.columns:
+            incidents_df[field] = ''
+    labels = clustering.predict(model_processed.preprocessor.transform(incidents_df))  # type: ignore
+
+    incremental_samples = model_processed.incremental_samples + len(incidents)
+    if compute_drift(clustering, labels) > max_drift_ratio or \
+            incremental_samples > MAX_INCREMENTAL_SAMPLES_RATIO * len(clustering.model.labels_):  # type: ignore
+        global_msg += "%s \n" % MESSAGE_DRIFT_RETRAIN
+        return True, global_msg
+
+    model_processed.json = update_clusters_json(model_processed, incidents_df, labels)
+    model_processed.stats['General']['Nb sample'] += len(incidents)
+    for cluster_number, number_samples in collections.Counter(labels.tolist()).items():
+        model_processed.stats[cluster_number]['number_samples'] += number_samples
+    model_processed.incidents_ids.update(incidents_df.id)
+    model_processed.incremental_samples = incremental_samples
+    model_processed.date_update = update_time
+    model_processed.summary['Incidents assigned since training'] = str(incremental_samples)  # type: ignore
+    model_processed.summary['Update time'] = update_time  # type: ignore
+    global_msg += "%s \n" % MESSAGE_INCREMENTAL_UPDATE % len(incidents)
+    return False, global_msg
 
 
 def load_model64(model_base64: str):
@@ -820,6 +983,25 @@ def prepare_data_for_training(generic_cluster_name, incidents_df, field_for_clus
     return labels
 
 
+def prepare_incidents_df(incidents: List, fields_for_clustering: List[str],
+                         field_for_cluster_name: List[str]) -> pd.DataFrame:
+    """
+    Create the DataFrame of incidents, with the values of the nested fields
+    :param incidents: List of incident
+    :param fields_for_clustering: List of field to use for the clustering
+    :param field_for_cluster_name: field for cluster name given by the user
+    :return: DataFrame of incidents
+    """
+    incidents_df = pd.DataFrame(incidents).fillna('')
+    incidents_df.index = incidents_df.id
+
+    # Fill nested fields with appropriate values
+    incidents_df = transform_names_if_list(incidents_df, field_for_cluster_name)
+    incidents_df = fill_nested_fields(incidents_df, incidents, fields_for_clustering)
+    incidents_df = fill_nested_fields(incidents_df, incidents, field_for_cluster_name, keep_unique_value=True)
+    return incidents_df
+
+
 def transform_names_if_list(incidents_df, field_for_cluster_name):
     """
     Check if field_for_cluster_name value are type list and keep the maximun value if this is the case
@@ -866,7 +1048,7 @@ def main():
     fields_for_clustering, field_for_cluster_name, display_fields, from_date, to_date, limit, query, incident_type, \
         min_number_of_incident_in_cluster, model_name, store_model, min_homogeneity_cluster, model_override, \
         max_percentage_of_missing_value, debug, force_retrain, model_expiration, model_hidden, \
-        number_feature_per_field, analyzer = get_args()
+        number_feature_per_field, analyzer, incremental_update, max_drift_ratio = get_args()
 
     HDBSCAN_PARAMS.update({'min_cluster_size': min_number_of_incident_in_cluster,
                            'min_samples': min_number_of_incident_in_cluster})
@@ -876,6 +1058,14 @@ def main():
 
     # Check if need to retrain
     model_processed, retrain = is_model_needs_retrain(force_retrain, model_expiration, model_name)
+    training_parameters = get_training_parameters()
+
+    # Assign the new incidents to the existing clusters, unless they drifted
+    if retrain and incremental_update and is_model_incrementally_updatable(model_processed, training_parameters):
+        retrain, msg = update_model_incrementally(model_processed, to_date, limit, max_drift_ratio)
+        global_msg += msg
+        if not retrain and store_model:
+            store_model_in_demisto(model_processed, model_name, True, model_hidden)
 
     if not retrain:
         if debug:
@@ -897,7 +1087,7 @@ def main():
             data_clusters_json = json.dumps(data_clusters)
 
         return_entry_clustering(output_clustering=data_clusters_json, tag="trained")
-        return model_processed, model_processed.json, ""  # pylint: disable=E1101
+        return model_processed, model_processed.json, global_msg  # pylint: disable=E1101
     else:
         # Check if user gave a field for cluster name - if not use generic cluster name
         if not field_for_cluster_name:
@@ -916,13 +1106,7 @@ def main():
             demisto.results(global_msg)
             return None, {}, global_msg
 
-        incidents_df = pd.DataFrame(incidents).fillna('')
-        incidents_df.index = incidents_df.id
-
-        # Fill nested fields with appropriate values
-        incidents_df = transform_names_if_list(incidents_df, field_for_cluster_name)
-        incidents_df = fill_nested_fields(incidents_df, incidents, fields_for_clustering)
-        incidents_df = fill_nested_fields(incidents_df, incidents, field_for_cluster_name, keep_unique_value=True)
+        incidents_df = prepare_incidents_df(incidents, fields_for_clustering, field_for_cluster_name)
 
         # Check Field that appear in populate_fields but are not in the incidents_df and return message
         global_msg, incorrect_fields = find_incorrect_field(populate_fields, incidents_df, global_msg)
@@ -977,6 +1161,14 @@ def main():
         model_processed.summary = summary
         model_processed.global_msg = global_msg
 
+        # Keep what is needed to assign new incidents to the clusters
+        model_processed.preprocessor = model.named_steps[PREPROCESSOR_STEP_PIPELINE]
+        model_processed.training_parameters = training_parameters
+        model_processed.fields_for_clustering = fields_for_clustering
+        model_processed.field_for_cluster_name = field_for_cluster_name
+        model_processed.display_fields = display_fields
+        model_processed.incidents_ids = set(incidents_df.id)
+
         if debug:
             return_outputs(readable_output='## Warning \n {}'.format(global_msg) + tableToMarkdown("Summary", summary))
         else:
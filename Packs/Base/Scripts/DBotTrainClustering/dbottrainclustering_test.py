@@ -2,7 +2,7 @@ import json
 
 from DBotTrainClustering import demisto, main, MESSAGE_INCORRECT_FIELD, MESSAGE_INVALID_FIELD, \
     preprocess_incidents_field, PREFIXES_TO_REMOVE, MESSAGE_CLUSTERING_NOT_VALID, check_list_of_dict, \
-    base64, datetime, MESSAGE_NO_FIELD_NAME_OR_CLUSTERING
+    base64, datetime, MESSAGE_NO_FIELD_NAME_OR_CLUSTERING, MESSAGE_INCREMENTAL_UPDATE, MESSAGE_DRIFT_RETRAIN
 import dill as pickle
 
 PARAMETERS_DICT = {
@@ -327,3 +327,56 @@ def test_same_cluster_name(mocker):
     clusters_name = [x['clusterName'] for x in model.selected_clusters.values()]
     assert 'nmap' in clusters_name
     assert 'nmap_0' in clusters_name
+
+
+def generate_incidents(start, number, family_fields=None):
+    incidents = []
+    for i in range(start, start + number):
+        if family_fields:
+            fields = family_fields
+        elif i % 2:
+            fields = {'field_1': 'powershell IP=1.1.1.%s' % i, 'field_2': 'powershell.exe', 'entityname': 'powershell'}
+        else:
+            fields = {'field_1': 'nmap port %s' % i, 'field_2': 'nmap.exe', 'entityname': 'nmap'}
+        incidents.append(dict({'id': str(i), 'created': "2021-01-30", 'name': 'name_%s' % i}, **fields))
+    return incidents
+
+
+# Test that new incidents are assigned to the clusters of the expired model, unless they drifted
+def test_model_incremental_update(mocker):
+    global FETCHED_INCIDENT
+    FETCHED_INCIDENT = generate_incidents(0, 20)
+    stored_model = {}
+
+    def execute_command_store_model(command, args):
+        if command == 'createMLModel':
+            stored_model['modelData'] = args['modelData']
+            return [{'Contents': '', 'Type': 'note'}]
+        if command == 'getMLModel':
+            return [{'Contents': {'modelData': stored_model['modelData'], 'model': {'type': {'type': ''}}},
+                     'Type': 'note'}]
+        return executeCommand(command, args)
+
+    parameters = dict(PARAMETERS_DICT)
+    parameters.update({'fieldsForClustering': 'field_1, field_2', 'fieldForClusterName': 'entityname',
+                       'forceRetrain': 'True', 'storeModel': 'True', 'incrementalUpdate': 'True'})
+    mocker.patch.object(demisto, 'args', return_value=parameters)
+    mocker.patch.object(demisto, 'executeCommand', side_effect=execute_command_store_model)
+    main()
+
+    parameters.update({'forceRetrain': 'False', 'modelExpiration': '1e-20'})
+    FETCHED_INCIDENT = generate_incidents(0, 26)
+    model, output_clustering_json, msg = main()
+    assert MESSAGE_INCREMENTAL_UPDATE % 6 in msg
+    assert model.incremental_samples == 6
+    clusters = {cluster['name']: cluster for cluster in json.loads(output_clustering_json)['data']}
+    assert clusters['nmap']['data'] == [13]
+    assert set(clusters['powershell']['incidents_ids']) == {str(i) for i in range(1, 26, 2)}
+    assert len(json.loads(clusters['powershell']['incidents'])) == 13
+
+    FETCHED_INCIDENT = generate_incidents(0, 26) + generate_incidents(
+        26, 8, {'field_1': 'explorer.exe /c', 'field_2': 'explorer', 'entityname': 'explorer'})
+    model, output_clustering_json, msg = main()
+    assert MESSAGE_DRIFT_RETRAIN in msg
+    assert model.incremental_samples == 0
+    assert 'explorer' in [cluster['name'] for cluster in json.loads(output_clustering_json)['data']]
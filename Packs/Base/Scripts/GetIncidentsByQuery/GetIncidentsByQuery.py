@@ -2,11 +2,14 @@ from CommonServerPython import *
 
 import pickle
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dateutil import parser
 
 PREFIXES_TO_REMOVE = ['incident.']
 PAGE_SIZE = int(demisto.args().get('pageSize', 500))
 PYTHON_MAGIC = "$$##"
+# number of pages requested ahead while the fetched pages are processed
+PREFETCH_PAGES = 2
 
 
 def parse_datetime(datetime_str):
@@ -100,26 +103,76 @@ def get_fields_to_populate_arg(fields_to_populate):
     return ",".join(incidents_fields_to_populate)
 
 
-def get_incidents_by_page(args, page, fields_to_populate, include_context):
-    args['page'] = page
+def fetch_incidents_page(args, page, fields_to_populate):
+    args = dict(args, page=page)
     if is_demisto_version_ge('6.2.0') and len(fields_to_populate) > 0:
         args['populateFields'] = get_fields_to_populate_arg(fields_to_populate)
     res = demisto.executeCommand("getIncidents", args)
     if res[0]['Contents'].get('data') is None:
-        return []
+        return [], None
     if is_error(res):
         error_message = get_error(res)
         raise Exception("Failed to get incidents by query args: %s error: %s" % (args, error_message))
-    incidents = res[0]['Contents'].get('data') or []
+    return res[0]['Contents'].get('data') or [], res[0]['Contents'].get('total')
+
 
-    parsed_incidents = []
+def iter_parsed_incidents(incidents, fields_to_populate, include_context):
+    """
+    Parses the fetched incidents, skipping the incidents that contain python magic.
+    Yields the parsed incidents and their JSON serialization, which is reused by the JSON output formats.
+    """
     for inc in incidents:
         new_incident = handle_incident(inc, fields_to_populate, include_context)
-        if is_incident_contains_python_magic(new_incident):
+        serialized_incident = json.dumps(new_incident)
+        if PYTHON_MAGIC in serialized_incident:
             demisto.debug("Warning: skip incident [id:%s] that contains python magic" % str(inc['id']))
             continue
-        parsed_incidents.append(new_incident)
-    return parsed_incidents
+        yield new_incident, serialized_incident
+
+
+def get_incidents_by_page(args, page, fields_to_populate, include_context):
+    incidents, _ = fetch_incidents_page(args, page, fields_to_populate)
+    return [inc for inc, _ in iter_parsed_incidents(incidents, fields_to_populate, include_context)]
+
+
+def iter_incidents_pages(args, size, fields_to_populate):
+    """
+    Fetches the incidents pages lazily, until an empty page.
+    Once the first page tells the total number of incidents, the pages needed for size incidents are requested ahead
+    by a background thread while the fetched pages are processed, at most PREFETCH_PAGES pages at a time.
+    """
+    incidents, total = fetch_incidents_page(args, 0, fields_to_populate)
+    if not incidents:
+        return
+    yield incidents
+
+    page = 1
+    if total is not None:
+        pages_count = -(-min(size, total) // args['size'])
+        if hasattr(demisto, '_Demisto__do') and not hasattr(demisto, 'lock'):
+            support_multithreading()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            futures = [executor.submit(fetch_incidents_page, args, prefetch_page, fields_to_populate)
+                       for prefetch_page in range(1, min(pages_count, PREFETCH_PAGES + 1))]
+            while futures:
+                incidents, _ = futures.pop(0).result()
+                if not incidents:
+                    for future in futures:
+                        future.cancel()
+                    return
+                next_page = page + PREFETCH_PAGES
+                if next_page < pages_count:
+                    futures.append(executor.submit(fetch_incidents_page, args, next_page, fields_to_populate))
+                yield incidents
+                page += 1
+
+    # more pages are needed when incidents were skipped, or when the total number of incidents is unknown
+    while True:
+        incidents, _ = fetch_incidents_page(args, page, fields_to_populate)
+        if not incidents:
+            return
+        yield incidents
+        page += 1
 
 
 def get_demisto_datetme_format(date_string):
@@ -141,6 +194,14 @@ def get_demisto_datetme_format(date_string):
 
 
 def get_incidents(query, time_field, size, from_date, to_date, fields_to_populate, include_context):
+    args = get_incidents_query_args(query, time_field, size, from_date, to_date)
+    incident_list = []  # type: ignore
+    for incident, _ in iter_incidents(args, size, fields_to_populate, include_context):
+        incident_list.append(incident)
+    return incident_list
+
+
+def get_incidents_query_args(query, time_field, size, from_date, to_date):
     query_size = min(PAGE_SIZE, size)
     args = {"query": query, "size": query_size, "sort": "%s.%s" % (time_field, "desc")}
     # apply only when created time field
@@ -158,16 +219,36 @@ def get_incidents(query, time_field, size, from_date, to_date, fields_to_populat
                 args['todate'] = to_datetime
             else:
                 demisto.results("did not set to date due to a wrong format: " + from_date)
-
-    incident_list = []  # type: ignore
-    page = 0
-    while len(incident_list) < size:
-        incidents = get_incidents_by_page(args, page, fields_to_populate, include_context)
-        if not incidents:
-            break
-        incident_list += incidents
-        page += 1
-    return incident_list[:size]
+    return args
+
+
+def iter_incidents(args, size, fields_to_populate, include_context):
+    """
+    Yields at most size parsed incidents and their JSON serialization, as their pages are fetched.
+    """
+    count = 0
+    for incidents in iter_incidents_pages(args, size, fields_to_populate):
+        for incident, serialized_incident in iter_parsed_incidents(incidents, fields_to_populate, include_context):
+            yield incident, serialized_incident
+            count += 1
+            if count >= size:
+                return
+
+
+def write_incidents_file(file_name, incidents_iterator):
+    """
+    Writes the incidents to a JSON lines file entry, one incident per line.
+    Returns the file entry and the number of incidents written.
+    """
+    file_id = demisto.uniqueFile()
+    incidents_count = 0
+    with open(demisto.investigation()['id'] + '_' + file_id, 'w', encoding='utf-8') as file:
+        for _, serialized_incident in incidents_iterator:
+            file.write(serialized_incident + '\n')
+            incidents_count += 1
+    entry = {'Contents': '', 'ContentsFormat': formats['text'], 'Type': entryTypes['file'], 'File': file_name,
+             'FileID': file_id}
+    return entry, incidents_count
 
 
 def get_comma_sep_list(value):
@@ -205,26 +286,33 @@ def main():
             fields_to_populate.append('id')
             fields_to_populate = set([x for x in fields_to_populate if x])  # type: ignore
         include_context = d_args['includeContext'] == 'true'
-        incidents = get_incidents(query, d_args['timeField'],
-                                  int(d_args['limit']),
-                                  d_args.get('fromDate'),
-                                  d_args.get('toDate'),
-                                  fields_to_populate,
-                                  include_context)
+        output_format = d_args['outputFormat']
+        if output_format not in ['pickle', 'json', 'jsonl']:
+            raise Exception("Invalid output format: %s" % output_format)
+        args = get_incidents_query_args(query, d_args['timeField'], int(d_args['limit']), d_args.get('fromDate'),
+                                        d_args.get('toDate'))
+        incidents_iterator = iter_incidents(args, int(d_args['limit']), fields_to_populate, include_context)
 
         # output
         file_name = str(uuid.uuid4())
-        output_format = d_args['outputFormat']
-        if output_format == 'pickle':
-            data_encoded = pickle.dumps(incidents, protocol=2)
-        elif output_format == 'json':
-            data_encoded = json.dumps(incidents)  # type: ignore
+        if output_format == 'jsonl':
+            # the incidents are written to the file as they are fetched, without keeping them in memory
+            entry, incidents_count = write_incidents_file(file_name, incidents_iterator)
         else:
-            raise Exception("Invalid output format: %s" % output_format)
+            incidents, serialized_incidents = [], []
+            for incident, serialized_incident in incidents_iterator:
+                incidents.append(incident)
+                serialized_incidents.append(serialized_incident)
+            if output_format == 'pickle':
+                data_encoded = pickle.dumps(incidents, protocol=2)
+            else:
+                # same as dumping the list, without serializing the incidents again
+                data_encoded = '[' + ', '.join(serialized_incidents) + ']'  # type: ignore
+            entry = fileResult(file_name, data_encoded)
+            entry['Contents'] = incidents
+            incidents_count = len(incidents)
 
-        entry = fileResult(file_name, data_encoded)
-        entry['Contents'] = incidents
-        entry['HumanReadable'] = "Fetched %d incidents successfully by the query: %s" % (len(incidents), query)
+        entry['HumanReadable'] = "Fetched %d incidents successfully by the query: %s" % (incidents_count, query)
         entry['EntryContext'] = {
             'GetIncidentsByQuery': {
                 'Filename': file_name,
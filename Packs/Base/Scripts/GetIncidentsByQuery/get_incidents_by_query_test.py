@@ -169,6 +169,42 @@ def test_skip_python_magic(mocker):
     assert len(entry['Contents']) == 1
 
 
+def test_main_paged_with_total(mocker):
+    args = dict(get_args())
+    args['limit'] = '7'
+    mocker.patch.object(demisto, 'args', return_value=args)
+    mocker.patch('GetIncidentsByQuery.PAGE_SIZE', 2)
+    all_incidents = [dict(incident1, id=i) for i in range(10)]
+    requested_pages = []
+
+    def execute_command_get_incidents_page(command, args):
+        page = args['page']
+        requested_pages.append(page)
+        data = all_incidents[page * args['size']: (page + 1) * args['size']]
+        return [{'Type': entryTypes['note'], 'Contents': {'data': data, 'total': len(all_incidents)}}]
+
+    mocker.patch.object(demisto, 'executeCommand', side_effect=execute_command_get_incidents_page)
+    entry = main()
+    assert [incident['id'] for incident in entry['Contents']] == list(range(7))
+    assert sorted(requested_pages) == [0, 1, 2, 3]
+
+
+def test_main_jsonl(mocker):
+    args = dict(get_args())
+    args['outputFormat'] = 'jsonl'
+    mocker.patch.object(demisto, 'args', return_value=args)
+    mocker.patch.object(demisto, 'executeCommand', side_effect=execute_command_get_incidents)
+
+    entry = main()
+    assert "Fetched 2 incidents successfully" in entry['HumanReadable']
+    assert entry['EntryContext']['GetIncidentsByQuery']['FileFormat'] == 'jsonl'
+    with open(demisto.investigation()['id'] + '_' + entry['FileID']) as f:
+        incidents = [json.loads(line) for line in f]
+    os.remove(demisto.investigation()['id'] + '_' + entry['FileID'])
+    assert [incident['id'] for incident in incidents] == [1, 2]
+    assert incidents[0]['testField'] == 'testValue'
+
+
 def test_preprocess_incidents_fields_list():
     incidents_fields = ['incident.emailbody', ' incident.emailsbuject']
     assert preprocess_incidents_fields_list(incidents_fields) == ['emailbody', 'emailsbuject']
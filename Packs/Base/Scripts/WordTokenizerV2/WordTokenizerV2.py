@@ -9,6 +9,7 @@ reload(sys)
 sys.setdefaultencoding('utf-8')  # pylint: disable=no-member
 
 MAX_TEXT_LENGTH = 10 ** 5
+SPACY_BATCH_SIZE = 64
 
 NUMBER_PATTERN = "NUMBER_PATTERN"
 URL_PATTERN = "URL_PATTERN"
@@ -51,6 +52,7 @@ LANGUAGES_TO_MODEL_NAMES = {'English': 'en_core_web_sm',
 
 _unicode_chr_splitter = _Re('(?s)((?:[\ud800-\udbff][\udc00-\udfff])|.)').split
 nlp = None
+hashed_words = {}  # type: ignore
 
 
 def clean_html(text):
@@ -74,19 +76,31 @@ def remove_multiple_whitespaces(text):
 
 
 def hash_word(word):
-    return str(hash_djb2(word, int(HASH_SEED)))
+    if word not in hashed_words:
+        hashed_words[word] = str(hash_djb2(word, int(HASH_SEED)))
+    return hashed_words[word]
 
 
 def tokenize_text(text):
-    try:
-        unicode_text = unicode(text)
-    except Exception:
-        unicode_text = text
+    return tokenize_texts([text])[0]
+
+
+def tokenize_texts(texts):
+    unicode_texts = []
+    for text in texts:
+        try:
+            unicode_texts.append(unicode(text))
+        except Exception:
+            unicode_texts.append(text)
     language = demisto.args()['language']
     if language in LANGUAGES_TO_MODEL_NAMES:
-        original_words_to_tokens, tokens_list = tokenize_text_spacy(unicode_text, language)
+        tokens = tokenize_texts_spacy(unicode_texts, language)
     else:
-        original_words_to_tokens, tokens_list = tokenize_text_other(unicode_text)
+        tokens = [tokenize_text_other(unicode_text) for unicode_text in unicode_texts]
+    return [hash_tokens(original_words_to_tokens, tokens_list) for original_words_to_tokens, tokens_list in tokens]
+
+
+def hash_tokens(original_words_to_tokens, tokens_list):
     hashed_tokens_list = []
     if HASH_SEED:
         for word in tokens_list:
@@ -119,11 +133,15 @@ def tokenize_text_other(unicode_text):
     return original_words_to_tokens, tokens_list
 
 
-def tokenize_text_spacy(unicode_text, language):
+def tokenize_texts_spacy(unicode_texts, language):
     global nlp
     if nlp is None:
         nlp = spacy.load(LANGUAGES_TO_MODEL_NAMES[language], disable=['tagger', 'parser', 'ner', 'textcat'])
-    doc = nlp(unicode(unicode_text))
+    docs = nlp.pipe([unicode(unicode_text) for unicode_text in unicode_texts], batch_size=SPACY_BATCH_SIZE)
+    return [tokenize_spacy_doc(unicode_text, doc) for unicode_text, doc in zip(unicode_texts, docs)]
+
+
+def tokenize_spacy_doc(unicode_text, doc):
     original_text_indices_to_words = map_indices_to_words(unicode_text)
     tokens_list = []
     original_words_to_tokens = {}  # type: ignore
@@ -189,14 +207,15 @@ def word_tokenize(text):
     if not isinstance(text, list):
         text = [text]
 
+    cleaned_texts = [remove_multiple_whitespaces(clean_html(remove_line_breaks(t))) for t in text]
+    # repeated texts are tokenized once, and the texts are tokenized by spaCy in batches
+    texts_to_tokenize = list(set(t for t in cleaned_texts if len(t) < MAX_TEXT_LENGTH))
+    tokenized_texts = dict(zip(texts_to_tokenize, tokenize_texts(texts_to_tokenize)))
+
     result = []
-    for t in text:
-        original_text = t
-        t = remove_line_breaks(t)
-        t = clean_html(t)
-        t = remove_multiple_whitespaces(t)
+    for original_text, t in zip(text, cleaned_texts):
         if len(t) < MAX_TEXT_LENGTH:
-            tokenized_text, hash_tokenized_text, original_words_to_tokens, words_to_hashed_tokens = tokenize_text(t)
+            tokenized_text, hash_tokenized_text, original_words_to_tokens, words_to_hashed_tokens = tokenized_texts[t]
         else:
             tokenized_text, hash_tokenized_text, original_words_to_tokens, words_to_hashed_tokens =\
                 handle_long_text(t, input_length=len(text))
@@ -1,25 +1,13 @@
 import demistomock as demisto
 from CommonServerPython import *
 
-from netaddr import IPAddress, IPNetwork
-
 
 def main():
     ip_addresses = argToList(demisto.args()['value'])
-    cidr_range_list = argToList(demisto.args()['cidr_ranges'])
-
-    excluded_addresses = []
-
-    for ip_address in ip_addresses:
-        found = False
-        ip = IPAddress(ip_address)
+    ip_ranges_index = get_ip_ranges_index(argToList(demisto.args()['cidr_ranges']))
 
-        for cidr_range in cidr_range_list:
-            if ip in IPNetwork(cidr_range):
-                found = True
-
-        if not found:
-            excluded_addresses.append(ip_address)
+    ips_in_ranges = ip_ranges_index.classify(ip_addresses)
+    excluded_addresses = [ip_address for ip_address, is_in_ranges in zip(ip_addresses, ips_in_ranges) if not is_in_ranges]
 
     if not excluded_addresses:
         demisto.results(None)
@@ -27,5 +15,7 @@ def main():
         demisto.results(excluded_addresses)
 
 
+from IPRangesApiModule import *  # noqa: E402
+
 if __name__ == "__builtin__" or __name__ == "builtins":
     main()
@@ -1,21 +1,13 @@
 import demistomock as demisto
 from CommonServerPython import *
 
-from netaddr import IPAddress, IPNetwork
-
 
 def main():
     ip_addresses = argToList(demisto.args()['value'])
-    cidr_range_list = argToList(demisto.args()['cidr_ranges'])
-
-    included_addresses = []
+    ip_ranges_index = get_ip_ranges_index(argToList(demisto.args()['cidr_ranges']))
 
-    for ip_address in ip_addresses:
-        ip = IPAddress(ip_address)
-
-        for cidr_range in cidr_range_list:
-            if ip in IPNetwork(cidr_range):
-                included_addresses.append(ip_address)
+    ips_in_ranges = ip_ranges_index.classify(ip_addresses)
+    included_addresses = [ip_address for ip_address, is_in_ranges in zip(ip_addresses, ips_in_ranges) if is_in_ranges]
 
     if not included_addresses:
         demisto.results(None)
@@ -23,5 +15,7 @@ def main():
         demisto.results(included_addresses)
 
 
+from IPRangesApiModule import *  # noqa: E402
+
 if __name__ == "__builtin__" or __name__ == "builtins":
     main()
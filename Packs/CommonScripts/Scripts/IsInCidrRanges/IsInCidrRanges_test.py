@@ -33,3 +33,17 @@ def test_main(mocker):
     assert demisto.results.call_count == 1
     results = demisto.results.call_args
     assert results[0][0] is True
+
+
+def test_main_multiple_ips(mocker):
+    from IsInCidrRanges import main
+
+    mocker.patch.object(demisto, 'args', return_value={
+        'left': '172.16.0.1,10.5.5.5,192.168.1.1',
+        'right': '10.0.0.0/8,192.168.0.0/16'
+    })
+    mocker.patch.object(demisto, 'results')
+    main()
+    assert demisto.results.call_count == 1
+    results = demisto.results.call_args
+    assert results[0][0] == [False, True, True]
@@ -1,20 +1,17 @@
 import demistomock as demisto
 from CommonServerPython import *
 
-from netaddr import IPAddress, IPNetwork
-
 
 def main():
-    ip_address = demisto.args()['left']
-    cidr_range_list = argToList(demisto.args()['right'])
+    ip_addresses = argToList(demisto.args()['left'])
+    ip_ranges_index = get_ip_ranges_index(argToList(demisto.args()['right']))
 
-    for cidr in cidr_range_list:
-        if IPAddress(ip_address) in IPNetwork(cidr):
-            demisto.results(False)
-            return
+    # a list of IP addresses is classified in one call, with a result for each of them
+    results = [not is_in_ranges for is_in_ranges in ip_ranges_index.classify(ip_addresses)]
+    demisto.results(results[0] if len(results) == 1 else results)
 
-    demisto.results(True)
 
+from IPRangesApiModule import *  # noqa: E402
 
 if __name__ == "__builtin__" or __name__ == "builtins":
     main()
@@ -1,29 +1,26 @@
 import demistomock as demisto
 from CommonServerPython import *
 
-from netaddr import IPAddress, IPNetwork
+RFC1918_RANGES = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
 
 
 def main():
     try:
         args = demisto.args()
-        ip_address = args.get('value')
-        if not ip_address:
-            ip_address = args.get('left')
-        if not ip_address:
+        ip_addresses = argToList(args.get('value'))
+        if not ip_addresses:
+            ip_addresses = argToList(args.get('left'))
+        if not ip_addresses:
             raise Exception('Please enter an IPv4 Address either in the value or in the left arguments.')
 
-        cidr_range_list = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
-
-        for cidr in cidr_range_list:
-            if IPAddress(ip_address) in IPNetwork(cidr):
-                demisto.results(True)
-                return
-
-        demisto.results(False)
+        # a list of IP addresses is classified in one call, with a result for each of them
+        results = get_ip_ranges_index(RFC1918_RANGES).classify(ip_addresses)
+        demisto.results(results[0] if len(results) == 1 else results)
     except Exception as err:
         return_error(str(err))
 
 
+from IPRangesApiModule import *  # noqa: E402
+
 if __name__ == "__builtin__" or __name__ == "builtins":
     main()
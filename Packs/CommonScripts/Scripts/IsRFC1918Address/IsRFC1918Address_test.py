@@ -24,3 +24,14 @@ def test_main(mocker):
     assert demisto.results.call_count == 1
     results = demisto.results.call_args
     assert results[0][0] is False
+
+
+def test_main_multiple_ips(mocker):
+    from IsRFC1918Address import main
+
+    mocker.patch.object(demisto, 'args', return_value={'value': ['172.16.0.1', '8.8.8.8', '192.168.5.5']})
+    mocker.patch.object(demisto, 'results')
+    main()
+    assert demisto.results.call_count == 1
+    results = demisto.results.call_args
+    assert results[0][0] == [True, False, True]
@@ -12,7 +12,7 @@ import tempfile
 import unicodedata
 from base64 import b64decode
 # coding=utf-8
-from email import encoders, message_from_string
+from email import encoders
 from email.header import Header, decode_header
 from email.mime.audio import MIMEAudio
 from email.mime.base import MIMEBase
@@ -21,6 +21,7 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.parser import HeaderParser
 from email.utils import getaddresses
+from io import BytesIO
 from struct import unpack
 
 import chardet
@@ -33,6 +34,8 @@ reload(sys)
 sys.setdefaultencoding('utf8')  # pylint: disable=no-member
 
 MAX_DEPTH_CONST = 3
+# attached emails larger than this are spilled to a temporary file while they are parsed
+MAX_IN_MEMORY_EML_SIZE = 1024 * 1024
 
 """
 https://github.com/vikramarsid/msg_parser
@@ -3358,23 +3361,15 @@ def save_attachments(attachments, root_email_file_name, max_depth):
             demisto.results(fileResult(display_name, attachment.data))
             name_lower = display_name.lower()
             if max_depth > 0 and (name_lower.endswith(".eml") or name_lower.endswith('.p7m')):
-                tf = tempfile.NamedTemporaryFile(delete=False)
-
-                try:
-                    tf.write(attachment.data)
-                    tf.close()
-
-                    inner_eml, attached_inner_emails = handle_eml(tf.name, file_name=root_email_file_name,
-                                                                  max_depth=max_depth)
-                    if inner_eml:
-                        return_outputs(
-                            readable_output=data_to_md(inner_eml, attachment.DisplayName, root_email_file_name),
-                            outputs=None)
-                        attached_emls.append(inner_eml)
-                    if attached_inner_emails:
-                        attached_emls.extend(attached_inner_emails)
-                finally:
-                    os.remove(tf.name)
+                inner_eml, attached_inner_emails = parse_eml_content(attachment.data, file_name=root_email_file_name,
+                                                                     max_depth=max_depth)
+                if inner_eml:
+                    return_outputs(
+                        readable_output=data_to_md(inner_eml, attachment.DisplayName, root_email_file_name),
+                        outputs=None)
+                    attached_emls.append(inner_eml)
+                if attached_inner_emails:
+                    attached_emls.extend(attached_inner_emails)
 
     return attached_emls
 
@@ -3536,206 +3531,265 @@ def decode_content(mime):
         return payload
 
 
-def handle_eml(file_path, b64=False, file_name=None, parse_only_headers=False, max_depth=3, bom=False):
-    global ENCODINGS_TYPES
+def create_eml_headers_map(headers):
+    """
+    Create the headers list and map of an eml from its parsed headers.
+
+    :param headers: the parsed email message (or its headers only).
+    :return: a list of the headers and a map of header name to its value, or values if it appears multiple times.
+    """
+    header_list = []
+    headers_map = {}  # type: dict
+    for item in headers.items():
+        value = unfold(convert_to_unicode(item[1]))
+        item_dict = {
+            "name": item[0],
+            "value": value
+        }
+
+        # old way to map headers
+        header_list.append(item_dict)
+
+        # new way to map headers - dictionary
+        if item[0] in headers_map:
+            # in case there is already such header
+            # then add that header value to value array
+            if not isinstance(headers_map[item[0]], list):
+                # convert the existing value to array
+                headers_map[item[0]] = [headers_map[item[0]]]
 
+            # add the new value to the value array
+            headers_map[item[0]].append(value)
+        else:
+            headers_map[item[0]] = value
+
+    return header_list, headers_map
+
+
+def handle_eml(file_path, b64=False, file_name=None, parse_only_headers=False, max_depth=3, bom=False):
     if max_depth == 0:
         return None, []
 
     with open(file_path, 'rb') as emlFile:
+        if not b64 and not bom:
+            # the file is parsed while it is read, without holding its whole content
+            return parse_eml(emlFile, file_name, parse_only_headers, max_depth)
 
         file_data = emlFile.read()
-        if b64:
-            file_data = b64decode(file_data)
-        if bom:
-            # decode bytes taking into account BOM and re-encode to utf-8
-            file_data = file_data.decode("utf-8-sig").encode("utf-8")
-
-        parser = HeaderParser()
-        headers = parser.parsestr(file_data)
-
-        header_list = []
-        headers_map = {}  # type: dict
-        for item in headers.items():
-            value = unfold(convert_to_unicode(item[1]))
-            item_dict = {
-                "name": item[0],
-                "value": value
-            }
-
-            # old way to map headers
-            header_list.append(item_dict)
-
-            # new way to map headers - dictionary
-            if item[0] in headers_map:
-                # in case there is already such header
-                # then add that header value to value array
-                if not isinstance(headers_map[item[0]], list):
-                    # convert the existing value to array
-                    headers_map[item[0]] = [headers_map[item[0]]]
-
-                # add the new value to the value array
-                headers_map[item[0]].append(value)
-            else:
-                headers_map[item[0]] = value
 
-        eml = message_from_string(file_data)
-        if not eml:
+    if b64:
+        file_data = b64decode(file_data)
+    if bom:
+        # decode bytes taking into account BOM and re-encode to utf-8
+        file_data = file_data.decode("utf-8-sig").encode("utf-8")
+
+    return parse_eml(BytesIO(file_data), file_name, parse_only_headers, max_depth)
+
+
+def parse_eml(eml_file, file_name=None, parse_only_headers=False, max_depth=3):
+    """
+    Parse an eml from a file object, the message is parsed once and its headers are taken from the parsed message.
+
+    :param eml_file: a file object of the eml data.
+    :param file_name: the name of the eml file.
+    :param parse_only_headers: whether to parse only the headers of the eml, without its body.
+    :param max_depth: the maximal depth of attached emails to parse.
+    :return: the email data and a list of the attached emails data.
+    """
+    if max_depth == 0:
+        return None, []
+
+    if parse_only_headers:
+        headers = HeaderParser().parse(eml_file)
+        if not headers:
             raise Exception("Could not parse eml file!")
+        return {"HeadersMap": create_eml_headers_map(headers)[1]}, []
 
-        if parse_only_headers:
-            return {"HeadersMap": headers_map}, []
+    eml = email.message_from_file(eml_file)
+    if not eml:
+        raise Exception("Could not parse eml file!")
 
-        html = ''
-        text = ''
-        attachment_names = []
+    return handle_eml_message(eml, file_name, max_depth)
 
-        attached_emails = []
-        parts = [eml]
-
-        while parts:
-            part = parts.pop()
-            if (part.is_multipart() or part.get_content_type().startswith('multipart')) \
-                    and "attachment" not in part.get("Content-Disposition", ""):
-                parts += [part_ for part_ in part.get_payload() if isinstance(part_, email.message.Message)]
-
-            elif part.get_filename() or "attachment" in part.get("Content-Disposition", ""):
-
-                attachment_file_name = convert_to_unicode(part.get_filename())
-                if attachment_file_name is None and part.get('filename'):
-                    attachment_file_name = os.path.normpath(part.get('filename'))
-                    if os.path.isabs(attachment_file_name):
-                        attachment_file_name = os.path.basename(attachment_file_name)
-
-                if "message/rfc822" in part.get("Content-Type", "") \
-                        or ("application/octet-stream" in part.get("Content-Type", "")
-                            and attachment_file_name.endswith(".eml")):
-
-                    # .eml files
-                    file_content = ""  # type: str
-                    base64_encoded = "base64" in part.get("Content-Transfer-Encoding", "")
-
-                    if isinstance(part.get_payload(), list) and len(part.get_payload()) > 0:
-                        if attachment_file_name is None or attachment_file_name == "" or attachment_file_name == 'None':
-                            # in case there is no filename for the eml
-                            # we will try to use mail subject as file name
-                            # Subject will be in the email headers
-                            attachment_name = part.get_payload()[0].get('Subject', "no_name_mail_attachment")
-                            attachment_file_name = convert_to_unicode(attachment_name) + '.eml'
-
-                        file_content = part.get_payload()[0].as_string().strip()
-                        if base64_encoded:
-                            try:
-                                file_content = b64decode(file_content)
-
-                            except TypeError:
-                                pass  # In case the file is a string, decode=True for get_payload is not working
-
-                    elif isinstance(part.get_payload(), basestring):
-                        file_content = part.get_payload(decode=True)
-                    else:
-                        demisto.debug("found eml attachment with Content-Type=message/rfc822 but has no payload")
 
-                    if file_content:
-                        # save the eml to war room as file entry
+def parse_eml_content(eml_content, file_name=None, max_depth=3):
+    """
+    Parse an attached eml from its content. A content larger than MAX_IN_MEMORY_EML_SIZE is spilled to a temporary
+    file and parsed from it, so the emails nested up to max_depth do not each hold another copy of it in memory.
+
+    :param eml_content: the content of the attached eml.
+    :param file_name: the name of the eml file.
+    :param max_depth: the maximal depth of attached emails to parse.
+    :return: the email data and a list of the attached emails data.
+    """
+    if len(eml_content) <= MAX_IN_MEMORY_EML_SIZE:
+        return parse_eml(BytesIO(eml_content), file_name=file_name, max_depth=max_depth)
+
+    with tempfile.TemporaryFile() as eml_file:
+        eml_file.write(eml_content)
+        eml_file.seek(0)
+        return parse_eml(eml_file, file_name=file_name, max_depth=max_depth)
+
+
+def handle_eml_message(eml, file_name=None, max_depth=3):
+    """
+    Extract the email data of a parsed eml, and parse its attached emails up to max_depth.
+
+    :param eml: the parsed email message.
+    :param file_name: the name of the eml file.
+    :param max_depth: the maximal depth of attached emails to parse.
+    :return: the email data and a list of the attached emails data.
+    """
+    global ENCODINGS_TYPES
+
+    if max_depth == 0:
+        return None, []
+
+    header_list, headers_map = create_eml_headers_map(eml)
+
+    html = ''
+    text = ''
+    attachment_names = []
+
+    attached_emails = []
+    parts = [eml]
+
+    while parts:
+        part = parts.pop()
+        if (part.is_multipart() or part.get_content_type().startswith('multipart')) \
+                and "attachment" not in part.get("Content-Disposition", ""):
+            parts += [part_ for part_ in part.get_payload() if isinstance(part_, email.message.Message)]
+
+        elif part.get_filename() or "attachment" in part.get("Content-Disposition", ""):
+
+            attachment_file_name = convert_to_unicode(part.get_filename())
+            if attachment_file_name is None and part.get('filename'):
+                attachment_file_name = os.path.normpath(part.get('filename'))
+                if os.path.isabs(attachment_file_name):
+                    attachment_file_name = os.path.basename(attachment_file_name)
+
+            if "message/rfc822" in part.get("Content-Type", "") \
+                    or ("application/octet-stream" in part.get("Content-Type", "")
+                        and attachment_file_name.endswith(".eml")):
+
+                # .eml files
+                file_content = ""  # type: str
+                base64_encoded = "base64" in part.get("Content-Transfer-Encoding", "")
+
+                if isinstance(part.get_payload(), list) and len(part.get_payload()) > 0:
+                    if attachment_file_name is None or attachment_file_name == "" or attachment_file_name == 'None':
+                        # in case there is no filename for the eml
+                        # we will try to use mail subject as file name
+                        # Subject will be in the email headers
+                        attachment_name = part.get_payload()[0].get('Subject', "no_name_mail_attachment")
+                        attachment_file_name = convert_to_unicode(attachment_name) + '.eml'
+
+                    file_content = part.get_payload()[0].as_string().strip()
+                    if base64_encoded:
+                        try:
+                            file_content = b64decode(file_content)
+
+                        except TypeError:
+                            pass  # In case the file is a string, decode=True for get_payload is not working
+
+                elif isinstance(part.get_payload(), basestring):
+                    file_content = part.get_payload(decode=True)
+                else:
+                    demisto.debug("found eml attachment with Content-Type=message/rfc822 but has no payload")
+
+                if file_content:
+                    # save the eml to war room as file entry
+                    demisto.results(fileResult(attachment_file_name, file_content))
+
+                if file_content and max_depth - 1 > 0:
+                    inner_eml, inner_attached_emails = parse_eml_content(file_content, file_name=attachment_file_name,
+                                                                         max_depth=max_depth - 1)
+                    attached_emails.append(inner_eml)
+                    attached_emails.extend(inner_attached_emails)
+                    # if we are outter email is a singed attachment it is a wrapper and we don't return the output of
+                    # this inner email as it will be returned as part of the main result
+                    if 'multipart/signed' not in eml.get_content_type() and inner_eml:
+                        return_outputs(readable_output=data_to_md(inner_eml, attachment_file_name, file_name),
+                                       outputs=None)
+                attachment_names.append(attachment_file_name)
+            else:
+                # .msg and other files (png, jpeg)
+                if part.is_multipart() and max_depth - 1 > 0:
+                    # email is DSN
+                    msgs = part.get_payload()  # human-readable section
+                    i = 0
+                    for indiv_msg in msgs:
+                        msg = indiv_msg.get_payload()
+                        attachment_file_name = indiv_msg.get_filename()
+                        try:
+                            # In some cases the body content is empty and cannot be decoded.
+                            msg_info = base64.b64decode(msg).decode('utf-8', errors='ignore')
+                        except TypeError:
+                            msg_info = str(msg)
+                        attached_emails.append(msg_info)
+                        if attachment_file_name is None:
+                            attachment_file_name = "unknown_file_name{}".format(i)
+                        demisto.results(fileResult(attachment_file_name, msg_info))
+                        attachment_names.append(attachment_file_name)
+                        i += 1
+
+                else:
+                    file_content = part.get_payload(decode=True)
+                    # fileResult will return an error if file_content is None.
+                    if file_content and not attachment_file_name.endswith('.p7s'):
                         demisto.results(fileResult(attachment_file_name, file_content))
 
-                    if file_content and max_depth - 1 > 0:
+                    if attachment_file_name.endswith(".msg") and max_depth - 1 > 0:
                         f = tempfile.NamedTemporaryFile(delete=False)
                         try:
                             f.write(file_content)
                             f.close()
-                            inner_eml, inner_attached_emails = handle_eml(file_path=f.name,
-                                                                          file_name=attachment_file_name,
-                                                                          max_depth=max_depth - 1)
-                            attached_emails.append(inner_eml)
+                            inner_msg, inner_attached_emails = handle_msg(f.name, attachment_file_name, False,
+                                                                          max_depth - 1)
+                            attached_emails.append(inner_msg)
                             attached_emails.extend(inner_attached_emails)
-                            # if we are outter email is a singed attachment it is a wrapper and we don't return the output of
-                            # this inner email as it will be returned as part of the main result
-                            if 'multipart/signed' not in eml.get_content_type() and inner_eml:
-                                return_outputs(readable_output=data_to_md(inner_eml, attachment_file_name, file_name),
-                                               outputs=None)
+
+                            # will output the inner email to the UI
+                            return_outputs(
+                                readable_output=data_to_md(inner_msg, attachment_file_name, file_name),
+                                outputs=None)
                         finally:
                             os.remove(f.name)
-                    attachment_names.append(attachment_file_name)
-                else:
-                    # .msg and other files (png, jpeg)
-                    if part.is_multipart() and max_depth - 1 > 0:
-                        # email is DSN
-                        msgs = part.get_payload()  # human-readable section
-                        i = 0
-                        for indiv_msg in msgs:
-                            msg = indiv_msg.get_payload()
-                            attachment_file_name = indiv_msg.get_filename()
-                            try:
-                                # In some cases the body content is empty and cannot be decoded.
-                                msg_info = base64.b64decode(msg).decode('utf-8', errors='ignore')
-                            except TypeError:
-                                msg_info = str(msg)
-                            attached_emails.append(msg_info)
-                            if attachment_file_name is None:
-                                attachment_file_name = "unknown_file_name{}".format(i)
-                            demisto.results(fileResult(attachment_file_name, msg_info))
-                            attachment_names.append(attachment_file_name)
-                            i += 1
-
-                    else:
-                        file_content = part.get_payload(decode=True)
-                        # fileResult will return an error if file_content is None.
-                        if file_content and not attachment_file_name.endswith('.p7s'):
-                            demisto.results(fileResult(attachment_file_name, file_content))
-
-                        if attachment_file_name.endswith(".msg") and max_depth - 1 > 0:
-                            f = tempfile.NamedTemporaryFile(delete=False)
-                            try:
-                                f.write(file_content)
-                                f.close()
-                                inner_msg, inner_attached_emails = handle_msg(f.name, attachment_file_name, False,
-                                                                              max_depth - 1)
-                                attached_emails.append(inner_msg)
-                                attached_emails.extend(inner_attached_emails)
-
-                                # will output the inner email to the UI
-                                return_outputs(
-                                    readable_output=data_to_md(inner_msg, attachment_file_name, file_name),
-                                    outputs=None)
-                            finally:
-                                os.remove(f.name)
 
-                        attachment_names.append(attachment_file_name)
-                demisto.setContext('AttachmentName', attachment_file_name)
-
-            elif part.get_content_type() == 'text/html':
-                # This line replaces a new line that starts with `..` to a newline that starts with `.`
-                # This is because SMTP duplicate dots for lines that start with `.` and get_payload() doesn't format
-                # this correctly
-                part._payload = part._payload.replace('=\r\n..', '=\r\n.')
-                html = get_utf_string(decode_content(part), 'HTML')
-
-            elif part.get_content_type() == 'text/plain':
-                text = get_utf_string(decode_content(part), 'TEXT')
-        email_data = None
-        # if we are parsing a signed attachment there can be one of two options:
-        # 1. it is 'multipart/signed' so it is probably a wrapper and we can ignore the outer "email"
-        # 2. if it is 'multipart/signed' but has 'to' address so it is actually a real mail.
-        if 'multipart/signed' not in eml.get_content_type() \
-                or ('multipart/signed' in eml.get_content_type()
-                    and (extract_address_eml(eml, 'to') or extract_address_eml(eml, 'from') or eml.get('subject'))):
-            email_data = {
-                'To': extract_address_eml(eml, 'to'),
-                'CC': extract_address_eml(eml, 'cc'),
-                'From': extract_address_eml(eml, 'from'),
-                'Subject': convert_to_unicode(eml['Subject']),
-                'HTML': convert_to_unicode(html, is_msg_header=False),
-                'Text': convert_to_unicode(text, is_msg_header=False),
-                'Headers': header_list,
-                'HeadersMap': headers_map,
-                'Attachments': ','.join(attachment_names) if attachment_names else '',
-                'AttachmentNames': attachment_names if attachment_names else [],
-                'Format': eml.get_content_type(),
-                'Depth': MAX_DEPTH_CONST - max_depth
-            }
-        return email_data, attached_emails
+                    attachment_names.append(attachment_file_name)
+            demisto.setContext('AttachmentName', attachment_file_name)
+
+        elif part.get_content_type() == 'text/html':
+            # This line replaces a new line that starts with `..` to a newline that starts with `.`
+            # This is because SMTP duplicate dots for lines that start with `.` and get_payload() doesn't format
+            # this correctly
+            part._payload = part._payload.replace('=\r\n..', '=\r\n.')
+            html = get_utf_string(decode_content(part), 'HTML')
+
+        elif part.get_content_type() == 'text/plain':
+            text = get_utf_string(decode_content(part), 'TEXT')
+    email_data = None
+    # if we are parsing a signed attachment there can be one of two options:
+    # 1. it is 'multipart/signed' so it is probably a wrapper and we can ignore the outer "email"
+    # 2. if it is 'multipart/signed' but has 'to' address so it is actually a real mail.
+    if 'multipart/signed' not in eml.get_content_type() \
+            or ('multipart/signed' in eml.get_content_type()
+                and (extract_address_eml(eml, 'to') or extract_address_eml(eml, 'from') or eml.get('subject'))):
+        email_data = {
+            'To': extract_address_eml(eml, 'to'),
+            'CC': extract_address_eml(eml, 'cc'),
+            'From': extract_address_eml(eml, 'from'),
+            'Subject': convert_to_unicode(eml['Subject']),
+            'HTML': convert_to_unicode(html, is_msg_header=False),
+            'Text': convert_to_unicode(text, is_msg_header=False),
+            'Headers': header_list,
+            'HeadersMap': headers_map,
+            'Attachments': ','.join(attachment_names) if attachment_names else '',
+            'AttachmentNames': attachment_names if attachment_names else [],
+            'Format': eml.get_content_type(),
+            'Depth': MAX_DEPTH_CONST - max_depth
+        }
+    return email_data, attached_emails
 
 
 def create_email_output(email_data, attached_emails):
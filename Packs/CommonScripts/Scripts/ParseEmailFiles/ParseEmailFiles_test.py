@@ -990,6 +990,45 @@ def test_only_parts_of_object_email_saved(mocker):
     assert results[0]['EntryContext']['Email']['AttachmentNames'] == ['logo5.png', 'logo2.png']
 
 
+def test_parse_eml_from_memory(mocker):
+    """
+    Given: An email containing a base64 encoded attached email.
+    When: Parsing the email from its file, and from its content in memory.
+    Then: The email and its attached email are parsed the same, and only the headers are parsed when requested.
+    """
+    from io import BytesIO
+    from ParseEmailFiles import handle_eml, parse_eml
+    mocker.patch.object(demisto, 'results')
+    mocker.patch('ParseEmailFiles.return_outputs')
+    with open('test_data/eml_contains_base64_eml.eml', 'rb') as f:
+        file_data = f.read()
+
+    email_data, attached_emails = handle_eml('test_data/eml_contains_base64_eml.eml', file_name='email.eml')
+
+    assert parse_eml(BytesIO(file_data), file_name='email.eml') == (email_data, attached_emails)
+    assert len(attached_emails) == 1
+    assert parse_eml(BytesIO(file_data), parse_only_headers=True) == ({'HeadersMap': email_data['HeadersMap']}, [])
+
+
+def test_parse_large_attached_eml_from_file(mocker):
+    """
+    Given: An email containing an attached email larger than MAX_IN_MEMORY_EML_SIZE.
+    When: Parsing the email.
+    Then: The attached email is parsed from a temporary file, the same as when it is parsed in memory.
+    """
+    import tempfile
+    from ParseEmailFiles import handle_eml
+    mocker.patch.object(demisto, 'results')
+    mocker.patch('ParseEmailFiles.return_outputs')
+    email_data, attached_emails = handle_eml('test_data/eml_contains_base64_eml.eml', file_name='email.eml')
+
+    mocker.patch('ParseEmailFiles.MAX_IN_MEMORY_EML_SIZE', 0)
+    temporary_file = mocker.spy(tempfile, 'TemporaryFile')
+
+    assert handle_eml('test_data/eml_contains_base64_eml.eml', file_name='email.eml') == (email_data, attached_emails)
+    assert temporary_file.call_count == 1
+
+
 def test_pkcs7_mime(mocker):
     """
     Given: An email file smime2.p7m of type application/pkcs7-mime and info -
@@ -6,6 +6,8 @@ from datetime import datetime
 import re
 import sys
 import traceback
+from collections import OrderedDict, deque
+from itertools import islice
 try:
     from StringIO import StringIO  # for Python 2
 except ImportError:
@@ -20,6 +22,11 @@ START = ""
 LIMIT_DATA = 0
 ALLOWED_CONTENT_TYPES: tuple = ()
 
+# Requests of a stream which got no response for this long (in capture time) are considered unanswered
+STREAM_IDLE_TIMEOUT = 600
+# The maximal number of streams which are waiting for responses, above it the most idle streams are evicted
+MAX_OPEN_STREAMS = 10000
+
 # Used to convert pyshark keys to Demisto's conventions
 # Also used as a whitelist of relevant keys for outputs.
 PYSHARK_RES_TO_DEMISTO = {
@@ -129,25 +136,6 @@ def get_entry_from_args():
     return res, entry_id
 
 
-def _chunker(seq, size):
-    """
-    Function that groups items in a sequence for easier iteration of multiple items at once.
-
-    :param seq: the sequence (list/generator)
-    :param size: the size of the group (chunk)
-    :return: an iterator that outputs groups of items (chunks) from the sequence
-    """
-    ret = []
-    for i in range(0, len(seq), size):
-        chunk = seq[i: i + size]
-
-        # Make sure the chunks are with a specified size
-        padding = ["" for j in range(size - len(chunk))]
-        ret.append(chunk + padding)
-
-    return iter(ret)
-
-
 def decode_gzip(str_compressed):
     """
     Decode a hex string with gz decompression
@@ -169,79 +157,98 @@ def _date_to_ISO(strdate):
     return datetime.strptime(strdate, '%a, %d %b %Y %H:%M:%S %Z').isoformat()
 
 
-def get_next_matching_index(http_packets, tcp_src, tcp_dst, ip_src, ip_dst):
-    for i, p in enumerate(http_packets):
-        if p["TCP"].srcport == tcp_dst and \
-                p["TCP"].dstport == tcp_src and \
-                p["IP"].src == ip_dst and \
-                p["IP"].dst == ip_src:
-            return i
-    return None
-
-
-def fix_order(http_packets):
+def get_stream_key(packet, reverse=False):
     """
-    Re-organizes the http packets to be request-response pairs.
-    Sometimes pyshark doesn't put the packets in the order they are HTTP-wise.
-    So we are re-organizing them according to the tcp and ip information of the packets.
-    :param http_packets:
-    :return: http_packets
-    """
-    new_order = []
-
-    # For each packet find the next one that matches the tcp,ip tuple.
-    while len(http_packets) > 0:
-        packet = http_packets[0]
-        tcp_src = packet["TCP"].srcport
-        tcp_dst = packet["TCP"].dstport
-        ip_src = packet["IP"].src
-        ip_dst = packet["IP"].dst
-        new_order.append(packet)
-        del http_packets[0]
-
-        next_matching_index = get_next_matching_index(http_packets, tcp_src, tcp_dst, ip_src, ip_dst)
-        if next_matching_index is None:
-            new_order.append(None)
-        else:
-            new_order.append(http_packets[next_matching_index])
-            del http_packets[next_matching_index]
+    Return the TCP/IP tuple of the stream of a packet.
 
-    return new_order
+    :param packet: a pyshark packet.
+    :param reverse: whether to return the tuple of the opposite direction of the stream.
+    :return: a tuple of (ip_src, tcp_src, ip_dst, tcp_dst)
+    """
+    tcp = packet["TCP"]
+    ip = packet["IP"]
+    if reverse:
+        return ip.dst, tcp.dstport, ip.src, tcp.srcport
+    return ip.src, tcp.srcport, ip.dst, tcp.dstport
 
 
-def get_http_flows(pcap_file_path):
+def is_http_response(packet):
     """
-    Return a list of HTTP requests/responses from pcap file
+    Check if a HTTP packet is a response.
 
-    :param pcap_file_path:
-    :return: list of requests/response pairs.
+    :param packet: a pyshark packet with a HTTP layer.
+    :return: True if the packet is a HTTP response.
     """
-    capture_object = pyshark.FileCapture(pcap_file_path, display_filter='tcp')
+    return 'http.response' in packet['HTTP'].__dict__["_all_fields"]
+
 
-    # Filter all non HTTP packets
-    http_packets = [p for p in capture_object if "HTTP" in p]
-    http_packets = fix_order(http_packets)
+def evict_idle_streams(open_streams, current_time):
+    """
+    Remove the streams which waited too long for a response, or the most idle streams when there are too many of them,
+    and yield their requests as unanswered.
 
-    # Construct request <> response dicts
-    http_flows = []
+    :param open_streams: an ordered dict of stream key: [last seen time, requests], from the most idle stream.
+    :param current_time: the sniff time of the current packet.
+    :return: a generator of requests/response pairs, without a response.
+    """
+    while open_streams:
+        stream_key, (last_seen, requests) = next(iter(open_streams.items()))
+        if len(open_streams) <= MAX_OPEN_STREAMS and current_time - last_seen < STREAM_IDLE_TIMEOUT:
+            return
+        del open_streams[stream_key]
+        for request in requests:
+            yield {"Request": request, "Response": None}
 
-    for req, res in _chunker(http_packets, 2):
-        sanitized_req = req
-        sanitized_res = res
 
-        if req:
-            req_fields = req['HTTP'].__dict__["_all_fields"].keys()
+def get_http_flows(pcap_file_path):
+    """
+    Return a generator of HTTP requests/responses from pcap file, each pair is yielded once its response is found.
+    Responses are matched to the requests of the opposite direction of their TCP stream, in the order they were sent.
 
-            # if the file contains only a response, the response will falsely appear in the 'req' variable
-            if 'http.response' in req_fields:
-                sanitized_req = None
-                sanitized_res = req
+    :param pcap_file_path:
+    :return: generator of requests/response pairs.
+    """
+    capture_object = pyshark.FileCapture(pcap_file_path, display_filter='tcp && http', keep_packets=False)
 
-        http_flows.append({
-            "Request": sanitized_req,
-            "Response": sanitized_res
-        })
-    return http_flows
+    # The requests waiting for a response by their stream, from the most idle stream
+    open_streams: OrderedDict = OrderedDict()
+    try:
+        for packet in capture_object:
+            if "HTTP" not in packet:
+                continue
+
+            packet_time = float(packet.sniff_timestamp)
+            if is_http_response(packet):
+                stream_key = get_stream_key(packet, reverse=True)
+                stream = open_streams.get(stream_key)
+                request = None
+                if stream:
+                    request = stream[1].popleft()
+                    if stream[1]:
+                        stream[0] = packet_time
+                        open_streams.move_to_end(stream_key)
+                    else:
+                        del open_streams[stream_key]
+
+                yield {
+                    "Request": request,
+                    "Response": packet
+                }
+            else:
+                stream_key = get_stream_key(packet)
+                stream = open_streams.setdefault(stream_key, [packet_time, deque()])
+                stream[0] = packet_time
+                stream[1].append(packet)
+                open_streams.move_to_end(stream_key)
+
+            yield from evict_idle_streams(open_streams, packet_time)
+
+        # The requests left were never answered
+        for _, requests in open_streams.values():
+            for request in requests:
+                yield {"Request": request, "Response": None}
+    finally:
+        capture_object.close()
 
 
 def get_flow_info(http_flow):
@@ -404,11 +411,9 @@ def main():
         # Work on the pcap file and return a result
         http_flows = get_http_flows(pcap_file_path_in_container)
 
-        # Cut results according to the user args (times 2, because we are working on pairs of requests and responses).
-        if START:
-            http_flows = http_flows[int(START):]
-        if LIMIT:
-            http_flows = http_flows[:int(LIMIT)]
+        # Cut results according to the user args, the capture is read only until the last flow needed.
+        start = int(START) if START else 0
+        http_flows = islice(http_flows, start, start + int(LIMIT) if LIMIT else None)
 
         # Format and get output representation of the flows
         formatted_http_flows = format_http_flows(http_flows, PYSHARK_RES_TO_DEMISTO, LIMIT_DATA, ALLOWED_CONTENT_TYPES)
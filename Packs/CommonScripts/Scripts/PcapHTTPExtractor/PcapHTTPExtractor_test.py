@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+
+import demistomock as demisto
+import pytest
+
+import PcapHTTPExtractor
+
+
+class FakePacket(dict):
+    """
+    A pyshark packet with the layers used for matching requests and responses.
+    """
+
+    def __init__(self, number, sniff_time, src, src_port, dst, dst_port, is_response):
+        http_fields = {'http.response': '1', 'http.response.code': '200'} if is_response \
+            else {'http.request.method': 'GET'}
+        super().__init__(TCP=SimpleNamespace(srcport=src_port, dstport=dst_port),
+                         IP=SimpleNamespace(src=src, dst=dst),
+                         HTTP=SimpleNamespace(_all_fields=http_fields))
+        self.number = number
+        self.sniff_timestamp = str(sniff_time)
+        self.frame_info = SimpleNamespace(number=number)
+
+
+class FakeCapture:
+    """
+    A pyshark FileCapture over a list of packets, which records how many packets were read.
+    """
+
+    def __init__(self, packets):
+        self.packets = packets
+        self.read_packets = 0
+        self.closed = False
+
+    def __iter__(self):
+        for packet in self.packets:
+            self.read_packets += 1
+            yield packet
+
+    def close(self):
+        self.closed = True
+
+
+def request(number, sniff_time, client='1.1.1.1', client_port='1000'):
+    return FakePacket(number, sniff_time, client, client_port, '2.2.2.2', '80', is_response=False)
+
+
+def response(number, sniff_time, client='1.1.1.1', client_port='1000'):
+    return FakePacket(number, sniff_time, '2.2.2.2', '80', client, client_port, is_response=True)
+
+
+def get_flows_numbers(mocker, packets):
+    capture = FakeCapture(packets)
+    mocker.patch.object(PcapHTTPExtractor.pyshark, 'FileCapture', return_value=capture)
+    flows = [(flow['Request'] and flow['Request'].number, flow['Response'] and flow['Response'].number)
+             for flow in PcapHTTPExtractor.get_http_flows('test.pcap')]
+    assert capture.closed
+    return flows
+
+
+def test_get_http_flows_interleaved_streams(mocker):
+    """
+    Given:
+        - Requests of two TCP streams, whose responses are sent in the opposite order.
+    When:
+        - Extracting the HTTP flows.
+    Then:
+        - Ensure every response is matched to the request of its own stream.
+    """
+    packets = [request(1, 0), request(2, 1, client_port='2000'),
+               response(3, 2, client_port='2000'), response(4, 3)]
+    assert get_flows_numbers(mocker, packets) == [(2, 3), (1, 4)]
+
+
+def test_get_http_flows_pipelined_requests(mocker):
+    """
+    Given:
+        - Several requests sent on the same TCP stream before their responses.
+    When:
+        - Extracting the HTTP flows.
+    Then:
+        - Ensure the responses are matched to the requests in the order they were sent.
+    """
+    packets = [request(1, 0), request(2, 1), request(3, 2), response(4, 3), response(5, 4), response(6, 5)]
+    assert get_flows_numbers(mocker, packets) == [(1, 4), (2, 5), (3, 6)]
+
+
+def test_get_http_flows_response_without_request(mocker):
+    """
+    Given:
+        - A response of a TCP stream without requests, and a request which is never answered.
+    When:
+        - Extracting the HTTP flows.
+    Then:
+        - Ensure the response is returned without a request, and the request is returned without a response.
+    """
+    packets = [request(1, 0), response(2, 1, client='3.3.3.3')]
+    assert get_flows_numbers(mocker, packets) == [(None, 2), (1, None)]
+
+
+def test_get_http_flows_idle_stream_eviction(mocker):
+    """
+    Given:
+        - A request which got no response for longer than STREAM_IDLE_TIMEOUT, and a later response of its stream.
+    When:
+        - Extracting the HTTP flows.
+    Then:
+        - Ensure the request is returned unanswered once the timeout passed, and the late response has no request.
+    """
+    timeout = PcapHTTPExtractor.STREAM_IDLE_TIMEOUT
+    packets = [request(1, 0), request(2, timeout, client_port='2000'), response(3, timeout + 1)]
+    assert get_flows_numbers(mocker, packets) == [(1, None), (None, 3), (2, None)]
+
+
+def test_get_http_flows_max_open_streams_eviction(mocker):
+    """
+    Given:
+        - More streams waiting for responses than MAX_OPEN_STREAMS.
+    When:
+        - Extracting the HTTP flows.
+    Then:
+        - Ensure the requests of the most idle stream are returned unanswered, and the other streams are matched.
+    """
+    mocker.patch.object(PcapHTTPExtractor, 'MAX_OPEN_STREAMS', 2)
+    packets = [request(1, 0), request(2, 1), request(3, 2, client_port='2000'), request(4, 3, client_port='3000'),
+               response(5, 4, client_port='2000'), response(6, 5, client_port='3000'), response(7, 6)]
+    assert get_flows_numbers(mocker, packets) == [(1, None), (2, None), (3, 5), (4, 6), (None, 7)]
+
+
+@pytest.mark.parametrize('start, limit, expected_indices, expected_read_packets', [
+    ('', '', [2, 4, 6], 6),
+    ('1', '', [4, 6], 6),
+    ('', '1', [2], 2),
+    ('1', '1', [4], 4),
+])
+def test_main_start_and_limit(mocker, start, limit, expected_indices, expected_read_packets):
+    """
+    Given:
+        - A capture of three requests/response pairs, and the start and limit arguments.
+    When:
+        - Running the script.
+    Then:
+        - Ensure only the flows in the range are returned, and the capture is read only until the last of them.
+    """
+    capture = FakeCapture([request(1, 0), response(2, 1), request(3, 2), response(4, 3),
+                           request(5, 4), response(6, 5)])
+    mocker.patch.object(PcapHTTPExtractor.pyshark, 'FileCapture', return_value=capture)
+    mocker.patch.object(PcapHTTPExtractor, 'get_entry_from_args',
+                        return_value=([{'Contents': {'path': 'test.pcap'}}], '1'))
+    mocker.patch.object(demisto, 'args', return_value={'start': start, 'limit': limit, 'limitData': '100'})
+    mocker.patch.object(demisto, 'results')
+
+    PcapHTTPExtractor.main()
+
+    flows = demisto.results.call_args[0][0]['EntryContext']['PcapHTTPFlows']
+    assert [flow['Response']['ResultIndex'] for flow in flows] == expected_indices
+    assert [flow['Request']['ResultIndex'] for flow in flows] == [index - 1 for index in expected_indices]
+    assert capture.read_packets == expected_read_packets
@@ -2,9 +2,185 @@ import traceback
 import demistomock as demisto  # noqa: F401
 from CommonServerPython import *  # noqa: F401
 
-import tempfile
+from collections import defaultdict
+from typing import Tuple
+
+# The constants of the ssdeep (libfuzzy) algorithm
+SPAMSUM_LENGTH = 64
+MIN_BLOCKSIZE = 3
+ROLLING_WINDOW = 7
+
+BLOCK_SIZE_REGEX = re.compile(r'\d+')
+CHUNKS_REGEX = re.compile(r':([^:]{0,%d}):([^:,]{0,%d})(?:,.*)?$' % (SPAMSUM_LENGTH, SPAMSUM_LENGTH))
+SEQUENCES_REGEX = re.compile(r'(.)\1{3,}')
+
+''' SSDEEP COMPARISON '''
+
+
+class SSDeepHash:
+    """
+    A parsed ssdeep hash: <block size>:<chunk>:<double chunk>, where the double chunk is computed with twice the block
+    size. Sequences of more than 3 identical characters are reduced to 3, as they carry little information.
+    """
+
+    def __init__(self, ssdeep_hash: str, block_size: int, chunk: str, double_chunk: str, is_valid: bool):
+        self.hash = ssdeep_hash
+        self.block_size = block_size
+        self.is_valid = is_valid
+        self.chunk = SEQUENCES_REGEX.sub(r'\1\1\1', chunk)
+        self.double_chunk = SEQUENCES_REGEX.sub(r'\1\1\1', double_chunk)
+        self.chunk_ngrams = _get_ngrams(self.chunk)
+        self.double_chunk_ngrams = _get_ngrams(self.double_chunk)
+
+    def signature(self) -> tuple:
+        return self.block_size, self.chunk, self.double_chunk
+
+    def chunks_by_block_size(self) -> List[Tuple[int, str, set]]:
+        """
+        Returns: the chunks with the block size they were computed with, and their n-grams.
+        """
+        return [(self.block_size, self.chunk, self.chunk_ngrams),
+                (self.block_size * 2, self.double_chunk, self.double_chunk_ngrams)]
+
+
+def _get_ngrams(chunk: str) -> set:
+    return {chunk[i:i + ROLLING_WINDOW] for i in range(len(chunk) - ROLLING_WINDOW + 1)}
+
+
+def parse_ssdeep_hash(ssdeep_hash: str) -> Optional[SSDeepHash]:
+    """
+    Args:
+        ssdeep_hash: an ssdeep hash.
+
+    Returns: the parsed hash, None if it doesn't start with a block size (such hashes are ignored by ssdeep).
+    A hash with a block size but with invalid chunks is kept, and is not similar to any hash.
+
+    """
+    block_size_match = BLOCK_SIZE_REGEX.match(ssdeep_hash)
+    if not block_size_match:
+        return None
+    chunks_match = CHUNKS_REGEX.match(ssdeep_hash, block_size_match.end())
+    chunk, double_chunk = chunks_match.groups() if chunks_match else ('', '')
+    return SSDeepHash(ssdeep_hash, int(block_size_match.group()), chunk, double_chunk, chunks_match is not None)
+
+
+def _edit_distance(s1: str, s2: str) -> int:
+    """
+    The edit distance of ssdeep, in which insertions and removals cost 1 and replacements cost 2.
+    """
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1, 1):
+        current_row = [i]
+        for j, c2 in enumerate(s2, 1):
+            current_row.append(min(previous_row[j] + 1,
+                                   current_row[j - 1] + 1,
+                                   previous_row[j - 1] + (0 if c1 == c2 else 2)))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+def _score_chunks(chunk1: str, ngrams1: set, chunk2: str, ngrams2: set, block_size: int) -> int:
+    """
+    Scores two chunks computed with the same block size, as in libfuzzy's score_strings.
+    """
+    if ngrams1.isdisjoint(ngrams2):
+        return 0
+    score = _edit_distance(chunk1, chunk2)
+    score = (score * SPAMSUM_LENGTH) // (len(chunk1) + len(chunk2))
+    score = (100 * score) // SPAMSUM_LENGTH
+    if score >= 100:
+        return 0
+    score = 100 - score
+    # small block sizes can't produce a good match, so their score is capped by the chunks length
+    if block_size >= (99 + ROLLING_WINDOW) // ROLLING_WINDOW * MIN_BLOCKSIZE:
+        return score
+    return min(score, block_size // MIN_BLOCKSIZE * min(len(chunk1), len(chunk2)))
+
+
+def compare_ssdeep_hashes(hash1: SSDeepHash, hash2: SSDeepHash) -> int:
+    """
+    Compares two parsed ssdeep hashes, as in libfuzzy's fuzzy_compare.
+
+    Returns: the similarity score of the hashes, between 0 and 100.
+
+    """
+    if not hash1.is_valid or not hash2.is_valid:
+        return 0
+    if hash1.signature() == hash2.signature():
+        return 100
+    score = 0
+    for block_size1, chunk1, ngrams1 in hash1.chunks_by_block_size():
+        for block_size2, chunk2, ngrams2 in hash2.chunks_by_block_size():
+            if block_size1 == block_size2:
+                score = max(score, _score_chunks(chunk1, ngrams1, chunk2, ngrams2, block_size1))
+    return score
+
+
+class SSDeepIndex:
+    """
+    An index of ssdeep hashes to compare other hashes to. Two hashes are similar only if they have chunks computed with
+    the same block size which share an n-gram, so the hashes are indexed by the block size and n-grams of their chunks,
+    and only the hashes found in the index are compared.
+    """
+
+    def __init__(self, ssdeep_hashes: List[str]):
+        self.hashes: List[SSDeepHash] = []
+        self.ngrams_index: Dict[Tuple[int, str], Set[int]] = defaultdict(set)
+        self.signatures_index: Dict[tuple, Set[int]] = defaultdict(set)
+        for ssdeep_hash in ssdeep_hashes:
+            parsed_hash = parse_ssdeep_hash(ssdeep_hash)
+            if not parsed_hash:
+                continue
+            hash_index = len(self.hashes)
+            self.hashes.append(parsed_hash)
+            if not parsed_hash.is_valid:
+                continue
+            # identical hashes are similar even when their chunks are shorter than an n-gram
+            self.signatures_index[parsed_hash.signature()].add(hash_index)
+            for block_size, _, ngrams in parsed_hash.chunks_by_block_size():
+                for ngram in ngrams:
+                    self.ngrams_index[(block_size, ngram)].add(hash_index)
+
+    def find_candidates(self, anchor: SSDeepHash) -> Set[int]:
+        """
+        Returns: the indexes of the hashes that may be similar to the anchor hash.
+        """
+        if not anchor.is_valid:
+            return set()
+        candidates = set(self.signatures_index.get(anchor.signature(), set()))
+        for block_size, _, ngrams in anchor.chunks_by_block_size():
+            for ngram in ngrams:
+                candidates.update(self.ngrams_index.get((block_size, ngram), set()))
+        return candidates
+
+    def compare(self, anchor_hash: str) -> List[dict]:
+        """
+        Args:
+            anchor_hash: the ssdeep hash to compare the indexed hashes to.
+
+        Returns: a list of dictionaries containing the indexed hashes and their similarity to the anchor hash,
+        empty if the anchor hash can't be parsed.
+
+        """
+        anchor = parse_ssdeep_hash(anchor_hash)
+        if not anchor:
+            return []
+        candidates = self.find_candidates(anchor)
+        return [{
+            'hash': current_hash.hash,
+            'similarityValue': compare_ssdeep_hashes(anchor, current_hash) if hash_index in candidates else 0
+        } for hash_index, current_hash in enumerate(self.hashes)]
+
+    def compare_many(self, anchor_hashes: List[str]) -> Dict[str, List[dict]]:
+        """
+        Args:
+            anchor_hashes: the ssdeep hashes to compare the indexed hashes to.
+
+        Returns: a dictionary of each anchor hash to the indexed hashes and their similarity to it.
+
+        """
+        return {anchor_hash: self.compare(anchor_hash) for anchor_hash in anchor_hashes}
 
-HEADERS = "ssdeep,1.1--blocksize:hash:hash,filename\n"
 
 ''' COMMAND FUNCTION '''
 
@@ -42,49 +218,11 @@ def _handle_inputs(args: dict):
     return anchor_hash, hashes_to_compare, output_key
 
 
-def _format_results(results: list) -> List[dict]:
-    """
-    Args:
-        results: a list of results with the following format:
-        ['"<hash>","<anchor_hash>",<score>']
-
-    Returns: a list of dictionaries containing the hash and score
-
-    """
-    formatted_res = []
-
-    # Remove last empty value returned from the process
-    if not results[-1]:
-        results = results[:-1]
-
-    for result in results:
-        result = result.split(',')
-        formatted_res.append({
-            'hash': result[0].strip('"'),
-            'similarityValue': int(result[2])
-        })
-    return formatted_res
-
-
-def run_ssdeep_command(anchor_hash: str, hashes_to_compare: str):
-    with tempfile.NamedTemporaryFile() as anchor_hashes_file:
-        with tempfile.NamedTemporaryFile() as hashes_to_compare_file:
-            anchor_hashes_file.write(bytes(anchor_hash, encoding='utf-8'))
-            anchor_hashes_file.flush()
-            hashes_to_compare_file.write(bytes(hashes_to_compare, encoding='utf-8'))
-            hashes_to_compare_file.flush()
-            stream = os.popen(f"ssdeep -k {anchor_hashes_file.name} {hashes_to_compare_file.name} -c -a")  # nosec
-            return stream.read().split('\n')
-
-
-def compare_ssdeep(anchor_hash: str, hashes_to_compare: list, output_key: str) -> CommandResults:
-    hashes_list_to_file = HEADERS
-    anchor_hash_to_file = f'{HEADERS}{anchor_hash},"{anchor_hash}"\n'
-
-    for current_hash in hashes_to_compare:
-        hashes_list_to_file += f'{current_hash},"{current_hash}"\n'
-    res = run_ssdeep_command(anchor_hash_to_file, hashes_list_to_file)
-    hashes_outputs = _format_results(res)
+def compare_ssdeep(anchor_hash: str, hashes_to_compare: list, output_key: str,
+                   index: Optional[SSDeepIndex] = None) -> CommandResults:
+    if index is None:
+        index = SSDeepIndex(hashes_to_compare)
+    hashes_outputs = index.compare(anchor_hash)
     hashes_outputs_merged = _handle_existing_outputs(anchor_hash, output_key, hashes_outputs)
     md = tableToMarkdown(anchor_hash, hashes_outputs)
     return CommandResults(
@@ -102,8 +240,14 @@ def main():
     try:
         args = demisto.args()
         anchor_hash, hashes_to_compare, output_key = _handle_inputs(args)
-        res = compare_ssdeep(anchor_hash, hashes_to_compare, output_key)
-        return_results(res)
+        anchor_hashes = argToList(anchor_hash)
+        if len(anchor_hashes) == 1:
+            return_results(compare_ssdeep(anchor_hashes[0], hashes_to_compare, output_key))
+        else:
+            # the hashes to compare are indexed once for all of the anchor hashes
+            index = SSDeepIndex(hashes_to_compare)
+            return_results([compare_ssdeep(current_anchor, hashes_to_compare, output_key, index)
+                            for current_anchor in anchor_hashes])
 
     except Exception as ex:
         demisto.error(traceback.format_exc())  # print the traceback
@@ -67,26 +67,17 @@ HASHES_TO_COMPARE_INCLUDE_ITSELF = {'anchor_hash': '3:AXGBicFlgVNhBGcL6wCrFQEv:A
                                                           'A12#$4!2'],  # invalid hash, will be ignored.
                                     'output_key': 'test'}
 INPUT_CASES = [
-    (HASHES_TO_COMPARE_INCLUDE_ITSELF, (
-        'ssdeep,1.1--blocksize:hash:hash,filename\n'
-        '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C,"3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C"\n',
-        'ssdeep,1.1--blocksize:hash:hash,filename\n'
-        '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C,"3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C"\n'
-        '3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C,"3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C"\n'
-        '12#$4!2,"12#$4!2"\nA12#$4!2,"A12#$4!2"\n'),
+    (HASHES_TO_COMPARE_INCLUDE_ITSELF,
      {'SourceHash': '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C', 'compared_hashes': [
          {'hash': '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C', 'similarityValue': 100},
          {'hash': '3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C', 'similarityValue': 22},
          {'hash': '12#$4!2', 'similarityValue': 0}]}
      ),
 ]
-SSDEEP_RESULT_EXAMPLE = ['"3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C","3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C",100',
-                         '"3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C","3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C",22',
-                         '"12#$4!2","3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C",0']
 
 
-@pytest.mark.parametrize('case_inputs, called_with, expected_output', INPUT_CASES)
-def test_compare_ssdeep(mocker, case_inputs, called_with, expected_output):
+@pytest.mark.parametrize('case_inputs, expected_output', INPUT_CASES)
+def test_compare_ssdeep(mocker, case_inputs, expected_output):
     """
     Given:
         valid hash, hash list and output key
@@ -96,58 +87,54 @@ def test_compare_ssdeep(mocker, case_inputs, called_with, expected_output):
         validates the outputs are as expected.
     """
     import SSDeepSimilarity
-    command_mock = mocker.patch.object(SSDeepSimilarity, 'run_ssdeep_command', return_value=SSDEEP_RESULT_EXAMPLE)
+    mocker.patch.object(demisto, 'context', return_value={})
     res = SSDeepSimilarity.compare_ssdeep(**case_inputs)
-    assert command_mock.call_args[0] == called_with
     assert res.outputs == expected_output
 
 
-def test_format_results():
+ANCHOR_HASH = '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C'
+LONG_HASH = '96:ZTQCU3k1L2lKq3cKEvWOrdB7N5FpoaZbC9TmlVkzCXS7JyUjdEfO1TBdSq6RI:ZTQCUU1lqsKEvWOrdBJ5FpoaZb8oAzC'
+LONG_HASH_CHANGED = '96:ZTQCU3k1L2lKq3cKEvWOrdB7N5FpoaZbC9TmlVkzCXS7JyUjdEfAAAAAAAAAAA:ZTQCUU1lqsKEvWOrdBJ5FpoaZb8oAzD'
+LONG_HASH_DOUBLE_BLOCK_SIZE = '192:ZTQCUU1lqsKEvWOrdBJ5FpoaZb8oAzC:nothingincommon'
+
+
+def test_ssdeep_index():
     """
     Given:
-        A result list from the ssdeep command
+        hashes to compare - a valid hash, invalid hash with valid format and invalid hash with invalid format.
     When:
-        Converting results to outputs format
+        Comparing a hash to them
     Then:
-        Validating the outputs created matches expected.
+        Validating the first hash gets the relevant score and the second hash gets 0 score (ignoring the third hash).
     """
-
-    from SSDeepSimilarity import _format_results
-    res = _format_results(SSDEEP_RESULT_EXAMPLE)
-    assert res == [{'hash': '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C',
-                    'similarityValue': 100},
-                   {'hash': '3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C',
-                    'similarityValue': 22},
-                   {'hash': '12#$4!2',
-                    'similarityValue': 0}]
+    from SSDeepSimilarity import SSDeepIndex
+    index = SSDeepIndex(['3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C', '12#$4!2', 'A12#$4!2'])
+    assert index.compare(ANCHOR_HASH) == [{'hash': '3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C', 'similarityValue': 22},
+                                          {'hash': '12#$4!2', 'similarityValue': 0}]
+    assert index.compare('A12#$4!2') == []
 
 
-FILE1 = 'ssdeep,1.1--blocksize:hash:hash,filename\n' \
-        '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C,"3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C"\n'
-FILE2 = 'ssdeep,1.1--blocksize:hash:hash,filename\n' \
-        '3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C,"3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C"\n' \
-        '12#$4!2,"12#$4!2"\nA12#$4!2,"A12#$4!2"\n'
-
-
-def test_linux_command(capfd):
+def test_ssdeep_index_compare_many():
     """
-    NOTE: CANNOT RUN LOCALLY WHEN NOT LINUX!
     Given:
-        2 file's content containing ssdeep hashes, the second one have valid hash,
-        invalid hash with valid format and invalid hash with invalid format.
+        hashes with the same block size, with twice the block size and with a block size that can't be compared.
     When:
-        Running ssdeep linux's command
+        Comparing many hashes to them
     Then:
-        Validating the command returns the expected result-
-        the first hash with relevant score and the second hash with 0 score (ignoring the third hash)
+        Validating the hashes are compared by their chunks of the same block size, and only hashes sharing an n-gram
+        with the anchor are compared.
     """
-
-    from SSDeepSimilarity import run_ssdeep_command
-    with capfd.disabled():
-        res = run_ssdeep_command(FILE1, FILE2)
-        assert res == ['"3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2C","3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C",22',
-                       '"12#$4!2","3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C",0',
-                       '']
+    from SSDeepSimilarity import SSDeepIndex, parse_ssdeep_hash
+    index = SSDeepIndex([LONG_HASH, LONG_HASH_CHANGED, LONG_HASH_DOUBLE_BLOCK_SIZE, ANCHOR_HASH])
+    assert index.find_candidates(parse_ssdeep_hash(LONG_HASH)) == {0, 1, 2}
+
+    res = index.compare_many([LONG_HASH, ANCHOR_HASH])
+    long_hash_scores = [output['similarityValue'] for output in res[LONG_HASH]]
+    assert long_hash_scores[0] == 100
+    assert 0 < long_hash_scores[1] < 100
+    assert long_hash_scores[2] == 100  # same chunk, with the same block size
+    assert long_hash_scores[3] == 0
+    assert [output['similarityValue'] for output in res[ANCHOR_HASH]] == [0, 0, 0, 100]
 
 
 CASE_FIRST_RUN = ('1test',
@@ -6,12 +6,13 @@ import re
 
 from base64 import b64decode
 from flask import Flask, Response, request
-from netaddr import IPSet
-from typing import Any, Dict, cast, Iterable
+from typing import Any, Dict, cast, Iterable, Iterator, Tuple
 from math import ceil
 import urllib3
 import dateparser
 import hashlib
+import socket
+import tempfile
 
 # Disable insecure warnings
 urllib3.disable_warnings()
@@ -27,16 +28,27 @@ EDL_COLLAPSE_ERR_MSG: str = 'The Collapse parameter can only get the following:
                             '1 - Collapse to Ranges, 2 - Collapse to CIDRS'
 EDL_MISSING_REFRESH_ERR_MSG: str = 'Refresh Rate must be "number date_range_unit", examples: (2 hours, 4 minutes, ' \
                                    '6 months, 1 day, etc.)'
+EDL_MISSING_FULL_REBUILD_ERR_MSG: str = 'Incremental Full Rebuild Rate must be "number date_range_unit", examples: ' \
+                                        '(2 hours, 4 minutes, 6 months, 1 day, etc.)'
 # based on func ToIoC https://github.com/demisto/server/blob/master/domain/insight.go
 EDL_FILTER_FIELDS: Optional[str] = "name,type"
 EDL_ON_DEMAND_KEY: str = 'UpdateEDL'
 EDL_ON_DEMAND_CACHE_PATH: str = ''
+EDL_INCREMENTAL_CACHE_PATH: str = ''
+EDL_INCREMENTAL_TIME_FORMAT: str = '%Y-%m-%dT%H:%M:%SZ'
+EDL_INCREMENTAL_DEFAULT_FULL_REBUILD_RATE: str = '1 day'
+EDL_EXPIRED_INDICATORS_QUERY: str = 'expirationStatus:expired'
 
 ''' REFORMATTING REGEXES '''
 _PROTOCOL_REMOVAL = re.compile('^(?:[a-z]+:)*//')
 _PORT_REMOVAL = re.compile(r'^((?:[a-z]+:)*//([a-z0-9\-\.]+)|([a-z0-9\-\.]+))(?:\:[0-9]+)*')
 _URL_WITHOUT_PORT = r'\g<1>'
 _INVALID_TOKEN_REMOVAL = re.compile(r'(?:[^\./+=\?&]+\*[^\./+=\?&]*)|(?:[^\./+=\?&]*\*[^\./+=\?&]+)')
+# _PROTOCOL_REMOVAL followed by _PORT_REMOVAL in a single pass, the port is captured to detect if it was stripped
+_URL_TOKENIZER = re.compile(r'^(?:(?:[a-z]+:)*//)?(?:(?P<host>(?:[a-z]+:)*//[a-z0-9\-\.]+|[a-z0-9\-\.]+)'
+                            r'(?P<port>(?:\:[0-9]+)*))?')
+_IP_INDICATOR_TYPES = frozenset([FeedIndicatorType.IP, FeedIndicatorType.IPv6,
+                                 FeedIndicatorType.CIDR, FeedIndicatorType.IPv6CIDR])
 
 DONT_COLLAPSE = "Don't Collapse"
 COLLAPSE_TO_CIDR = "To CIDRS"
@@ -124,6 +136,33 @@ def create_new_edl(request_args: RequestArguments) -> str:
 
     Returns: Formatted indicators to display in EDL
     """
+    return iterable_to_str(create_new_edl_entries(request_args))
+
+
+def create_new_edl_entries(request_args: RequestArguments) -> list:
+    """
+    Gets indicators from XSOAR server using IndicatorsSearcher and formats them to a list of EDL entries
+
+    Parameters:
+        request_args: Request arguments
+
+    Returns: List of the formatted indicators to display in EDL
+    """
+    _, formatted_iocs = find_indicators_to_edl_limit(request_args)
+    return list(formatted_iocs)[request_args.offset:request_args.offset + request_args.limit]
+
+
+def find_indicators_to_edl_limit(request_args: RequestArguments) -> Tuple[List[dict], set]:
+    """
+    Finds the indicators matching the query, searching again while formatting the indicators drops or merges
+    entries, until there are enough formatted entries to fill the requested offset and limit.
+
+    Parameters:
+        request_args: Request arguments
+
+    Returns:
+        (tuple): The found indicators and the set of their formatted EDL entries
+    """
     limit = request_args.offset + request_args.limit
     indicator_searcher = IndicatorsSearcher(
         filter_fields=EDL_FILTER_FIELDS,
@@ -131,7 +170,7 @@ def create_new_edl(request_args: RequestArguments) -> str:
         size=PAGE_SIZE,
         limit=limit
     )
-    iocs = []
+    iocs: List[dict] = []
     formatted_iocs: set = set()
     while True:
         current_limit = limit + (limit - len(formatted_iocs))
@@ -142,7 +181,65 @@ def create_new_edl(request_args: RequestArguments) -> str:
         # continue searching iocs if 1) iocs was truncated or 2) got all available iocs
         if len(formatted_iocs) >= len(iocs) or indicator_searcher.total <= current_limit:
             break
-    return iterable_to_str(list(formatted_iocs)[request_args.offset:limit])
+    return iocs, formatted_iocs
+
+
+def iter_new_edl_entries(request_args: RequestArguments) -> Iterator[str]:
+    """
+    Lazily gets indicators from XSOAR server page by page and yields their formatted EDL entries,
+    so the EDL can be streamed while it is being searched rather than built in memory first.
+    Entries are yielded in search order, and collapsed IPs are yielded last as they depend on all the IPs.
+
+    Parameters:
+        request_args: Request arguments
+
+    Returns: Iterator of the formatted indicators to display in EDL
+    """
+    start, end = request_args.offset, request_args.offset + request_args.limit
+    should_collapse = request_args.collapse_ips != DONT_COLLAPSE
+    seen_entries: set = set()
+    ipv4_entries: set = set()
+    ipv6_entries: set = set()
+    # the number of collapsed IP entries is only known once they are collapsed, so it is checked again
+    # whenever the uncollapsed IPs could fill the EDL
+    next_collapse_check = end
+    for ioc_res in IndicatorsSearcher(filter_fields=EDL_FILTER_FIELDS, query=request_args.query, size=PAGE_SIZE):
+        for ioc in ioc_res.get('iocs') or []:
+            value, ioc_type = ioc.get('value'), ioc.get('indicator_type')
+            if not value:
+                continue
+            entries = format_indicator(value, ioc_type, request_args)
+            if should_collapse and ioc_type in (FeedIndicatorType.IP, FeedIndicatorType.CIDR):
+                ipv4_entries.update(entries)
+                continue
+            if should_collapse and ioc_type == FeedIndicatorType.IPv6:
+                ipv6_entries.update(entries)
+                continue
+            for entry in entries:
+                if entry not in seen_entries and len(seen_entries) < end:
+                    if len(seen_entries) >= start:
+                        yield entry
+                    seen_entries.add(entry)
+        if len(seen_entries) >= end:
+            break
+        if len(seen_entries) + len(ipv4_entries) + len(ipv6_entries) >= next_collapse_check:
+            collapsed_count = len(ips_to_ranges(ipv4_entries, request_args.collapse_ips)) + \
+                len(ips_to_ranges(ipv6_entries, request_args.collapse_ips))
+            if len(seen_entries) + collapsed_count >= end:
+                break
+            next_collapse_check = len(seen_entries) + len(ipv4_entries) + len(ipv6_entries) + \
+                end - len(seen_entries) - collapsed_count
+
+    position = len(seen_entries)
+    for ip_entries in (ipv4_entries, ipv6_entries):
+        if not ip_entries:
+            continue
+        for entry in ips_to_ranges(ip_entries, request_args.collapse_ips):
+            if position >= end:
+                return
+            if position >= start:
+                yield entry
+            position += 1
 
 
 def find_indicators_to_limit(indicator_searcher: IndicatorsSearcher) -> List[dict]:
@@ -164,51 +261,86 @@ def find_indicators_to_limit(indicator_searcher: IndicatorsSearcher) -> List[dic
     return iocs
 
 
-def ip_groups_to_cidrs(ip_range_groups: Iterable):
-    """Collapse ip groups list to CIDRs
+def ip_to_interval(ip: str) -> Optional[Tuple[int, int, int]]:
+    """Converts an IP or CIDR string to an integer interval.
 
     Args:
-        ip_range_groups (Iterable): an Iterable of lists containing connected IPs
+        ip (str): an IPv4/IPv6 address or CIDR.
 
     Returns:
-        Set. a set of CIDRs.
+        Tuple. the address size in bits, the first and the last addresses of the interval as integers.
+        None if the string is not a valid IP or CIDR.
     """
-    ip_ranges = set()
-    for cidr in ip_range_groups:
-        # handle single ips
-        if len(cidr) == 1:
-            # CIDR with a single IP appears with "/32" suffix so handle them differently
-            ip_ranges.add(str(cidr[0]))
-            continue
+    address, _, prefix = ip.partition('/')
+    family, bits = (socket.AF_INET6, 128) if ':' in address else (socket.AF_INET, 32)
+    try:
+        start = int.from_bytes(socket.inet_pton(family, address), 'big')
+        prefix_len = int(prefix) if prefix else bits
+    except (OSError, ValueError):
+        return None
+    if not 0 <= prefix_len <= bits:
+        return None
+    host_bits = bits - prefix_len
+    start = start >> host_bits << host_bits
+    return bits, start, start + (1 << host_bits) - 1
 
-        ip_ranges.add(str(cidr))
 
-    return ip_ranges
+def int_to_ip(value: int, bits: int) -> str:
+    """Converts an integer to an IPv4 (32 bits) or IPv6 (128 bits) address string."""
+    family = socket.AF_INET6 if bits == 128 else socket.AF_INET
+    return socket.inet_ntop(family, value.to_bytes(bits // 8, 'big'))
 
 
-def ip_groups_to_ranges(ip_range_groups: Iterable):
-    """Collapse ip groups to ranges.
+def merge_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merges overlapping and adjacent integer intervals.
 
     Args:
-        ip_range_groups (Iterable): a list of lists containing connected IPs
+        intervals (List[Tuple[int, int]]): a list of (first, last) intervals.
 
     Returns:
-        Set. a set of Ranges.
+        List[Tuple[int, int]]. the sorted merged intervals.
     """
-    ip_ranges = set()
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.add(str(group[0]))
-            continue
+    merged: List[Tuple[int, int]] = []
+    if not intervals:
+        return merged
+    intervals = sorted(intervals)
+    current_first, current_last = intervals[0]
+    for first, last in intervals:
+        if first <= current_last + 1:
+            if last > current_last:
+                current_last = last
+        else:
+            merged.append((current_first, current_last))
+            current_first, current_last = first, last
+    merged.append((current_first, current_last))
+    return merged
 
-        ip_ranges.add(str(group))
 
-    return ip_ranges
+def interval_to_cidrs(first: int, last: int, bits: int) -> List[str]:
+    """Splits an integer interval to the minimal list of CIDRs covering it.
+
+    Args:
+        first (int): the first address of the interval.
+        last (int): the last address of the interval.
+        bits (int): the address size in bits.
+
+    Returns:
+        List[str]. the CIDRs, a CIDR with a single IP appears without the prefix length.
+    """
+    cidrs = []
+    while first <= last:
+        # the largest block aligned on first which does not exceed last
+        block_bits = (first & -first).bit_length() - 1 if first else bits
+        block_bits = min(block_bits, (last - first + 1).bit_length() - 1)
+        address = int_to_ip(first, bits)
+        cidrs.append(address if block_bits == 0 else f'{address}/{bits - block_bits}')
+        first += 1 << block_bits
+    return cidrs
 
 
 def ips_to_ranges(ips: Iterable, collapse_ips: str):
     """Collapse IPs to Ranges or CIDRs.
+    The IPs are collapsed as sorted integer intervals, invalid IPs are kept as is.
 
     Args:
         ips (Iterable): a group of IP strings.
@@ -217,14 +349,108 @@ def ips_to_ranges(ips: Iterable, collapse_ips: str):
     Returns:
         Set. a list to Ranges or CIDRs.
     """
+    intervals_by_bits: Dict[int, List[Tuple[int, int]]] = {32: [], 128: []}
+    ip_ranges = set()
+    for ip in ips:
+        interval = ip_to_interval(ip)
+        if not interval:
+            ip_ranges.add(ip)
+            continue
+        bits, first, last = interval
+        intervals_by_bits[bits].append((first, last))
+
+    for bits, intervals in intervals_by_bits.items():
+        for first, last in merge_intervals(intervals):
+            # handle single ips
+            if first == last:
+                ip_ranges.add(int_to_ip(first, bits))
+            elif collapse_ips == COLLAPSE_TO_RANGES:
+                ip_ranges.add(f'{int_to_ip(first, bits)}-{int_to_ip(last, bits)}')
+            else:
+                ip_ranges.update(interval_to_cidrs(first, last, bits))
 
-    if collapse_ips == COLLAPSE_TO_RANGES:
-        ips_range_groups = IPSet(ips).iter_ipranges()
-        return ip_groups_to_ranges(ips_range_groups)
+    return ip_ranges
 
-    else:
-        cidrs = IPSet(ips).iter_cidrs()
-        return ip_groups_to_cidrs(cidrs)
+
+def format_indicator(indicator: str, ioc_type: str, request_args: RequestArguments) -> List[str]:
+    """
+    Formats a single indicator value according to the request arguments
+     * IP / CIDR:
+         1) protocol stripping only
+     * URL:
+         1) if drop_invalids, drop invalids (length > 254 or has invalid chars)
+    * Other indicator types:
+        1) if drop_invalids, drop invalids (has invalid chars)
+        2) if port_stripping, strip ports
+
+    Returns:
+        List of formatted values for the indicator, empty if the indicator should be dropped.
+    """
+    if ioc_type in _IP_INDICATOR_TYPES:
+        # protocol stripping
+        return [_PROTOCOL_REMOVAL.sub('', indicator) if '//' in indicator else indicator]
+
+    # protocol and port stripping in a single pass
+    # from http://demisto.com:369/rest/of/path -> demisto.com/rest/of/path
+    tokens = _URL_TOKENIZER.match(indicator)
+    if tokens.group('port'):  # type: ignore[union-attr]
+        if not request_args.url_port_stripping:
+            # if port was in the indicator and url_port_stripping param not set - ignore the indicator
+            return []
+    indicator = (tokens.group('host') or '') + indicator[tokens.end():]  # type: ignore[union-attr]
+
+    # Reformatting to PAN-OS URL format
+    # mix of text and wildcard in domain field handling, only relevant if the indicator holds a wildcard
+    if '*' in indicator:
+        with_invalid_tokens_indicator = indicator
+        indicator = _INVALID_TOKEN_REMOVAL.sub('*', indicator)
+        # check if the indicator held invalid tokens
+        if request_args.drop_invalids and with_invalid_tokens_indicator != indicator:
+            # invalid tokens in indicator - ignore the indicator
+            return []
+
+    if request_args.drop_invalids and ioc_type == FeedIndicatorType.URL and len(indicator) >= PAN_OS_MAX_URL_LEN:
+        # URL indicator exceeds allowed length - ignore the indicator
+        return []
+
+    # for PAN-OS *.domain.com does not match domain.com
+    # we should provide both
+    # this could generate more than num entries according to PAGE_SIZE
+    if indicator.startswith('*.'):
+        return [indicator.lstrip('*.'), indicator]
+    return [indicator]
+
+
+def merge_formatted_indicators(formatted_iocs: Iterable[Tuple[str, List[str]]], request_args: RequestArguments) -> list:
+    """
+    Merges formatted indicator values into the EDL entries, collapsing IPs if requested
+
+    Parameters:
+        formatted_iocs: Iterable of (indicator_type, formatted values) tuples
+        request_args: Request arguments
+
+    Returns: List of the unique EDL entries, in the order of the given indicators. Collapsed IPs are listed last.
+    """
+    formatted_indicators: dict = {}
+    ipv4_formatted_indicators: set = set()
+    ipv6_formatted_indicators: set = set()
+    should_collapse = request_args.collapse_ips != DONT_COLLAPSE
+    for ioc_type, values in formatted_iocs:
+        if should_collapse and ioc_type in (FeedIndicatorType.IP, FeedIndicatorType.CIDR):
+            ipv4_formatted_indicators.update(values)
+
+        elif should_collapse and ioc_type == FeedIndicatorType.IPv6:
+            ipv6_formatted_indicators.update(values)
+
+        else:
+            formatted_indicators.update(dict.fromkeys(values))
+
+    if len(ipv4_formatted_indicators) > 0:
+        formatted_indicators.update(dict.fromkeys(ips_to_ranges(ipv4_formatted_indicators, request_args.collapse_ips)))
+
+    if len(ipv6_formatted_indicators) > 0:
+        formatted_indicators.update(dict.fromkeys(ips_to_ranges(ipv6_formatted_indicators, request_args.collapse_ips)))
+    return list(formatted_indicators)
 
 
 def format_indicators(iocs: list, request_args: RequestArguments) -> set:
@@ -240,81 +466,172 @@ def format_indicators(iocs: list, request_args: RequestArguments) -> set:
         1) if drop_invalids, drop invalids (has invalid chars)
         2) if port_stripping, strip ports
     """
-    formatted_indicators = set()
-    ipv4_formatted_indicators = set()
-    ipv6_formatted_indicators = set()
-    for ioc in iocs:
-        indicator = ioc.get('value')
-        if not indicator:
-            continue
-        ioc_type = ioc.get('indicator_type')
-        # protocol stripping
-        indicator = _PROTOCOL_REMOVAL.sub('', indicator)
-
-        if ioc_type not in [FeedIndicatorType.IP, FeedIndicatorType.IPv6,
-                            FeedIndicatorType.CIDR, FeedIndicatorType.IPv6CIDR]:
-            # Port stripping
-            indicator_with_port = indicator
-            # remove port from indicator - from demisto.com:369/rest/of/path -> demisto.com/rest/of/path
-            indicator = _PORT_REMOVAL.sub(_URL_WITHOUT_PORT, indicator)
-            # check if removing the port changed something about the indicator
-            if indicator != indicator_with_port and not request_args.url_port_stripping:
-                # if port was in the indicator and url_port_stripping param not set - ignore the indicator
-                continue
-            # Reformatting to PAN-OS URL format
-            with_invalid_tokens_indicator = indicator
-            # mix of text and wildcard in domain field handling
-            indicator = _INVALID_TOKEN_REMOVAL.sub('*', indicator)
-            # check if the indicator held invalid tokens
-            if request_args.drop_invalids:
-                if with_invalid_tokens_indicator != indicator:
-                    # invalid tokens in indicator - ignore the indicator
-                    continue
-                if ioc_type == FeedIndicatorType.URL and len(indicator) >= PAN_OS_MAX_URL_LEN:
-                    # URL indicator exceeds allowed length - ignore the indicator
-                    continue
-
-            # for PAN-OS *.domain.com does not match domain.com
-            # we should provide both
-            # this could generate more than num entries according to PAGE_SIZE
-            if indicator.startswith('*.'):
-                formatted_indicators.add(indicator.lstrip('*.'))
-
-        if request_args.collapse_ips != DONT_COLLAPSE and ioc_type in (FeedIndicatorType.IP, FeedIndicatorType.CIDR):
-            ipv4_formatted_indicators.add(indicator)
-
-        elif request_args.collapse_ips != DONT_COLLAPSE and ioc_type == FeedIndicatorType.IPv6:
-            ipv6_formatted_indicators.add(indicator)
+    formatted_iocs = (
+        (ioc.get('indicator_type'), format_indicator(ioc['value'], ioc.get('indicator_type'), request_args))
+        for ioc in iocs if ioc.get('value')
+    )
+    return set(merge_formatted_indicators(formatted_iocs, request_args))
 
-        else:
-            formatted_indicators.add(indicator)
 
-    if len(ipv4_formatted_indicators) > 0:
-        ipv4_formatted_indicators = ips_to_ranges(ipv4_formatted_indicators, request_args.collapse_ips)
-        formatted_indicators.update(ipv4_formatted_indicators)
+def get_incremental_edl_cache_path(request_args: RequestArguments) -> str:
+    """
+    Returns the path of the incremental EDL store for the given request arguments.
+    Each distinct set of request arguments keeps its own store, as the formatting depends on them.
+    """
+    args_signature = json.dumps(request_args.to_context_json(), sort_keys=True)
+    return f'{EDL_INCREMENTAL_CACHE_PATH}_{hashlib.sha1(args_signature.encode()).hexdigest()}'  # guardrails-disable-line
 
-    if len(ipv6_formatted_indicators) > 0:
-        ipv6_formatted_indicators = ips_to_ranges(ipv6_formatted_indicators, request_args.collapse_ips)
-        formatted_indicators.update(ipv6_formatted_indicators)
-    return formatted_indicators
 
+def load_incremental_edl_store(path: str) -> dict:
+    """
+    Loads the incremental EDL store from the local file system, returns an empty dict if it is missing or corrupted.
+    """
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        demisto.debug(f'Could not load the incremental EDL store from {path}: {e}')
+        return {}
 
-def get_edl_on_demand():
+
+def save_incremental_edl_store(path: str, store: dict):
     """
-    Use the local file system to store the on-demand result, using a lock to
-    limit access to the file from multiple threads.
+    Saves the incremental EDL store to the local file system.
+    """
+    write_file_atomically(path, json.dumps(store))
+
+
+def write_file_atomically(path: str, data: str):
+    """
+    Writes the data to a uniquely named temporary file in the same directory and then replaces the given path with it,
+    so a concurrent reader never sees a partially written file and concurrent writers never share a temporary file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or None, prefix=f'{os.path.basename(path)}.')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def is_incremental_edl_store_expired(store: dict, full_rebuild_rate: str) -> bool:
+    """
+    Checks whether the incremental EDL store should be rebuilt from scratch.
+    A periodic full rebuild reconciles changes that can not be tracked as deltas (e.g. deleted indicators).
+    """
+    last_full_build = store.get('last_full_build')
+    if not last_full_build or 'iocs' not in store:
+        return True
+    rebuild_threshold = dateparser.parse(full_rebuild_rate, settings={'TIMEZONE': 'UTC', 'RETURN_AS_TIMEZONE_AWARE': True})
+    if not rebuild_threshold:
+        raise DemistoException(EDL_MISSING_FULL_REBUILD_ERR_MSG)
+    last_full_build_date = dateparser.parse(last_full_build, settings={'TIMEZONE': 'UTC',
+                                                                       'RETURN_AS_TIMEZONE_AWARE': True})
+    return not last_full_build_date or last_full_build_date <= rebuild_threshold
+
+
+def render_incremental_edl(store: dict, request_args: RequestArguments) -> str:
+    """
+    Renders the EDL from the pre-formatted indicators kept in the incremental store.
+    The store keeps the indicators in insertion order, so the output (and its ETag) is stable between builds.
+    """
+    formatted_iocs = store['iocs'].values()
+    formatted_indicators = merge_formatted_indicators(formatted_iocs, request_args)
+    return iterable_to_str(formatted_indicators[request_args.offset:request_args.offset + request_args.limit])
+
+
+def create_incremental_edl(request_args: RequestArguments, full_rebuild_rate: str) -> str:
+    """
+    Maintains a persisted, formatted indicators store and only applies the indicators modified since the last build.
+    Modified indicators which no longer match the query, and indicators which expired since the last build,
+    are removed from the store.
+    The store is rebuilt from scratch every full_rebuild_rate.
+
+    Parameters:
+        request_args: Request arguments
+        full_rebuild_rate: How often to rebuild the store from scratch (e.g., 1 day)
+
+    Returns: Formatted indicators to display in EDL
+    """
+    path = get_incremental_edl_cache_path(request_args)
+    store = load_incremental_edl_store(path)
+    # the next delta is searched from the time this build started, so indicators modified during the build are kept
+    build_time = datetime.now(timezone.utc).strftime(EDL_INCREMENTAL_TIME_FORMAT)
+
+    removed_values: set = set()
+    if is_incremental_edl_store_expired(store, full_rebuild_rate):
+        demisto.debug('Rebuilding the incremental EDL store from scratch')
+        store = {'last_full_build': build_time, 'iocs': {}}
+        new_iocs, _ = find_indicators_to_edl_limit(request_args)
+    else:
+        new_iocs = find_indicators_to_limit(IndicatorsSearcher(
+            filter_fields=EDL_FILTER_FIELDS,
+            from_date=store['last_build'],
+            query=request_args.query,
+            size=PAGE_SIZE
+        ))
+        # indicators modified since the last build which are not returned by the query anymore
+        modified_iocs = find_indicators_to_limit(IndicatorsSearcher(
+            filter_fields=EDL_FILTER_FIELDS,
+            from_date=store['last_build'],
+            size=PAGE_SIZE
+        ))
+        expired_iocs = find_indicators_to_limit(IndicatorsSearcher(
+            filter_fields=EDL_FILTER_FIELDS,
+            from_date=store['last_build'],
+            query=EDL_EXPIRED_INDICATORS_QUERY,
+            size=PAGE_SIZE
+        ))
+        removed_values = {ioc.get('value') for ioc in modified_iocs}.difference(ioc.get('value') for ioc in new_iocs)
+        removed_values.update(ioc.get('value') for ioc in expired_iocs)
+
+    iocs_store: dict = store['iocs']
+    changed = False
+    for value in removed_values:
+        if iocs_store.pop(value, None) is not None:
+            changed = True
+    for ioc in new_iocs:
+        value, ioc_type = ioc.get('value'), ioc.get('indicator_type')
+        if not value or value in removed_values:
+            continue
+        formatted_ioc = [ioc_type, format_indicator(value, ioc_type, request_args)]
+        if iocs_store.get(value) != formatted_ioc:
+            iocs_store[value] = formatted_ioc
+            changed = True
+
+    demisto.debug(f'Incremental EDL build: {len(new_iocs)} new or modified indicators, '
+                  f'{len(removed_values)} removed indicators, store size: {len(iocs_store)}')
+    if changed or 'edl' not in store:
+        store['edl'] = render_incremental_edl(store, request_args)
+    store['last_build'] = build_time
+    save_incremental_edl_store(path, store)
+    return store['edl']
+
+
+def update_edl_on_demand_cache():
+    """
+    Refreshes the on-demand result stored in the local file system, if an update was requested.
+    The file is replaced atomically, so readers which already opened it keep reading the previous result.
     """
     ctx = get_integration_context()
     if EDL_ON_DEMAND_KEY in ctx:
         ctx.pop(EDL_ON_DEMAND_KEY, None)
         request_args = RequestArguments.from_context_json(ctx)
         edl = create_new_edl(request_args)
-        with open(EDL_ON_DEMAND_CACHE_PATH, 'w') as file:
-            file.write(edl)
+        write_file_atomically(EDL_ON_DEMAND_CACHE_PATH, edl)
         set_integration_context(ctx)
-    else:
-        with open(EDL_ON_DEMAND_CACHE_PATH, 'r') as file:
-            edl = file.read()
+
+
+def get_edl_on_demand():
+    """
+    Use the local file system to store the on-demand result, using a lock to
+    limit access to the file from multiple threads.
+    """
+    update_edl_on_demand_cache()
+    with open(EDL_ON_DEMAND_CACHE_PATH, 'r') as file:
+        edl = file.read()
     return edl
 
 
@@ -369,9 +686,19 @@ def route_edl() -> Response:
             ])
 
     request_args = get_request_args(request.args, params)
+    max_age = ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore[operator]
+    if params.get('streaming_response'):
+        return create_streaming_edl_response(request_args, params, request.headers.get('Accept-Encoding', ''),
+                                             max_age)
     on_demand = params.get('on_demand')
     created = datetime.now(timezone.utc)
-    edl = get_edl_on_demand() if on_demand else create_new_edl(request_args)
+    if on_demand:
+        edl = get_edl_on_demand()
+    elif params.get('incremental_edl'):
+        full_rebuild_rate = params.get('incremental_full_rebuild_rate') or EDL_INCREMENTAL_DEFAULT_FULL_REBUILD_RATE
+        edl = create_incremental_edl(request_args, full_rebuild_rate)
+    else:
+        edl = create_new_edl(request_args)
     etag = f'"{hashlib.sha1(edl.encode()).hexdigest()}"'  # guardrails-disable-line
     query_time = (datetime.now(timezone.utc) - created).total_seconds()
     edl_size = 0
@@ -379,7 +706,6 @@ def route_edl() -> Response:
         edl_size = edl.count('\n') + 1  # add 1 as last line doesn't have a \n
     if len(edl) == 0 and request_args.add_comment_if_empty:
         edl = '# Empty EDL'
-    max_age = ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore[operator]
     demisto.debug(f'Returning edl of size: [{edl_size}], created: [{created}], query time seconds: [{query_time}],'
                   f' max age: [{max_age}], etag: [{etag}]')
     resp = Response(edl, status=200, mimetype='text/plain', headers=[
@@ -394,6 +720,79 @@ def route_edl() -> Response:
     return resp
 
 
+def get_query_time(created: datetime) -> str:
+    """
+    Returns the seconds passed since the EDL creation started, formatted for the X-EDL-Query-Time-Secs header.
+    """
+    return "{:.3f}".format((datetime.now(timezone.utc) - created).total_seconds())
+
+
+def create_streaming_edl_response(request_args: RequestArguments, params: dict, accept_encoding: str,
+                                  max_age: int) -> Response:
+    """
+    Creates a response which streams the EDL in chunks, instead of holding it in memory as a single string.
+    A new EDL is searched and formatted page by page while it is streamed, so its ETag and size are not known
+    when the headers are sent and are omitted. The on-demand EDL is streamed from its cache file, and the
+    incremental EDL, which is kept in memory anyway, is sent with its ETag and size.
+    The body is gzipped if the client accepts it.
+
+    Args:
+        request_args: Request arguments
+        params: Integration configuration parameters
+        accept_encoding: The Accept-Encoding header of the request
+        max_age: The max age of the response in seconds
+
+    Returns:
+        The streaming response
+    """
+    created = datetime.now(timezone.utc)
+    headers = [('X-EDL-Created', created.isoformat())]
+    etag = ''
+    on_demand_file = None
+    chunks: Iterable[str]
+    if params.get('on_demand'):
+        update_edl_on_demand_cache()
+        on_demand_file = open(EDL_ON_DEMAND_CACHE_PATH, 'r')
+        chunks = file_to_chunks(on_demand_file)
+        headers.append(('X-EDL-Query-Time-Secs', get_query_time(created)))
+    elif params.get('incremental_edl'):
+        full_rebuild_rate = params.get('incremental_full_rebuild_rate') or EDL_INCREMENTAL_DEFAULT_FULL_REBUILD_RATE
+        edl = create_incremental_edl(request_args, full_rebuild_rate)
+        etag = get_text_etag(edl)
+        headers.append(('X-EDL-Size', str(edl.count('\n') + 1 if edl.strip() else 0)))
+        chunks = text_to_chunks(edl)
+        headers.append(('X-EDL-Query-Time-Secs', get_query_time(created)))
+    else:
+        # the query runs while the EDL is streamed, so there is no query time to report ahead
+        chunks = lines_to_chunks(iter_new_edl_entries(request_args))
+
+    def log_streamed_edl(edl_size: int):
+        stream_time = (datetime.now(timezone.utc) - created).total_seconds()
+        demisto.debug(f'Streamed edl of size: [{edl_size}], created: [{created}], stream time seconds: '
+                      f'[{stream_time}], max age: [{max_age}], etag: [{etag}]')
+
+    try:
+        resp = create_streaming_response(
+            chunks,
+            accept_encoding=accept_encoding,
+            mimetype='text/plain',
+            headers=headers,
+            empty_text='# Empty EDL' if request_args.add_comment_if_empty else '',
+            etag=etag,
+            on_complete=log_streamed_edl,
+        )
+    except Exception:
+        if on_demand_file:
+            on_demand_file.close()
+        raise
+    if on_demand_file:
+        resp.call_on_close(on_demand_file.close)
+    resp.cache_control.max_age = max_age
+    resp.cache_control[
+        'stale-if-error'] = '600'  # number of seconds we are willing to serve stale content when there is an error
+    return resp
+
+
 def get_request_args(request_args: dict, params: dict) -> RequestArguments:
     """
     Processing a flask request arguments and generates a RequestArguments instance from it.
@@ -469,6 +868,10 @@ def test_module(_: Dict, params: Dict):
             raise ValueError(
                 'Invalid time unit for the Refresh Rate. Must be minutes, hours, days, months, or years.')
         parse_date_range(cache_refresh_rate, to_timestamp=True)
+        if params.get('incremental_edl'):
+            full_rebuild_rate = params.get('incremental_full_rebuild_rate') or EDL_INCREMENTAL_DEFAULT_FULL_REBUILD_RATE
+            if not dateparser.parse(full_rebuild_rate):
+                raise ValueError(EDL_MISSING_FULL_REBUILD_ERR_MSG)
     run_long_running(params, is_test=True)
     return 'ok', {}, {}
 
@@ -503,7 +906,7 @@ def update_edl_command(args: Dict, params: Dict):
 
 
 def initialize_edl_context(params: dict):
-    global EDL_ON_DEMAND_CACHE_PATH
+    global EDL_ON_DEMAND_CACHE_PATH, EDL_INCREMENTAL_CACHE_PATH
     limit = try_parse_integer(params.get('edl_size'), EDL_LIMIT_ERR_MSG)
     query = params.get('indicators_query', '')
     collapse_ips = params.get('collapse_ips', DONT_COLLAPSE)
@@ -519,6 +922,7 @@ def initialize_edl_context(params: dict):
                                     collapse_ips,
                                     add_comment_if_empty)
     EDL_ON_DEMAND_CACHE_PATH = demisto.uniqueFile()
+    EDL_INCREMENTAL_CACHE_PATH = demisto.uniqueFile()
     ctx = request_args.to_context_json()
     ctx[EDL_ON_DEMAND_KEY] = True
     set_integration_context(ctx)
@@ -3,6 +3,7 @@ import json
 import pytest
 import os
 from tempfile import mkdtemp
+from datetime import datetime, timezone
 
 IOC_RES_LEN = 38
 
@@ -224,6 +225,110 @@ class TestHelperFunctions:
         assert 'domain.com' in returned_output  # PAN-OS URLs
         assert len(returned_output) == 6
 
+    def test_create_incremental_edl(self, mocker):
+        """
+        Test create_incremental_edl applies only the delta on top of the persisted store
+        Given:
+            - an empty store, then a store with a previous build
+        When:
+            - calling create_incremental_edl twice
+        Then:
+            - the first call builds the full store
+            - the second call adds the modified indicators and removes the expired ones
+        """
+        import EDL as edl
+        edl.EDL_INCREMENTAL_CACHE_PATH = os.path.join(mkdtemp(), 'incremental')
+        request_args = edl.RequestArguments(query='type:Domain', limit=10)
+        full_build = [{'value': 'b.com', 'indicator_type': 'Domain'}, {'value': 'a.com', 'indicator_type': 'Domain'}]
+        new_iocs = [{'value': 'c.com', 'indicator_type': 'Domain'}]
+        expired_iocs = [{'value': 'a.com', 'indicator_type': 'Domain'}]
+        find_mock = mocker.patch.object(edl, 'find_indicators_to_limit',
+                                        side_effect=[full_build, new_iocs, new_iocs + expired_iocs, expired_iocs])
+
+        assert edl.create_incremental_edl(request_args, '1 day') == 'b.com\na.com'
+        assert edl.create_incremental_edl(request_args, '1 day') == 'b.com\nc.com'
+        assert find_mock.call_count == 4
+        store = edl.load_incremental_edl_store(edl.get_incremental_edl_cache_path(request_args))
+        assert set(store['iocs']) == {'b.com', 'c.com'}
+
+    def test_create_incremental_edl__modified_out_of_query(self, mocker):
+        """
+        Test create_incremental_edl re-checks the modified indicators against the query
+        Given:
+            - a store with a previous build
+        When:
+            - an indicator in the store was modified and is no longer returned by the query
+        Then:
+            - the indicator is removed from the store and the EDL
+        """
+        import EDL as edl
+        edl.EDL_INCREMENTAL_CACHE_PATH = os.path.join(mkdtemp(), 'incremental')
+        request_args = edl.RequestArguments(query='type:Domain and tags:edl', limit=10)
+        full_build = [{'value': 'a.com', 'indicator_type': 'Domain'}, {'value': 'b.com', 'indicator_type': 'Domain'}]
+        modified_iocs = [{'value': 'a.com', 'indicator_type': 'Domain'}, {'value': 'd.com', 'indicator_type': 'Domain'}]
+        mocker.patch.object(edl, 'find_indicators_to_limit', side_effect=[full_build, [], modified_iocs, []])
+
+        assert edl.create_incremental_edl(request_args, '1 day') == 'a.com\nb.com'
+        assert edl.create_incremental_edl(request_args, '1 day') == 'b.com'
+
+    def test_create_incremental_edl__limit(self, mocker):
+        """
+        Test create_incremental_edl applies the offset and limit to the formatted entries
+        Given:
+            - a query returning indicators which are merged when formatted
+        When:
+            - building the incremental EDL with an offset and a limit
+        Then:
+            - the store is searched again until there are enough formatted entries
+            - the offset and limit are applied to the entries in the order they were found
+        """
+        import EDL as edl
+        edl.EDL_INCREMENTAL_CACHE_PATH = os.path.join(mkdtemp(), 'incremental')
+        request_args = edl.RequestArguments(query='type:URL', limit=2, offset=1, url_port_stripping=True)
+        first_page = [{'value': 'd.com:80', 'indicator_type': 'URL'}, {'value': 'd.com:443', 'indicator_type': 'URL'},
+                      {'value': 'c.com', 'indicator_type': 'URL'}]
+        second_page = [{'value': 'b.com', 'indicator_type': 'URL'}, {'value': 'a.com', 'indicator_type': 'URL'}]
+        find_mock = mocker.patch.object(edl, 'find_indicators_to_limit', side_effect=[first_page, second_page])
+        mocker.patch.object(edl.IndicatorsSearcher, 'total', new_callable=mocker.PropertyMock, side_effect=[10, 4])
+
+        assert edl.create_incremental_edl(request_args, '1 day') == 'c.com\nb.com'
+        assert find_mock.call_count == 2
+
+    def test_create_incremental_edl__no_changes(self, mocker):
+        """
+        Test create_incremental_edl serves the stored EDL when nothing changed
+        Given:
+            - a store with a previous build
+        When:
+            - no indicators were modified or expired since the last build
+        Then:
+            - the stored EDL is returned without rendering it again
+        """
+        import EDL as edl
+        edl.EDL_INCREMENTAL_CACHE_PATH = os.path.join(mkdtemp(), 'incremental')
+        request_args = edl.RequestArguments(query='type:IP', limit=10)
+        mocker.patch.object(edl, 'find_indicators_to_limit',
+                            side_effect=[[{'value': '1.1.1.1', 'indicator_type': 'IP'}], [], [], []])
+        assert edl.create_incremental_edl(request_args, '1 day') == '1.1.1.1'
+        render_mock = mocker.patch.object(edl, 'render_incremental_edl')
+        assert edl.create_incremental_edl(request_args, '1 day') == '1.1.1.1'
+        render_mock.assert_not_called()
+
+    def test_is_incremental_edl_store_expired(self):
+        """
+        Given:
+            - an empty store, a fresh store and an old store
+        When:
+            - calling is_incremental_edl_store_expired
+        Then:
+            - only the fresh store is considered valid
+        """
+        from EDL import is_incremental_edl_store_expired, EDL_INCREMENTAL_TIME_FORMAT
+        fresh = datetime.now(timezone.utc).strftime(EDL_INCREMENTAL_TIME_FORMAT)
+        assert is_incremental_edl_store_expired({}, '1 day')
+        assert not is_incremental_edl_store_expired({'last_full_build': fresh, 'iocs': {}}, '1 day')
+        assert is_incremental_edl_store_expired({'last_full_build': '2020-01-01T00:00:00Z', 'iocs': {}}, '1 day')
+
     def test_validate_basic_authentication(self):
         """Test Authentication"""
         from EDL import validate_basic_authentication
@@ -281,6 +386,65 @@ class TestHelperFunctions:
         assert "25.24.23.22" in ip_range_list
         assert "3.3.3.0/30" in ip_range_list
 
+    def test_ips_to_ranges__invalid_and_host_bits(self):
+        """
+        Given:
+            - a CIDR with host bits set, an IPv6 address and an invalid IP
+        When:
+            - collapsing the IPs to CIDRs
+        Then:
+            - the CIDR is normalized, the IPv6 is kept and the invalid IP is returned as is
+        """
+        from EDL import ips_to_ranges, COLLAPSE_TO_CIDR
+        ip_range_list = ips_to_ranges(['1.1.1.7/24', '1.1.2.0', '::1', 'not-an-ip'], COLLAPSE_TO_CIDR)
+        assert ip_range_list == {'1.1.1.0/24', '1.1.2.0', '::1', 'not-an-ip'}
+
+    @pytest.mark.parametrize('first, last, expected', [
+        ('1.1.1.1', '1.1.1.1', ['1.1.1.1']),
+        ('1.1.1.0', '1.1.1.255', ['1.1.1.0/24']),
+        ('1.1.1.1', '1.1.1.6', ['1.1.1.1', '1.1.1.2/31', '1.1.1.4/31', '1.1.1.6']),
+        ('0.0.0.0', '255.255.255.255', ['0.0.0.0/0']),
+    ])
+    def test_interval_to_cidrs(self, first, last, expected):
+        from EDL import interval_to_cidrs, ip_to_interval
+        _, first_int, _ = ip_to_interval(first)
+        _, last_int, _ = ip_to_interval(last)
+        assert interval_to_cidrs(first_int, last_int, 32) == expected
+
+    def test_merge_intervals(self):
+        from EDL import merge_intervals
+        assert merge_intervals([]) == []
+        assert merge_intervals([(5, 9), (1, 2), (3, 3), (8, 12), (14, 15)]) == [(1, 3), (5, 12), (14, 15)]
+
+    @pytest.mark.skipif(not os.getenv('EDL_BENCHMARK'), reason='benchmark runs only when EDL_BENCHMARK is set')
+    def test_format_indicators_benchmark(self):
+        """
+        Micro-benchmark of format_indicators over 1M indicators (40% IPs, 30% URLs with ports, 30% globs).
+        Run with: EDL_BENCHMARK=1 pytest -s -k benchmark EDL_test.py
+        """
+        import random
+        import time
+        from EDL import format_indicators, RequestArguments, DONT_COLLAPSE, COLLAPSE_TO_CIDR
+        random.seed(0)
+        iocs = []
+        for i in range(1000000):
+            rand = random.random()
+            if rand < 0.4:
+                ip = '.'.join(str(random.randint(1, 223 if octet == 0 else 255)) for octet in range(4))
+                iocs.append({'value': ip, 'indicator_type': 'IP'})
+            elif rand < 0.7:
+                iocs.append({'value': f'https://sub{i}.example{i % 1000}.com:8080/path/{i}', 'indicator_type': 'URL'})
+            else:
+                iocs.append({'value': f'*.domain{i}.com', 'indicator_type': 'DomainGlob'})
+        for collapse_ips in (DONT_COLLAPSE, COLLAPSE_TO_CIDR):
+            request_args = RequestArguments(query='', url_port_stripping=True, drop_invalids=True,
+                                            collapse_ips=collapse_ips)
+            start = time.perf_counter()
+            formatted = format_indicators(iocs, request_args)
+            duration = time.perf_counter() - start
+            print(f'{collapse_ips}: {len(iocs) / duration:,.0f} indicators/sec ({duration:.2f}s, {len(formatted)} entries)')
+            assert formatted
+
     def test_get_bool_arg_or_param(self):
         """
         Given:
@@ -360,3 +524,128 @@ class TestHelperFunctions:
         assert res.drop_invalids == request_args["di"]
         assert res.collapse_ips == COLLAPSE_TO_RANGES
         assert res.add_comment_if_empty == request_args["ce"]
+
+    def test_route_edl__streaming(self, mocker):
+        """
+        Test route_edl streams the EDL when streaming_response is set
+        Given:
+            - streaming_response param, and a client accepting gzip
+        When:
+            - requesting the EDL
+        Then:
+            - the gzipped body decompresses to the formatted indicators
+            - the ETag and size headers are omitted, as the EDL is searched while it is streamed
+        """
+        import gzip
+        import EDL as edl
+        params = {'streaming_response': True, 'cache_refresh_rate': '1 minute', 'edl_size': 10}
+        mocker.patch.object(edl.demisto, 'params', return_value=params)
+        mocker.patch.object(edl, 'iter_new_edl_entries', return_value=iter(['1.1.1.1', '2.2.2.2']))
+        with edl.APP.test_client() as client:
+            response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+            assert response.status_code == 200
+            assert 'X-EDL-Size' not in response.headers
+            assert 'ETag' not in response.headers
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert gzip.decompress(response.data).decode() == '1.1.1.1\n2.2.2.2'
+
+    def test_route_edl__streaming_incremental(self, mocker):
+        """
+        Test route_edl streams the incremental EDL with its ETag and size
+        Given:
+            - streaming_response and incremental_edl params, and a client not accepting gzip
+        When:
+            - requesting the EDL
+        Then:
+            - the EDL is returned with its ETag and size headers
+        """
+        import hashlib
+        import EDL as edl
+        params = {'streaming_response': True, 'incremental_edl': True, 'cache_refresh_rate': '1 minute'}
+        mocker.patch.object(edl.demisto, 'params', return_value=params)
+        mocker.patch.object(edl, 'create_incremental_edl', return_value='a.com\nb.com')
+        with edl.APP.test_client() as client:
+            response = client.get('/')
+            assert response.data.decode() == 'a.com\nb.com'
+            assert response.headers['X-EDL-Size'] == '2'
+            assert response.headers['ETag'] == '"{}"'.format(hashlib.sha1(b'a.com\nb.com').hexdigest())
+
+    def test_iter_new_edl_entries(self, mocker):
+        """
+        Test iter_new_edl_entries formats the indicators page by page
+        Given:
+            - two pages of indicators, with duplicate formatted entries
+        When:
+            - iterating the EDL entries with an offset and a limit
+        Then:
+            - the entries are yielded in search order, without duplicates
+            - the second page is searched only once the entries of the first page were consumed
+            - no more pages are searched once the limit is reached
+        """
+        import EDL as edl
+        pages = [
+            {'iocs': [{'value': 'a.com:80', 'indicator_type': 'URL'}, {'value': 'a.com', 'indicator_type': 'URL'},
+                      {'value': 'b.com', 'indicator_type': 'URL'}]},
+            {'iocs': [{'value': 'c.com', 'indicator_type': 'URL'}, {'value': 'd.com', 'indicator_type': 'URL'}]},
+            {'iocs': [{'value': 'e.com', 'indicator_type': 'URL'}]},
+        ]
+        searched_pages = []
+
+        def search_pages(*_, **__):
+            for page in pages:
+                searched_pages.append(page)
+                yield page
+
+        mocker.patch.object(edl, 'IndicatorsSearcher', side_effect=search_pages)
+        request_args = edl.RequestArguments(query='type:URL', limit=2, offset=1, url_port_stripping=True)
+        entries = edl.iter_new_edl_entries(request_args)
+        assert next(entries) == 'b.com'
+        assert len(searched_pages) == 1
+        assert list(entries) == ['c.com']
+        assert len(searched_pages) == 2
+
+    def test_iter_new_edl_entries__collapse(self, mocker):
+        """
+        Test iter_new_edl_entries collapses the IPs of all the searched pages
+        Given:
+            - pages of IPs which collapse to fewer entries, and a domain
+        When:
+            - iterating the EDL entries, collapsing IPs to ranges
+        Then:
+            - the pages are searched until the collapsed entries fill the limit
+            - the collapsed IPs are yielded after the other entries
+        """
+        import EDL as edl
+        pages = [
+            {'iocs': [{'value': '1.1.1.1', 'indicator_type': 'IP'}, {'value': '1.1.1.2', 'indicator_type': 'IP'}]},
+            {'iocs': [{'value': 'a.com', 'indicator_type': 'Domain'}, {'value': '2.2.2.2', 'indicator_type': 'IP'}]},
+            {'iocs': [{'value': '3.3.3.3', 'indicator_type': 'IP'}]},
+        ]
+        mocker.patch.object(edl, 'IndicatorsSearcher', return_value=pages)
+        request_args = edl.RequestArguments(query='', limit=3, collapse_ips=edl.COLLAPSE_TO_RANGES)
+        entries = list(edl.iter_new_edl_entries(request_args))
+        assert entries[0] == 'a.com'
+        assert set(entries[1:]) == {'1.1.1.1-1.1.1.2', '2.2.2.2'}
+
+    def test_route_edl__streaming_on_demand(self, mocker):
+        """
+        Test route_edl streams the on-demand EDL from the cache file
+        Given:
+            - streaming_response and on_demand params, and a client not accepting gzip
+        When:
+            - requesting the EDL
+        Then:
+            - the cached EDL is returned as is
+        """
+        import EDL as edl
+        edl.EDL_ON_DEMAND_CACHE_PATH = 'EDL_test/TestHelperFunctions/iocs_cache_values_text.txt'
+        params = {'streaming_response': True, 'on_demand': True, 'cache_refresh_rate': '1 minute'}
+        mocker.patch.object(edl.demisto, 'params', return_value=params)
+        mocker.patch.object(edl, 'get_integration_context', return_value={})
+        with open(edl.EDL_ON_DEMAND_CACHE_PATH, 'r') as f:
+            expected_edl = f.read()
+        with edl.APP.test_client() as client:
+            response = client.get('/')
+            assert response.status_code == 200
+            assert 'Content-Encoding' not in response.headers
+            assert response.data.decode() == expected_edl
@@ -746,17 +746,30 @@ def route_list_values() -> Response:
 
         mimetype = get_outbound_mimetype()
 
-        list_size = 0
-        if values.strip():
-            list_size = values.count('\n') + 1  # add 1 as last line doesn't have a \n
         max_age = ceil((datetime.now() - dateparser.parse(cache_refresh_rate)).total_seconds())  # type: ignore[operator]
-        demisto.debug(f'Returning exported indicators list of size: [{list_size}], created: [{created}], '
-                      f'query time seconds: [{query_time}], max age: [{max_age}]')
-        resp = Response(values, status=200, mimetype=mimetype, headers=[
+        headers = [
             ('X-ExportIndicators-Created', created.isoformat()),
             ('X-ExportIndicators-Query-Time-Secs', "{:.3f}".format(query_time)),
-            ('X-ExportIndicators-Size', str(list_size))
-        ])
+        ]
+        list_size = 0
+        if values.strip():
+            list_size = values.count('\n') + 1  # add 1 as last line doesn't have a \n
+        headers.append(('X-ExportIndicators-Size', str(list_size)))
+        if params.get('streaming_response'):
+            # the list is kept formatted in the integration context, so streaming it saves copying it into the
+            # response and compressing it as a whole, rather than saves building it
+            etag = get_text_etag(values)
+            demisto.debug(f'Streaming exported indicators list of size: [{list_size}], created: [{created}], '
+                          f'query time seconds: [{query_time}], max age: [{max_age}], etag: [{etag}]')
+            resp = create_streaming_response(text_to_chunks(values),
+                                             accept_encoding=request.headers.get('Accept-Encoding', ''),
+                                             mimetype=mimetype,
+                                             headers=headers,
+                                             etag=etag)
+        else:
+            demisto.debug(f'Returning exported indicators list of size: [{list_size}], created: [{created}], '
+                          f'query time seconds: [{query_time}], max age: [{max_age}]')
+            resp = Response(values, status=200, mimetype=mimetype, headers=headers)
         resp.cache_control.max_age = max_age
         resp.cache_control[
             'stale-if-error'] = '600'  # number of seconds we are willing to serve stale content when there is an error
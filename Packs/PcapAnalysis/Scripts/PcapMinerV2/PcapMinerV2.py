@@ -3,7 +3,9 @@ from CommonServerPython import *
 
 import pyshark
 import re
-from typing import Dict, Any
+import struct
+import multiprocessing
+from typing import Dict, Any, Optional
 import traceback
 
 
@@ -22,6 +24,15 @@ MESSAGE_CODE = r'Message Code: (.+)'
 RESPONSE_CODE = r'Response code: (.+)'
 ALL_SUPPORTED_PROTOCOLS = ['HTTP', 'DNS', 'LLMNR', 'SYSLOG', 'SMTP', 'NETBIOS', 'ICMP', 'KERBEROS',
                            'TELNET', 'SSH', 'IRC', 'FTP', 'SMB2']
+# protocols whose data is linked between packets by the TCP sequence numbers, and can't be mined in workers
+SEQUENTIAL_PROTOCOLS = {'SMTP', 'IRC', 'FTP'}
+MIN_PACKETS_PER_WORKER = 50000
+MAX_MINING_WORKERS = 4
+PCAP_MAGIC_TO_BYTE_ORDER = {b'\xd4\xc3\xb2\xa1': '<', b'\xa1\xb2\xc3\xd4': '>',  # microseconds
+                            b'\x4d\x3c\xb2\xa1': '<', b'\xa1\xb2\x3c\x4d': '>'}  # nanoseconds
+PCAPNG_SECTION_HEADER_BLOCK = b'\x0a\x0d\x0d\x0a'
+PCAPNG_LITTLE_ENDIAN_MAGIC = b'\x4d\x3c\x2b\x1a'
+PCAPNG_PACKET_BLOCK_TYPES = {2, 3, 6}  # packet, simple packet and enhanced packet blocks
 
 
 class PCAP():
@@ -106,7 +117,6 @@ class PCAP():
         if homemade_regex:
             self.reg_homemade = re.compile(self.homemade_regex)
 
-    @logger
     def extract_dns(self, packet):
         dns_layer = packet.dns
         temp_dns = {
@@ -114,12 +124,10 @@ class PCAP():
             'ID': dns_layer.get('id'),
             'Request': dns_layer.get('qry_name'),
             'Response': dns_layer.get('a'),
-            'Type': self.reg_type.findall(str(dns_layer))[0] if self.reg_type.findall(
-                str(dns_layer)) else None
+            'Type': first_match(self.reg_type, str(dns_layer))
         }
         add_to_data(self.protocol_data['DNS'], temp_dns)
 
-    @logger
     def extract_kerberos(self, packet):
         kerb_layer = packet.kerberos
         sname_results = self.reg_sname.findall(str(kerb_layer))
@@ -130,7 +138,6 @@ class PCAP():
             'SName': sname_results if sname_results else None,
         })
 
-    @logger
     def extract_telnet(self, packet):
         telnet_layer = packet.telnet
         for message in telnet_layer._get_all_field_lines():
@@ -140,7 +147,6 @@ class PCAP():
             if ':' not in message:
                 self.telnet_commands.add(message.lstrip('\t').rstrip('\n'))
 
-    @logger
     def extract_llmnr(self, packet):
         llmnr_layer = packet.llmnr
         llmnr_layer_string = str(llmnr_layer)
@@ -156,7 +162,6 @@ class PCAP():
         }
         add_to_data(self.protocol_data['LLMNR'], llmnr_data)
 
-    @logger
     def extract_syslog(self, packet):
         syslog_layer = packet.syslog
         syslog_data = {
@@ -168,7 +173,6 @@ class PCAP():
         }
         add_to_data(self.protocol_data['SYSLOG'], syslog_data)
 
-    @logger
     def extract_imf(self, packet):
         imf_layer = packet.imf
         imf_data = {
@@ -181,7 +185,6 @@ class PCAP():
         }
         add_to_data(self.protocol_data['SMTP'], imf_data)
 
-    @logger
     def extract_smtp(self, packet):
         smtp_layer = packet.smtp
 
@@ -196,7 +199,6 @@ class PCAP():
             smtp_data[parameters[0].title()] = strip(parameters[1], ['<', '>'])
         add_to_data(self.protocol_data['SMTP'], smtp_data, packet.tcp.nxtseq)
 
-    @logger
     def extract_smb(self, packet):
         smb_layer = packet.smb2
         command_results = self.reg_cmd.findall(str(smb_layer))
@@ -212,7 +214,6 @@ class PCAP():
         }
         add_to_data(self.protocol_data['SMB2'], smb_data)
 
-    @logger
     def extract_netbios(self, packet):
         netbios_layer = packet.nbns
         type_results = self.reg_type.findall(str(netbios_layer))
@@ -226,14 +227,12 @@ class PCAP():
         }
         add_to_data(self.protocol_data['NETBIOS'], netbios_data)
 
-    @logger
     def extract_icmp(self, packet):
         icmp_layer = packet.icmp
         type_results = self.reg_type.findall(str(icmp_layer))
         for result in type_results:
             self.icmp_data.add(result)
 
-    @logger
     def extract_ssh(self, packet):
         ssh_layer = packet.ssh
         protocol = ssh_layer.get('protocol')
@@ -249,7 +248,6 @@ class PCAP():
                 self.ssh_data['KeyExchangeMessageCode'].add(message_code_results[0])  # type: ignore[attr-defined]
         return
 
-    @logger
     def extract_irc(self, packet):
         irc_layer = packet.irc
         if irc_layer.get('request'):
@@ -284,7 +282,6 @@ class PCAP():
             }
         add_to_data(self.protocol_data['IRC'], irc_data, next_id=packet.tcp.nxtseq)
 
-    @logger
     def extract_ftp(self, packet):
         ftp_layer = packet.ftp
         res_code_results = self.reg_res_code.findall(str(ftp_layer))
@@ -302,7 +299,6 @@ class PCAP():
         else:
             add_to_data(self.protocol_data['FTP'], ftp_data, next_id=packet.tcp.ack)
 
-    @logger
     def extract_context_from_packet(self, packet, layers_str: str, is_reg_extract: bool = False) -> None:
         """
         Get a packet and extract context from it for the specified protocols specified in `self.extracted_protocols`
@@ -313,13 +309,16 @@ class PCAP():
         """
 
         layers = layers_str.split(',')
-        if is_reg_extract:
-            self.ips_extracted.update(self.reg_ip.findall(str(packet)))
-            self.emails_extracted.update(self.reg_email.findall(str(packet)))
-            self.urls_extracted.update(self.reg_url.findall(str(packet)))
+        if is_reg_extract or self.homemade_regex:
+            # rendering a packet is expensive, it is rendered once for all the regexes
+            packet_string = str(packet)
+            if is_reg_extract:
+                self.ips_extracted.update(self.reg_ip.findall(packet_string))
+                self.emails_extracted.update(self.reg_email.findall(packet_string))
+                self.urls_extracted.update(self.reg_url.findall(packet_string))
 
-        if self.homemade_regex:
-            self.homemade_extracted.update(self.reg_homemade.findall((str(packet))))
+            if self.homemade_regex:
+                self.homemade_extracted.update(self.reg_homemade.findall(packet_string))
 
         if 'DNS' in self.extracted_protocols and 'DNS' in layers:
             return self.extract_dns(packet)
@@ -429,6 +428,87 @@ class PCAP():
             general_context['DestIP'] = list(self.unique_dest_ip)
         return md, ec, general_context
 
+    def merge(self, other: 'PCAP') -> None:
+        """
+        Merges the data mined from the following packets of the capture by another PCAP object.
+
+        Args:
+            other: The PCAP object which mined the following packets.
+        """
+        for layers, count in other.hierarchy.items():
+            self.hierarchy[layers] = self.hierarchy.get(layers, 0) + count
+        self.num_of_packets += other.num_of_packets
+        self.tcp_streams = max(self.tcp_streams, other.tcp_streams)
+        self.udp_streams = max(self.udp_streams, other.udp_streams)
+        self.last_packet = max(self.last_packet, other.last_packet)
+        self.bytes_transmitted += other.bytes_transmitted
+        self.min_time = min(self.min_time, other.min_time)
+        self.max_time = max(self.max_time, other.max_time)
+
+        for (a, b), count in other.conversations.items():
+            hosts = (b, a) if (b, a) in self.conversations else (a, b)
+            self.conversations[hosts] = self.conversations.get(hosts, 0) + count
+        for (a, src_port, b, dest_port), flow_data in other.flows.items():
+            flow = (b, dest_port, a, src_port) if (b, dest_port, a, src_port) in self.flows else \
+                (a, src_port, b, dest_port)
+            if flow in self.flows:
+                self.flows[flow]['min_time'] = min(self.flows[flow]['min_time'], flow_data['min_time'])
+                self.flows[flow]['max_time'] = max(self.flows[flow]['max_time'], flow_data['max_time'])
+                self.flows[flow]['bytes'] += flow_data['bytes']
+                self.flows[flow]['counter'] += flow_data['counter']
+            else:
+                self.flows[flow] = flow_data
+
+        for extracted in ['unique_source_ip', 'unique_dest_ip', 'ips_extracted', 'urls_extracted',
+                          'emails_extracted', 'homemade_extracted', 'last_layer']:
+            getattr(self, extracted).update(getattr(other, extracted))
+        for protocol in self.extracted_protocols:
+            for data_id, data in other.protocol_data[protocol].items():
+                if data_id in self.protocol_data[protocol]:
+                    self.protocol_data[protocol][data_id].update(data)
+                else:
+                    self.protocol_data[protocol][data_id] = data
+        if 'ICMP' in self.extracted_protocols:
+            self.icmp_data.update(other.icmp_data)
+        if 'KERBEROS' in self.extracted_protocols:
+            self.kerb_data.extend(other.kerb_data)
+        if 'SSH' in self.extracted_protocols:
+            for key in ['ClientProtocols', 'ServerProtocols', 'KeyExchangeMessageCode']:
+                self.ssh_data[key].update(other.ssh_data[key])  # type: ignore[attr-defined]
+        if 'TELNET' in self.extracted_protocols:
+            self.telnet_data.update(other.telnet_data)
+            self.telnet_commands.update(other.telnet_commands)
+
+    @logger
+    def mine_in_workers(self, file_path: str, wpa_password: str, rsa_key_file_path: str, is_flows: bool,
+                        is_reg_extract: bool, pcap_filter: str, packets_count: int, workers: int) -> None:
+        """
+        Mines the PCAP in worker processes, each mining a range of consecutive packets, and merges their data.
+        Every worker's tshark reads the whole capture, so that streams and requests are numbered as in a single run,
+        but only the packets of its range are parsed.
+
+        Args:
+            file_path: The PCAP's file path.
+            wpa_password: The wpa password for the decryption
+            rsa_key_file_path: The rsa key file path for the decryption
+            is_flows: Whether to extract flows.
+            is_reg_extract: Whether to extract regexes from the PCAP.
+            pcap_filter: A filter to apply on the PCAP. Same filter syntax as in Wireshark
+            packets_count: The number of packets in the PCAP.
+            workers: The number of worker processes.
+        """
+        range_size = -(-packets_count // workers)
+        shards_args = []
+        for first_packet in range(1, packets_count + 1, range_size):
+            range_filter = f'frame.number >= {first_packet} && frame.number < {first_packet + range_size}'
+            shard_filter = f'({pcap_filter}) && {range_filter}' if pcap_filter else range_filter
+            shards_args.append((self, file_path, wpa_password, rsa_key_file_path, is_flows, is_reg_extract,
+                                shard_filter))
+        with multiprocessing.get_context('fork').Pool(len(shards_args)) as pool:
+            shards = pool.starmap(mine_shard, shards_args)
+        for shard in shards:
+            self.merge(shard)
+
     @logger
     def mine(self, file_path: str, wpa_password: str, rsa_key_file_path: str, is_flows: bool, is_reg_extract: bool,
              pcap_filter: str, pcap_filter_new_file_path: str) -> None:
@@ -532,8 +612,7 @@ class PCAP():
                                 'RequestMethod': http_layer.get('request_method'),
                                 'RequestVersion': http_layer.get('request_version'),
                                 'RequestAcceptEncoding': http_layer.get('accept_encoding'),
-                                'RequestPragma': self.reg_pragma.findall(str(http_layer))[0]
-                                if self.reg_pragma.findall(str(http_layer)) else None,
+                                'RequestPragma': first_match(self.reg_pragma, str(http_layer)),
                                 'RequestAcceptLanguage': http_layer.get('accept_language'),
                                 'RequestCacheControl': http_layer.get('cache_control')
 
@@ -568,7 +647,84 @@ class PCAP():
 '''HELPER FUNCTIONS'''
 
 
-@logger
+def mine_shard(pcap: PCAP, file_path: str, wpa_password: str, rsa_key_file_path: str, is_flows: bool,
+               is_reg_extract: bool, shard_filter: str) -> PCAP:
+    """
+    Mines the packets of a shard of the PCAP in a worker process.
+
+    Returns:
+        The PCAP object with the data of the shard.
+    """
+    pcap.mine(file_path, wpa_password, rsa_key_file_path, is_flows, is_reg_extract, shard_filter, '')
+    return pcap
+
+
+def count_capture_packets(file_path: str) -> Optional[int]:
+    """
+    Counts the packets of a pcap or pcapng file, by reading the headers of its records only.
+
+    Args:
+        file_path: The PCAP's file path.
+
+    Returns:
+        The number of packets, None if the file is not a pcap or pcapng file.
+    """
+    count = 0
+    with open(file_path, 'rb') as f:
+        magic = f.read(4)
+        if magic in PCAP_MAGIC_TO_BYTE_ORDER:
+            byte_order = PCAP_MAGIC_TO_BYTE_ORDER[magic]
+            f.seek(24)
+            while True:
+                record_header = f.read(16)
+                if len(record_header) < 16:
+                    return count
+                captured_length = struct.unpack(byte_order + 'I', record_header[8:12])[0]
+                f.seek(captured_length, 1)
+                count += 1
+        elif magic == PCAPNG_SECTION_HEADER_BLOCK:
+            f.seek(0)
+            byte_order = '<'
+            while True:
+                block_header = f.read(8)
+                if len(block_header) < 8:
+                    return count
+                if block_header[:4] == PCAPNG_SECTION_HEADER_BLOCK:
+                    byte_order = '<' if f.read(4) == PCAPNG_LITTLE_ENDIAN_MAGIC else '>'
+                    f.seek(-4, 1)
+                block_type, block_length = struct.unpack(byte_order + 'II', block_header)
+                if block_length < 12:
+                    return None
+                if block_type in PCAPNG_PACKET_BLOCK_TYPES:
+                    count += 1
+                f.seek(block_length - 8, 1)
+    return None
+
+
+def get_mining_workers(file_path: str, extracted_protocols: list, pcap_filter_new_file_path: str,
+                       max_workers: int = 1) -> tuple:
+    """
+    Decides in how many worker processes to mine the PCAP.
+    Every worker runs a full tshark dissection of the PCAP, so workers are used only when asked for.
+
+    Args:
+        file_path: The PCAP's file path.
+        extracted_protocols: A list of protocols to extract
+        pcap_filter_new_file_path: The new path to save the filtered PCAP in
+        max_workers: The maximal number of worker processes, 1 for mining in the script's process.
+
+    Returns:
+        The number of packets in the PCAP and the number of workers, 1 for mining in the script's process.
+    """
+    if max_workers <= 1 or pcap_filter_new_file_path or SEQUENTIAL_PROTOCOLS.intersection(extracted_protocols):
+        return None, 1
+    packets_count = count_capture_packets(file_path)
+    if not packets_count:
+        return packets_count, 1
+    return packets_count, max(1, min(max_workers, MAX_MINING_WORKERS, multiprocessing.cpu_count(),
+                                     packets_count // MIN_PACKETS_PER_WORKER))
+
+
 def strip(s: str, bad_chars=None):
     """
 
@@ -587,6 +743,20 @@ def strip(s: str, bad_chars=None):
     return temp
 
 
+def first_match(pattern, string: str):
+    """
+
+    Args:
+        pattern: A compiled regex.
+        string: The string to search in.
+
+    Returns:
+        The first match of the pattern in the string, None if there is no match.
+    """
+    results = pattern.findall(string)
+    return results[0] if results else None
+
+
 @logger
 def hierarchy_to_md(hierarchy: dict) -> str:
     """
@@ -682,7 +852,6 @@ def flows_to_ec(flows: dict) -> list:
     return flows_ec
 
 
-@logger
 def add_to_data(d: dict, data: dict, next_id: int = None) -> None:
     """
     updates dictionary d to include/update the data. Also removes None values.
@@ -744,6 +913,7 @@ def main():
     pcap_filter_new_file_path = ''
     pcap_filter_new_file_name = args.get('filtered_file_name', '')
     unique_ips = args.get('extract_ips', 'False') == 'True'
+    max_mining_workers = arg_to_number(args.get('max_mining_workers')) or 1
 
     if pcap_filter_new_file_name:
         temp = demisto.uniqueFile()
@@ -751,8 +921,14 @@ def main():
 
     try:
         pcap = PCAP(is_reg_extract, extracted_protocols, homemade_regex, unique_ips, entry_id)
-        pcap.mine(file_path, wpa_password, rsa_key_file_path, is_flows, is_reg_extract, pcap_filter,
-                  pcap_filter_new_file_path)
+        packets_count, workers = get_mining_workers(file_path, extracted_protocols, pcap_filter_new_file_path,
+                                                    max_mining_workers)
+        if workers > 1:
+            pcap.mine_in_workers(file_path, wpa_password, rsa_key_file_path, is_flows, is_reg_extract, pcap_filter,
+                                 packets_count, workers)
+        else:
+            pcap.mine(file_path, wpa_password, rsa_key_file_path, is_flows, is_reg_extract, pcap_filter,
+                      pcap_filter_new_file_path)
         hr, ec, raw = pcap.get_outputs(conversation_number_to_display, is_flows, is_reg_extract)
         return_outputs(hr, ec, raw)
 
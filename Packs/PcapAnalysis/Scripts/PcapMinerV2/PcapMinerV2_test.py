@@ -75,3 +75,65 @@ def test_mine_pcap():
     assert len(ec['PCAPResultsSMB2']) == 7
     assert raw['URL'][0] == 'http://239.255.255.250:1900*'
     assert raw['Regex'] != []
+
+
+@pytest.mark.parametrize("file_path, packets_count", [('./TestData/smb-on-windows-10.pcapng', 1000),
+                                                      ('./TestData/nb6-http.pcap', 62),
+                                                      ('./PcapMinerV2.yml', None)])
+def test_count_capture_packets(file_path, packets_count):
+    from PcapMinerV2 import count_capture_packets
+    assert count_capture_packets(file_path) == packets_count
+
+
+def test_merge():
+    from PcapMinerV2 import PCAP
+    first, second = PCAP(False, ['DNS'], '', False, 'entry_id'), PCAP(False, ['DNS'], '', False, 'entry_id')
+    first.hierarchy, second.hierarchy = {'eth': 2, 'eth,ip': 1}, {'eth': 1}
+    first.num_of_packets, second.num_of_packets = 2, 1
+    first.min_time, first.max_time, second.min_time, second.max_time = 1.0, 2.0, 3.0, 3.0
+    first.conversations, second.conversations = {('1.1.1.1', '2.2.2.2'): 2}, {('2.2.2.2', '1.1.1.1'): 1}
+    first.flows = {('1.1.1.1', 80, '2.2.2.2', 5000): {'min_time': 1.0, 'max_time': 2.0, 'bytes': 10, 'counter': 2}}
+    second.flows = {('2.2.2.2', 5000, '1.1.1.1', 80): {'min_time': 3.0, 'max_time': 3.0, 'bytes': 5, 'counter': 1}}
+    first.protocol_data['DNS'] = {1: {'ID': 1, 'Request': 'a.com'}}
+    second.protocol_data['DNS'] = {1: {'ID': 1, 'Response': '1.2.3.4'}, 2: {'ID': 2, 'Request': 'b.com'}}
+    second.last_layer = {'dns'}
+
+    first.merge(second)
+
+    assert first.hierarchy == {'eth': 3, 'eth,ip': 1}
+    assert first.num_of_packets == 3
+    assert (first.min_time, first.max_time) == (1.0, 3.0)
+    assert first.conversations == {('1.1.1.1', '2.2.2.2'): 3}
+    assert first.flows == {('1.1.1.1', 80, '2.2.2.2', 5000): {'min_time': 1.0, 'max_time': 3.0, 'bytes': 15,
+                                                              'counter': 3}}
+    assert first.protocol_data['DNS'] == {1: {'ID': 1, 'Request': 'a.com', 'Response': '1.2.3.4'},
+                                          2: {'ID': 2, 'Request': 'b.com'}}
+    assert first.last_layer == {'dns'}
+
+
+def test_mine_pcap_in_workers():
+    file_path = './TestData/smb-on-windows-10.pcapng'
+    extracted_protocols = ['DNS', 'SMB2']
+    from PcapMinerV2 import PCAP
+    pcap = PCAP(True, extracted_protocols, 'M-SEARCH * (.+)', False, 'entry_id')
+    pcap.mine_in_workers(file_path, '', '', True, True, '', 1000, 2)
+    hr, ec, raw = pcap.get_outputs(15, True, True)
+    assert raw['Packets'] == 1000
+    assert len(ec['PCAPResultsDNS']) == 80
+    assert len(ec['PCAPResultsSMB2']) == 7
+    assert raw['URL'][0] == 'http://239.255.255.250:1900*'
+
+
+@pytest.mark.parametrize("extracted_protocols, pcap_filter_new_file_path, max_workers, expected", [
+    (['DNS'], '', 1, (None, 1)),
+    (['DNS'], '', 2, (1000, 2)),
+    (['DNS'], '', 16, (1000, 4)),
+    (['DNS', 'SMTP'], '', 4, (None, 1)),
+    (['DNS'], 'filtered.pcap', 4, (None, 1)),
+])
+def test_get_mining_workers(mocker, extracted_protocols, pcap_filter_new_file_path, max_workers, expected):
+    import PcapMinerV2
+    mocker.patch.object(PcapMinerV2, 'MIN_PACKETS_PER_WORKER', 100)
+    mocker.patch.object(PcapMinerV2.multiprocessing, 'cpu_count', return_value=8)
+    assert PcapMinerV2.get_mining_workers('./TestData/smb-on-windows-10.pcapng', extracted_protocols,
+                                          pcap_filter_new_file_path, max_workers) == expected
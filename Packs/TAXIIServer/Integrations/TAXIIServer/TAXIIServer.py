@@ -3,9 +3,10 @@ from CommonServerPython import *
 from flask import Flask, request, make_response, Response, stream_with_context
 from gevent.pywsgi import WSGIServer
 from urllib.parse import urlparse, ParseResult
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, gettempdir
 from base64 import b64decode
-from typing import Callable, List, Generator
+from typing import Callable, List, Generator, Iterator
+from collections import OrderedDict
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 from multiprocessing import Process
 from werkzeug.datastructures import Headers
@@ -18,6 +19,7 @@ from libtaxii.messages_11 import (
     CollectionInformation,
     CollectionInformationResponse,
     PollRequest,
+    PollFulfillmentRequest,
     PollingServiceInstance,
     ServiceInstance,
     ContentBlock,
@@ -27,6 +29,7 @@ from libtaxii.constants import (
     MSG_COLLECTION_INFORMATION_REQUEST,
     MSG_DISCOVERY_REQUEST,
     MSG_POLL_REQUEST,
+    MSG_POLL_FULFILLMENT_REQUEST,
     SVC_DISCOVERY,
     SVC_COLLECTION_MANAGEMENT,
     SVC_POLL,
@@ -36,6 +39,8 @@ from cybox.core import Observable
 from requests.utils import requote_uri
 
 import functools
+import hashlib
+import itertools
 import stix.core
 import stix.indicator
 import stix.extensions.marking.ais
@@ -56,6 +61,13 @@ import pytz
 ''' GLOBAL VARIABLES '''
 INTEGRATION_NAME: str = 'TAXII Server'
 PAGE_SIZE = 200
+# multi-part poll results waiting for a poll fulfillment request of their next part
+MAX_POLL_RESULTS = 100
+POLL_RESULT_TTL = 60 * 60
+STIX_CACHE_PATH = os.path.join(gettempdir(), 'taxii_stix_cache')
+DEFAULT_STIX_CACHE_SIZE_MB = 100
+# bump when the STIX rendering changes, so content blocks rendered by previous versions are not reused
+STIX_CACHE_VERSION = 1
 APP: Flask = Flask('demisto-taxii')
 NAMESPACE_URI = 'https://www.paloaltonetworks.com/cortex'
 NAMESPACE = 'cortex'
@@ -76,12 +88,127 @@ class Handler:
         demisto.info(message)
 
 
+''' STIX Cache '''
+
+
+class StixContentCache:
+    def __init__(self, path: str, max_size: int):
+        """
+        Local disk cache of the rendered STIX content blocks, evicting the least recently used content blocks
+        when the cache exceeds its maximal size.
+        Args:
+            path: The cache directory path.
+            max_size: The maximal size of the cache in bytes.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+        self.entries: OrderedDict = OrderedDict()
+        os.makedirs(path, exist_ok=True)
+        self.load()
+
+    def load(self):
+        """
+        Loads the content blocks cached by previous runs, the least recently written first.
+        """
+        cached_files = []
+        for file_name in os.listdir(self.path):
+            try:
+                file_stat = os.stat(os.path.join(self.path, file_name))
+            except OSError:
+                continue
+            cached_files.append((file_stat.st_mtime, file_name, file_stat.st_size))
+
+        for _, file_name, file_size in sorted(cached_files):
+            self.entries[file_name] = file_size
+            self.size += file_size
+        self.evict()
+
+    @staticmethod
+    def get_key(indicator: dict) -> Optional[str]:
+        """
+        Get the cache key of an indicator, which changes whenever the indicator is modified.
+        Args:
+            indicator: The Demisto indicator.
+
+        Returns:
+            The cache key, None if the indicator can not be cached.
+        """
+        indicator_id = indicator.get('id')
+        modified = indicator.get('modified')
+        if not indicator_id or not modified:
+            return None
+
+        return hashlib.sha256(f'{STIX_CACHE_VERSION}:{indicator_id}:{modified}'.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached content block.
+        Args:
+            key: The cache key.
+
+        Returns:
+            The content block XML, None if it is not cached.
+        """
+        if key not in self.entries:
+            return None
+
+        try:
+            with open(os.path.join(self.path, key), encoding='utf-8') as cached_file:
+                content = cached_file.read()
+        except OSError:
+            self.size -= self.entries.pop(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return content
+
+    def set(self, key: str, content: str):
+        """
+        Cache a content block.
+        Args:
+            key: The cache key.
+            content: The content block XML.
+        """
+        data = content.encode('utf-8')
+        if len(data) > self.max_size:
+            return
+
+        file_path = os.path.join(self.path, key)
+        try:
+            with open(f'{file_path}.tmp', 'wb') as cached_file:
+                cached_file.write(data)
+            os.replace(f'{file_path}.tmp', file_path)
+        except OSError as e:
+            demisto.debug(f'Failed caching STIX content block: {e}')
+            return
+
+        if key in self.entries:
+            self.size -= self.entries.pop(key)
+        self.entries[key] = len(data)
+        self.size += len(data)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used content blocks until the cache does not exceed its maximal size.
+        """
+        while self.size > self.max_size and self.entries:
+            key, file_size = self.entries.popitem(last=False)
+            self.size -= file_size
+            try:
+                os.remove(os.path.join(self.path, key))
+            except OSError:
+                pass
+
+
 ''' TAXII Server '''
 
 
 class TAXIIServer:
     def __init__(self, url_scheme: str, host: str, port: int, collections: dict, certificate: str, private_key: str,
-                 http_server: bool, credentials: dict, service_address: Optional[str] = None):
+                 http_server: bool, credentials: dict, service_address: Optional[str] = None,
+                 result_part_size: int = 0, stix_cache: Optional[StixContentCache] = None):
         """
         Class for a TAXII Server configuration.
         Args:
@@ -93,6 +220,9 @@ class TAXIIServer:
             private_key: The private key for SSL.
             http_server: Whether to use HTTP server (not SSL).
             credentials: The user credentials.
+            service_address: The URL address to set in the service responses.
+            result_part_size: The maximal number of content blocks in a part of a poll response, 0 for a single part.
+            stix_cache: The cache of the rendered STIX content blocks, None to render the indicators on every poll.
         """
         self.url_scheme = url_scheme
         self.host = host
@@ -102,6 +232,9 @@ class TAXIIServer:
         self.private_key = private_key
         self.http_server = http_server
         self.service_address = service_address
+        self.result_part_size = result_part_size
+        self.stix_cache = stix_cache
+        self.poll_results: Dict[str, dict] = {}
         self.auth = None
         if credentials:
             self.auth = (credentials.get('identifier', ''), credentials.get('password', ''))
@@ -197,15 +330,18 @@ class TAXIIServer:
 
         return collection_info_response
 
-    def get_poll_response(self, taxii_message: PollRequest) -> Response:
+    def get_poll_response(self, taxii_message: Union[PollRequest, PollFulfillmentRequest]) -> Response:
         """
         Handle poll request.
         Args:
-            taxii_message: The poll request message.
+            taxii_message: The poll request message, or the poll fulfillment request message of a multi-part result.
 
         Returns:
             The poll response.
         """
+        if taxii_message.message_type == MSG_POLL_FULFILLMENT_REQUEST:
+            return self.get_poll_fulfillment_response(taxii_message)
+
         if taxii_message.message_type != MSG_POLL_REQUEST:
             raise ValueError('Invalid message, invalid Message Type')
 
@@ -217,16 +353,52 @@ class TAXIIServer:
         return self.stream_stix_data_feed(taxii_feeds, taxii_message.message_id, collection_name,
                                           exclusive_begin_time, inclusive_end_time)
 
+    def get_poll_fulfillment_response(self, taxii_message: PollFulfillmentRequest) -> Response:
+        """
+        Handle poll fulfillment request, which requests the next part of a multi-part poll result.
+        Args:
+            taxii_message: The poll fulfillment request message.
+
+        Returns:
+            The poll response with the requested result part.
+        """
+        self.remove_expired_poll_results()
+        poll_result = self.poll_results.get(taxii_message.result_id)
+        if not poll_result or poll_result['collection_name'] != taxii_message.collection_name:
+            raise ValueError('Invalid message, unknown result ID')
+
+        result_part_number = int(taxii_message.result_part_number)
+        if result_part_number != poll_result['result_part_number']:
+            raise ValueError(f'Invalid message, result part {result_part_number} is not available,'
+                             f' the next available part is {poll_result["result_part_number"]}')
+
+        return self.stream_stix_data_feed(list(self.collections.keys()), taxii_message.message_id,
+                                          poll_result['collection_name'], poll_result['exclusive_begin_time'],
+                                          poll_result['inclusive_end_time'], poll_result)
+
+    def remove_expired_poll_results(self):
+        """
+        Removes the multi-part poll results whose next part was not requested in time.
+        """
+        now = time.time()
+        for result_id, poll_result in list(self.poll_results.items()):
+            if now - poll_result['updated'] > POLL_RESULT_TTL:
+                self.poll_results.pop(result_id, None)
+
     def stream_stix_data_feed(self, taxii_feeds: list, message_id: str, collection_name: str,
-                              exclusive_begin_time: datetime, inclusive_end_time: datetime) -> Response:
+                              exclusive_begin_time: datetime, inclusive_end_time: datetime,
+                              poll_result: Optional[dict] = None) -> Response:
         """
         Get the indicator query results in STIX data feed format.
+        The indicators are searched page by page while the response is streamed, and when a result part size is
+        configured only a single part of the results is returned, the rest are returned on poll fulfillment requests.
         Args:
             taxii_feeds: The available taxii feeds according to the collections.
             message_id: The taxii message ID.
             collection_name: The collection name to get the indicator query from.
             exclusive_begin_time: The query exclusive begin time.
             inclusive_end_time: The query inclusive end time.
+            poll_result: The multi-part poll result to return its next part, None for a new poll.
 
         Returns:
             Stream of STIX indicator data feed.
@@ -237,19 +409,64 @@ class TAXIIServer:
         if not inclusive_end_time:
             inclusive_end_time = datetime.utcnow().replace(tzinfo=pytz.utc)
 
+        if poll_result is None:
+            indicator_query = build_time_frame_query(self.collections[str(collection_name)], exclusive_begin_time,
+                                                     inclusive_end_time)
+            page_size = min(PAGE_SIZE, self.result_part_size) if self.result_part_size else PAGE_SIZE
+            pages = iter_indicators_pages(indicator_query, page_size)
+            poll_result = {
+                'result_id': str(uuid.uuid4()),
+                'result_part_number': 1,
+                'collection_name': collection_name,
+                'exclusive_begin_time': exclusive_begin_time,
+                'inclusive_end_time': inclusive_end_time,
+                'pages': pages,
+                # a part may end in the middle of a page, the rest of the page is kept for the next part
+                'indicators': itertools.chain.from_iterable(pages),
+                'fetched': 0,
+                'updated': time.time(),
+            }
+
+        indicators: Iterator[dict] = poll_result['indicators']
+        result_part_number: int = poll_result['result_part_number']
+
         def yield_response() -> Generator:
             """
 
             Streams the STIX indicators as XML string.
 
             """
+            # the first indicator is searched before the opening tag, to know whether there are more parts
+            first_indicator = next(indicators, None)
+            more = False
+            part_size = self.result_part_size
+            if part_size and first_indicator is not None:
+                total = get_indicators_total(poll_result['pages'])
+                if total is None:
+                    # the results can not be divided to parts without knowing their total number
+                    part_size = 0
+                else:
+                    more = total > poll_result['fetched'] + part_size
+            if more:
+                poll_result['result_part_number'] = result_part_number + 1
+                poll_result['updated'] = time.time()
+                self.remove_expired_poll_results()
+                if len(self.poll_results) >= MAX_POLL_RESULTS:
+                    oldest_result_id = min(self.poll_results, key=lambda key: self.poll_results[key]['updated'])
+                    self.poll_results.pop(oldest_result_id)
+                self.poll_results[poll_result['result_id']] = poll_result
+            else:
+                self.poll_results.pop(poll_result['result_id'], None)
+
             # yield the opening tag of the Poll Response
+            result_id = f' result_id="{poll_result["result_id"]}"' if self.result_part_size else ''
             response = '<taxii_11:Poll_Response xmlns:taxii="http://taxii.mitre.org/messages/taxii_xml_binding-1"' \
                        ' xmlns:taxii_11="http://taxii.mitre.org/messages/taxii_xml_binding-1.1" ' \
                        'xmlns:tdq="http://taxii.mitre.org/query/taxii_default_query-1"' \
                        f' message_id="{generate_message_id()}"' \
                        f' in_response_to="{message_id}"' \
-                       f' collection_name="{collection_name}" more="false" result_part_number="1"> ' \
+                       f' collection_name="{collection_name}" more="{str(more).lower()}"{result_id}' \
+                       f' result_part_number="{result_part_number}"> ' \
                        f'<taxii_11:Inclusive_End_Timestamp>{inclusive_end_time.isoformat()}' \
                        '</taxii_11:Inclusive_End_Timestamp>'
 
@@ -259,18 +476,15 @@ class TAXIIServer:
 
             yield response
 
-            # yield the content blocks
-            indicator_query = self.collections[str(collection_name)]
-
-            for indicator in find_indicators_by_time_frame(indicator_query, exclusive_begin_time, inclusive_end_time):
+            # yield the content blocks of the indicators as their pages are searched
+            part_indicators: Iterator[dict] = itertools.chain([first_indicator] if first_indicator is not None else [],
+                                                              indicators)
+            if part_size:
+                part_indicators = itertools.islice(part_indicators, part_size)
+            for indicator in part_indicators:
+                poll_result['fetched'] += 1
                 try:
-                    stix_xml_indicator = get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE})
-                    content_block = ContentBlock(
-                        content_binding=CB_STIX_XML_11,
-                        content=stix_xml_indicator
-                    )
-
-                    content_xml = content_block.to_xml().decode('utf-8')
+                    content_xml = get_content_block_xml(indicator, self.stix_cache)
                     yield f'{content_xml}\n'
                 except Exception as e:
                     handle_long_running_error(f'Failed parsing indicator to STIX: {e}')
@@ -511,6 +725,36 @@ TYPE_MAPPING = {
 }
 
 
+def get_content_block_xml(indicator: dict, stix_cache: Optional[StixContentCache] = None) -> str:
+    """
+    Convert a Demisto indicator to a STIX content block, reusing the cached content block if the indicator
+    was not modified since it was rendered.
+    Args:
+        indicator: The Demisto indicator.
+        stix_cache: The cache of the rendered STIX content blocks.
+
+    Returns:
+        The content block as XML string.
+    """
+    cache_key = StixContentCache.get_key(indicator) if stix_cache else None
+    if stix_cache and cache_key:
+        content_xml = stix_cache.get(cache_key)
+        if content_xml is not None:
+            return content_xml
+
+    stix_xml_indicator = get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE})
+    content_block = ContentBlock(
+        content_binding=CB_STIX_XML_11,
+        content=stix_xml_indicator
+    )
+    content_xml = content_block.to_xml().decode('utf-8')
+
+    if stix_cache and cache_key:
+        stix_cache.set(cache_key, content_xml)
+
+    return content_xml
+
+
 def set_id_namespace(uri: str, name: str):
     """
     Set the XML namespace.
@@ -722,16 +966,16 @@ def get_collections(params: dict = demisto.params()) -> dict:
     return collections
 
 
-def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime) -> list:
+def build_time_frame_query(indicator_query: str, begin_time: datetime, end_time: datetime) -> str:
     """
-    Find indicators according to a query and begin time/end time.
+    Build the indicators query of a query and begin time/end time.
     Args:
         indicator_query: The indicator query.
         begin_time: The exclusive begin time.
         end_time: The inclusive end time.
 
     Returns:
-        Indicator query results from Demisto.
+        The indicators query.
     """
 
     if indicator_query:
@@ -749,7 +993,21 @@ def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, en
         indicator_query += f'sourcetimestamp:<="{tz_end_time}"'
     demisto.info(f'Querying indicators by: {indicator_query}')
 
-    return find_indicators_loop(indicator_query)
+    return indicator_query
+
+
+def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime) -> list:
+    """
+    Find indicators according to a query and begin time/end time.
+    Args:
+        indicator_query: The indicator query.
+        begin_time: The exclusive begin time.
+        end_time: The inclusive end time.
+
+    Returns:
+        Indicator query results from Demisto.
+    """
+    return find_indicators_loop(build_time_frame_query(indicator_query, begin_time, end_time))
 
 
 def find_indicators_loop(indicator_query: str):
@@ -762,18 +1020,58 @@ def find_indicators_loop(indicator_query: str):
         Indicator query results from Demisto.
     """
     iocs: List[dict] = []
-    total_fetched = 0
-    last_found_len = PAGE_SIZE
-    search_indicators = IndicatorsSearcher()
-
-    while last_found_len == PAGE_SIZE:
-        fetched_iocs = search_indicators.search_indicators_by_version(query=indicator_query, size=PAGE_SIZE).get('iocs')
-        iocs.extend(fetched_iocs)
-        last_found_len = len(fetched_iocs)
-        total_fetched += last_found_len
+    for page in iter_indicators_pages(indicator_query):
+        iocs.extend(page)
     return iocs
 
 
+class IndicatorsPages:
+    """
+    Iterates lazily over the pages of an indicators query, using the search after cursor when it is supported.
+    The total number of the query results is available once the first page was searched.
+    """
+    def __init__(self, indicator_query: str, page_size: int = PAGE_SIZE):
+        self.page_size = page_size
+        self.searcher = IndicatorsSearcher(query=indicator_query, size=page_size)
+        self.searcher_iterator = iter(self.searcher)
+        self.done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> List[dict]:
+        if self.done:
+            raise StopIteration
+        iocs = next(self.searcher_iterator).get('iocs') or []
+        # a short page is the last one, do not search again
+        self.done = len(iocs) < self.page_size
+        return iocs
+
+    @property
+    def total(self) -> Optional[int]:
+        return self.searcher.total
+
+
+def iter_indicators_pages(indicator_query: str, page_size: int = PAGE_SIZE) -> IndicatorsPages:
+    """
+    Find indicators page by page according to a query, searching each page only when it is needed.
+    Args:
+        indicator_query: The indicator query.
+        page_size: The number of indicators in a page.
+
+    Returns:
+        Iterator of the indicators pages.
+    """
+    return IndicatorsPages(indicator_query, page_size)
+
+
+def get_indicators_total(pages: Iterator[List[dict]]) -> Optional[int]:
+    """
+    Get the total number of the query results of the indicators pages, once the first page was searched.
+    """
+    return getattr(pages, 'total', None)
+
+
 def taxii_make_response(taxii_message: TAXIIMessage):
     """
     Create an HTTP taxii response from a taxii message.
@@ -940,8 +1238,16 @@ def main():
         scheme = 'https'
 
     service_address = params.get('service_address')
+    result_part_size = arg_to_number(params.get('result_part_size')) or 0
+    stix_cache_size = arg_to_number(params.get('stix_cache_size'))
+    if stix_cache_size is None:
+        stix_cache_size = DEFAULT_STIX_CACHE_SIZE_MB
+    stix_cache = None
+    if stix_cache_size > 0 and command == 'long-running-execution':
+        stix_cache = StixContentCache(STIX_CACHE_PATH, stix_cache_size * 1024 * 1024)
     SERVER = TAXIIServer(scheme, str(host_name), port, collections,
-                         certificate, private_key, http_server, credentials, service_address)
+                         certificate, private_key, http_server, credentials, service_address, result_part_size,
+                         stix_cache)
 
     demisto.debug(f'Command being called is {command}')
     commands = {
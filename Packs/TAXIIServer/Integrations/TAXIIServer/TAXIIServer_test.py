@@ -451,3 +451,161 @@ def test_get_url(mocker, request_headers, url_scheme, expected):
     if request_headers:
         mocker.patch('TAXIIServer.get_calling_context', return_value={'IntegrationInstance': 'eyy'})
     assert taxii_server.get_url(request_headers) == expected
+
+
+def mock_search_indicators_pages(mocker, iocs):
+    def search_indicators(query='', size=100, page=0, **kwargs):
+        return {'iocs': iocs[page * size:(page + 1) * size], 'total': len(iocs)}
+
+    return mocker.patch.object(demisto, 'searchIndicators', side_effect=search_indicators)
+
+
+def test_iter_indicators_pages(mocker):
+    """
+    Given:
+        - 5 indicators in the query results.
+    When:
+        - Iterating the query results in pages of 2 indicators.
+    Then:
+        - Ensure the pages are searched lazily, and no search is made after the last short page.
+    """
+    from TAXIIServer import iter_indicators_pages, get_indicators_total
+    iocs = [{'value': str(i)} for i in range(5)]
+    search_mock = mock_search_indicators_pages(mocker, iocs)
+
+    pages = iter_indicators_pages('q', page_size=2)
+    assert search_mock.call_count == 0
+    assert next(pages) == iocs[:2]
+    assert get_indicators_total(pages) == 5
+    assert search_mock.call_count == 1
+    assert list(pages) == [iocs[2:4], iocs[4:]]
+    assert search_mock.call_count == 3
+
+
+def test_poll_response_parts(mocker):
+    """
+    Given:
+        - A collection with 5 indicators, and a poll response part size of 2.
+    When:
+        - Polling the collection, and requesting the next parts with poll fulfillment requests.
+    Then:
+        - Ensure each part holds 2 indicators, and only the last part is returned with more="false".
+        - Ensure a part which is not the next part of the result is rejected.
+    """
+    import datetime
+    import pytz
+    import TAXIIServer
+    from libtaxii.messages_11 import PollRequest, PollFulfillmentRequest
+
+    iocs = [{'value': f'1.1.1.{i}', 'indicator_type': 'IP'} for i in range(5)]
+    mock_search_indicators_pages(mocker, iocs)
+    mocker.patch.object(demisto, 'info')
+    taxii_server = TAXIIServer.TAXIIServer('http', '1.1.1.1', 1111, {'ips': 'type:IP'}, '', '', True, {},
+                                           result_part_size=2)
+    poll_request = PollRequest(message_id='1', collection_name='ips',
+                               exclusive_begin_timestamp_label=datetime.datetime(2020, 2, 10, tzinfo=pytz.utc),
+                               poll_parameters=PollRequest.PollParameters())
+
+    def get_response(message):
+        with TAXIIServer.APP.test_request_context():
+            return ''.join(taxii_server.get_poll_response(message).response)
+
+    response = get_response(poll_request)
+    assert 'more="true"' in response
+    assert 'result_part_number="1"' in response
+    assert response.count('<taxii_11:Content_Block ') == 2
+    result_id = response.split('result_id="')[1].split('"')[0]
+
+    with pytest.raises(ValueError):
+        get_response(PollFulfillmentRequest(message_id='2', collection_name='ips', result_id=result_id,
+                                            result_part_number=3))
+
+    response = get_response(PollFulfillmentRequest(message_id='3', collection_name='ips', result_id=result_id,
+                                                   result_part_number=2))
+    assert 'more="true"' in response
+    assert response.count('<taxii_11:Content_Block ') == 2
+
+    response = get_response(PollFulfillmentRequest(message_id='4', collection_name='ips', result_id=result_id,
+                                                   result_part_number=3))
+    assert 'more="false"' in response
+    assert 'result_part_number="3"' in response
+    assert response.count('<taxii_11:Content_Block ') == 1
+    assert result_id not in taxii_server.poll_results
+
+
+def test_poll_response_parts_within_pages(mocker):
+    """
+    Given:
+        - A collection with 600 indicators, and a poll response part size of 250, which is not a multiple of the
+          200 indicators search page size.
+    When:
+        - Polling the collection, and requesting the next parts with poll fulfillment requests.
+    Then:
+        - Ensure the parts hold exactly 250, 250 and 100 indicators, in order and without repetitions.
+    """
+    import datetime
+    import pytz
+    import TAXIIServer
+    from libtaxii.messages_11 import PollRequest, PollFulfillmentRequest
+
+    iocs = [{'value': f'1.1.{i // 256}.{i % 256}', 'indicator_type': 'IP'} for i in range(600)]
+    mock_search_indicators_pages(mocker, iocs)
+    mocker.patch.object(demisto, 'info')
+    mocker.patch.object(TAXIIServer, 'get_content_block_xml', side_effect=lambda indicator, _: indicator['value'])
+    taxii_server = TAXIIServer.TAXIIServer('http', '1.1.1.1', 1111, {'ips': 'type:IP'}, '', '', True, {},
+                                           result_part_size=250)
+    poll_request = PollRequest(message_id='1', collection_name='ips',
+                               exclusive_begin_timestamp_label=datetime.datetime(2020, 2, 10, tzinfo=pytz.utc),
+                               poll_parameters=PollRequest.PollParameters())
+
+    def get_part_values(message):
+        with TAXIIServer.APP.test_request_context():
+            response = list(taxii_server.get_poll_response(message).response)
+        return response[0], [value.strip() for value in response[1:-1]]
+
+    opening_tag, values = get_part_values(poll_request)
+    assert 'more="true"' in opening_tag
+    assert values == [ioc['value'] for ioc in iocs[:250]]
+    result_id = opening_tag.split('result_id="')[1].split('"')[0]
+
+    opening_tag, values = get_part_values(PollFulfillmentRequest(message_id='2', collection_name='ips',
+                                                                 result_id=result_id, result_part_number=2))
+    assert 'more="true"' in opening_tag
+    assert values == [ioc['value'] for ioc in iocs[250:500]]
+
+    opening_tag, values = get_part_values(PollFulfillmentRequest(message_id='3', collection_name='ips',
+                                                                 result_id=result_id, result_part_number=3))
+    assert 'more="false"' in opening_tag
+    assert values == [ioc['value'] for ioc in iocs[500:]]
+
+
+def test_content_block_cache(mocker, tmp_path):
+    """
+    Given:
+        - A STIX content cache.
+    When:
+        - Rendering an indicator twice, and again after it was modified.
+    Then:
+        - Ensure the indicator is rendered to STIX only when it is not cached.
+        - Ensure the least recently used content blocks are evicted when the cache is full.
+    """
+    import TAXIIServer
+    from TAXIIServer import StixContentCache, get_content_block_xml
+    indicator = json.loads(IP_INDICATORS)['iocs'][0]
+    stix_cache = StixContentCache(str(tmp_path), max_size=1024 * 1024)
+    render_mock = mocker.patch.object(TAXIIServer, 'get_stix_indicator', wraps=TAXIIServer.get_stix_indicator)
+
+    content_xml = get_content_block_xml(indicator, stix_cache)
+    assert get_content_block_xml(indicator, stix_cache) == content_xml
+    assert render_mock.call_count == 1
+    assert StixContentCache(str(tmp_path), max_size=1024 * 1024).get(StixContentCache.get_key(indicator)) == content_xml
+
+    modified_indicator = dict(indicator, modified='2020-02-20T17:45:07.468975+02:00')
+    get_content_block_xml(modified_indicator, stix_cache)
+    assert render_mock.call_count == 2
+
+    stix_cache.max_size = len(content_xml.encode('utf-8')) + 1
+    stix_cache.evict()
+    assert StixContentCache.get_key(indicator) not in stix_cache.entries
+    assert list(stix_cache.entries) == [StixContentCache.get_key(modified_indicator)]
+    assert len(list(tmp_path.iterdir())) == 1